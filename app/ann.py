@@ -0,0 +1,183 @@
+from typing import Dict, List, Optional, Tuple
+import hashlib, threading
+import numpy as np
+from . import quantize
+
+
+# Índice aproximado IVF (inverted file) para búsquedas sin filtro de vídeo:
+# k-means esférico reparte los vectores (normalizados) en nlist listas; una consulta
+# compara con los centroides y solo recorre las nprobe listas más cercanas.
+# nprobe es el mando recall/latencia: nprobe = nlist equivale a la búsqueda exacta.
+#
+# Los vectores se agrupan por clave (video_id) para poder añadir y quitar vídeos
+# enteros sin reentrenar; las listas se compactan de forma perezosa al consultarlas.
+# Con dtype float16/int8 las listas guardan vectores cuantizados y las puntuaciones
+# son aproximadas: quien consulta debe reordenar los candidatos en float32.
+
+
+def _normalize(m: np.ndarray) -> np.ndarray:
+    m = np.ascontiguousarray(m, dtype=np.float32)
+    norms = np.linalg.norm(m, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
+
+
+# Lista más cercana de cada vector (por bloques para acotar memoria)
+def assign(vecs: np.ndarray, centroids: np.ndarray, block: int = 8192) -> np.ndarray:
+    out = np.empty(len(vecs), dtype=np.int32)
+    for i in range(0, len(vecs), block):
+        out[i:i + block] = np.argmax(np.asarray(vecs[i:i + block], dtype=np.float32) @ centroids.T, axis=1)
+    return out
+
+
+# k-means esférico (coseno) sobre una muestra de ≤ points_per_list·nlist vectores;
+# los clusters vacíos se reinician con puntos al azar
+def kmeans(sample: np.ndarray, nlist: int, iters: int = 10, seed: int = 0, points_per_list: int = 64) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    if len(sample) > points_per_list * nlist:
+        sample = sample[np.sort(rng.choice(len(sample), points_per_list * nlist, replace=False))]
+    x = _normalize(sample)
+    nlist = min(nlist, len(x))
+    c = x[rng.choice(len(x), nlist, replace=False)].copy()
+    for _ in range(iters):
+        a = assign(x, c)
+        order = np.argsort(a, kind="stable")
+        present, starts = np.unique(a[order], return_index=True)
+        sums = np.zeros_like(c)
+        sums[present] = np.add.reduceat(x[order], starts)
+        empty = np.setdiff1d(np.arange(nlist), present)
+        if len(empty):
+            sums[empty] = x[rng.choice(len(x), len(empty), replace=False)]
+        c = _normalize(sums)
+    return c
+
+
+# Tamaño por defecto: ~4·√N listas (entre 16 y 4096)
+def default_nlist(n: int) -> int:
+    return int(min(4096, max(16, 4 * np.sqrt(max(n, 1)))))
+
+
+# Bloque de una lista invertida: (vectores o códigos, escalas int8 o None, clave, fila)
+Block = Tuple[np.ndarray, Optional[np.ndarray], np.ndarray, np.ndarray]
+
+
+class IVFIndex:
+    def __init__(self, centroids: np.ndarray, dtype: str = "float32"):
+        # Ya normalizados (recién entrenados o leídos de disco) se usan tal cual: normalizar
+        # otra vez cambia los últimos bits y con ellos la versión, y se reentrenaría al recargar
+        c = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.centroids = c if np.allclose(np.linalg.norm(c, axis=1), 1.0, atol=1e-5) else _normalize(c)
+        self.nlist, self.dim = self.centroids.shape
+        self.dtype = quantize.check_dtype(dtype)
+        self.version = hashlib.sha1(self.centroids.tobytes()).hexdigest()[:12]
+        self._lock = threading.Lock()
+        # Por lista: bloques pendientes y su versión compactada
+        self._parts: List[List[Block]] = [[] for _ in range(self.nlist)]
+        self._packed: List[Optional[Block]] = [None] * self.nlist
+        self._codes: Dict[str, int] = {}          # clave -> código
+        self._keys: List[str] = []                # código -> clave
+        self._free: List[int] = []                # códigos de claves quitadas (se reutilizan)
+        self._key_lists: Dict[str, np.ndarray] = {}
+        self._sizes: Dict[str, int] = {}
+
+    @classmethod
+    def train(cls, sample: np.ndarray, nlist: int, iters: int = 10, seed: int = 0, dtype: str = "float32") -> "IVFIndex":
+        return cls(kmeans(sample, nlist, iters=iters, seed=seed), dtype=dtype)
+
+    def __len__(self) -> int:
+        return sum(self._sizes.values())
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._codes
+
+    def keys(self) -> List[str]:
+        return list(self._codes)
+
+    def assign(self, vecs: np.ndarray) -> np.ndarray:
+        return assign(vecs, self.centroids)
+
+    # Bytes de vectores en memoria (sin contar claves ni filas)
+    def nbytes(self) -> int:
+        return sum(self._sizes.values()) * quantize.bytes_per_vector(self.dim, self.dtype)
+
+    # Añade (o sustituye) los vectores de una clave; lists = asignación ya calculada.
+    # Sustituir reutiliza el código de la clave, así la tabla de claves no crece.
+    def add(self, key: str, vecs: np.ndarray, lists: Optional[np.ndarray] = None) -> None:
+        vecs = np.asarray(vecs, dtype=np.float32)
+        lists = self.assign(vecs) if lists is None else np.asarray(lists)
+        codes, scales = quantize.quantize(vecs, self.dtype)
+        with self._lock:
+            self._remove(key)
+            if self._free:
+                code = self._free.pop()
+                self._keys[code] = key
+            else:
+                code = len(self._keys)
+                self._keys.append(key)
+            self._codes[key] = code
+            touched = np.unique(lists)
+            order = np.argsort(lists, kind="stable")
+            bounds = np.searchsorted(lists[order], touched, side="left").tolist() + [len(order)]
+            for j, l in enumerate(touched.tolist()):
+                rows = order[bounds[j]:bounds[j + 1]].astype(np.int32)
+                self._parts[l].append((
+                    codes[rows],
+                    scales[rows] if scales is not None else None,
+                    np.full(len(rows), code, dtype=np.int32),
+                    rows,
+                ))
+            self._key_lists[key] = touched
+            self._sizes[key] = len(vecs)
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        code = self._codes.pop(key, None)
+        if code is None:
+            return
+        for l in self._key_lists.pop(key).tolist():
+            vecs, scales, codes, rows = self._pack(l)
+            keep = codes != code
+            self._packed[l] = (vecs[keep], scales[keep] if scales is not None else None, codes[keep], rows[keep])
+        del self._sizes[key]
+        self._free.append(code)
+
+    def _pack(self, l: int) -> Block:
+        parts = self._parts[l]
+        if parts or self._packed[l] is None:
+            if self._packed[l] is not None:
+                parts = [self._packed[l]] + parts
+            if parts:
+                packed = (
+                    np.concatenate([p[0] for p in parts]),
+                    np.concatenate([p[1] for p in parts]) if self.dtype == "int8" else None,
+                    np.concatenate([p[2] for p in parts]),
+                    np.concatenate([p[3] for p in parts]),
+                )
+            else:
+                empty, _ = quantize.quantize(np.empty((0, self.dim), np.float32), self.dtype)
+                scales = np.empty(0, np.float32) if self.dtype == "int8" else None
+                packed = (empty, scales, np.empty(0, np.int32), np.empty(0, np.int32))
+            self._packed[l], self._parts[l] = packed, []
+        return self._packed[l]
+
+    # Top-k (aproximado si dtype no es float32): [(score, clave, fila), ...] de mayor a menor
+    def search(self, q: np.ndarray, k: int, nprobe: int = 8) -> List[Tuple[float, str, int]]:
+        cs = self.centroids @ q
+        nprobe = max(1, min(nprobe, self.nlist))
+        probe = np.argpartition(-cs, nprobe - 1)[:nprobe]
+        with self._lock:
+            lists = [self._pack(l) for l in probe.tolist()]
+            keys = list(self._keys)       # los códigos se reutilizan: copia coherente con las listas
+        cands = []
+        for vecs, scales, codes, rows in lists:
+            if not len(codes):
+                continue
+            scores = quantize.scores(vecs, scales, q)
+            kk = min(k, len(scores))
+            idx = np.argpartition(-scores, kk - 1)[:kk]
+            cands.extend((float(scores[j]), keys[codes[j]], int(rows[j])) for j in idx)
+        cands.sort(key=lambda x: x[0], reverse=True)
+        return cands[:k]
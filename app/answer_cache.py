@@ -0,0 +1,198 @@
+from typing import List, Dict, Optional, Tuple
+from collections import OrderedDict
+from pathlib import Path
+import hashlib, json, os, re, threading, time, uuid
+from .utils import file_lock
+
+
+# Caché persistente de respuestas: clave = (vídeo, pregunta normalizada, ids de chunks
+# recuperados, modelo, versión del prompt). LRU acotada + TTL; se invalida al reindexar.
+# El fichero es un registro JSON append-only (una línea por respuesta o invalidación),
+# así cada put escribe solo lo nuevo. Otros procesos (worker de trabajos, CLI por lotes)
+# leen la cola que no han visto; las escrituras van bajo cerrojo y, cuando sobran líneas
+# muertas, se compacta con una cabecera nueva y los demás recargan.
+ANSWER_CACHE_PATH = Path(os.getenv("ANSWER_CACHE_PATH", "data/answer_cache.jsonl"))
+ANSWER_CACHE_MAX = int(os.getenv("ANSWER_CACHE_MAX", "5000"))                  # 0 = sin caché
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(7 * 24 * 3600)))     # segundos
+
+
+# Minúsculas, espacios colapsados y sin signos de interrogación/exclamación en los extremos
+def normalize_question(q: str) -> str:
+    q = re.sub(r"\s+", " ", q.lower()).strip()
+    return q.strip("¿?¡!. ").strip()
+
+
+class AnswerCache:
+    def __init__(self, path: Path = ANSWER_CACHE_PATH, max_entries: int = ANSWER_CACHE_MAX, ttl: float = ANSWER_CACHE_TTL):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._head: Optional[bytes] = None    # cabecera del registro leído (generación)
+        self._pos = 0                         # bytes del registro ya leídos
+        self._records = 0                     # líneas de datos del registro (vivas o no)
+        self._stamp = None                    # (inodo, mtime, tamaño) del registro tras la última lectura
+        self._load()
+
+    @staticmethod
+    def key(video_id: str, question: str, chunk_ids: List[str], model: str, prompt_version: str) -> str:
+        raw = json.dumps([video_id, normalize_question(question), sorted(chunk_ids), model, prompt_version], ensure_ascii=False)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _file_stamp(self):
+        try:
+            st = self.path.stat()
+        except OSError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    # Pone las entradas al día con el disco: lee solo la cola nueva del registro,
+    # o todo si otro proceso lo compactó (cabecera distinta)
+    def _load(self) -> None:
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return
+        self._stamp = stamp
+        try:
+            with open(self.path, "rb") as f:
+                head = f.readline()
+                if head != self._head:
+                    self._head, self._pos, self._records = head, len(head), 0
+                    self._entries = OrderedDict()
+                    if not head.startswith(b'{"answer_cache"'):   # vacío o formato anterior
+                        self._head = None
+                        return
+                f.seek(self._pos)
+                data = f.read()
+        except OSError:
+            self._head, self._entries = None, OrderedDict()
+            return
+        data = data[:data.rfind(b"\n") + 1]          # una línea a medias (escritura en curso) se ignora
+        self._pos += len(data)
+        for line in data.splitlines():
+            try:
+                self._apply(json.loads(line))
+            except (ValueError, KeyError, TypeError):
+                continue
+            self._records += 1
+        while len(self._entries) > self.max_entries:      # lo recargado respeta el límite
+            self._entries.popitem(last=False)
+
+    def _apply(self, rec: Dict) -> None:
+        if "invalidate" in rec:
+            for k in [k for k, e in self._entries.items() if e["video_id"] == rec["invalidate"]]:
+                del self._entries[k]
+        else:
+            self._entries[rec["key"]] = rec
+            self._entries.move_to_end(rec["key"])
+
+    # Añade registros ya aplicados al final (con el cerrojo de fichero tomado); si el
+    # registro no existe o es del formato anterior, se escribe entero con las entradas vivas
+    def _append(self, recs: List[Dict]) -> None:
+        if self._head is None:
+            return self._compact()
+        with open(self.path, "ab") as f:
+            f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in recs).encode("utf-8"))
+            self._pos = f.tell()
+        self._records += len(recs)
+        self._stamp = self._file_stamp()
+        if self._records - len(self._entries) > max(256, len(self._entries)):
+            self._compact()
+
+    # Reescribe solo las entradas vivas, en orden LRU (nueva cabecera: los demás recargan)
+    def _compact(self) -> None:
+        head = (json.dumps({"answer_cache": 1, "gen": uuid.uuid4().hex}) + "\n").encode()
+        body = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in self._entries.values()).encode("utf-8")
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_bytes(head + body)
+        os.replace(tmp, self.path)
+        self._head, self._pos, self._records = head, len(head) + len(body), len(self._entries)
+        self._stamp = self._file_stamp()
+
+    # Cerrojo entre procesos para leer-modificar-escribir el fichero
+    def _file_lock(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        return file_lock(self.path.with_suffix(".lock"))
+
+    def get(self, key: str) -> Optional[Tuple[str, List[Dict]]]:
+        with self._lock:
+            self._load()
+            e = self._entries.get(key)
+            if e is not None and time.time() - e["created"] > self.ttl:
+                del self._entries[key]
+                e = None
+            if e is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return e["answer"], e["citations"]
+
+    def put(self, key: str, video_id: str, answer: str, citations: List[Dict]) -> None:
+        with self._lock, self._file_lock():
+            self._load()
+            rec = {
+                "key": key,
+                "video_id": video_id,
+                "answer": answer,
+                "citations": citations,
+                "created": time.time(),
+            }
+            self._apply(rec)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._append([rec])
+
+    # Borra las respuestas de un vídeo (se llama al reindexarlo)
+    def invalidate_video(self, video_id: str) -> int:
+        if not self._entries and self._file_stamp() is None:
+            return 0          # nada cacheado: ni cerrojo ni fichero
+        with self._lock, self._file_lock():
+            self._load()
+            stale = sum(1 for e in self._entries.values() if e["video_id"] == video_id)
+            if stale:
+                rec = {"invalidate": video_id}
+                self._apply(rec)
+                self._append([rec])
+            return stale
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._load()
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
+
+
+_cache: Optional[AnswerCache] = None
+_cache_lock = threading.Lock()
+
+
+# Instancia compartida del proceso (None si ANSWER_CACHE_MAX=0)
+def get_answer_cache() -> Optional[AnswerCache]:
+    global _cache
+    if ANSWER_CACHE_MAX <= 0:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AnswerCache()
+    return _cache
+
+
+def invalidate_video(video_id: str) -> int:
+    cache = get_answer_cache()
+    return cache.invalidate_video(video_id) if cache is not None else 0
+
+
+def answer_cache_stats() -> Dict:
+    cache = get_answer_cache()
+    return cache.stats() if cache is not None else {"entries": 0, "hits": 0, "misses": 0, "hit_rate": 0.0}
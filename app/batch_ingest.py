@@ -0,0 +1,238 @@
+from typing import List, Dict, Optional, Tuple, Set
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+import argparse, json, re, sys, time
+from .utils import yt_id_from_url
+from .ingest import get_transcript_auto
+from .rate_limit import TokenBucket
+from .manifest import changed_positions, chunk_hash, contiguous_runs
+
+
+# Ingesta por lotes desde la línea de comandos:
+#   python -m app.batch_ingest urls.txt --workers 4 --rate 0.5
+# Cada línea del fichero es una URL o un VIDEO_ID, opcionalmente seguido de un tabulador y
+# el título del vídeo (las vacías y las que empiezan por # se ignoran).
+
+CHECKPOINT_PATH = Path("data/batch/checkpoint.jsonl")
+
+
+# Convierte cada línea en (video_id, url, título o None)
+def read_targets(path: str) -> List[Tuple[str, str, Optional[str]]]:
+    targets, seen = [], set()
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        line, _, title = line.partition("\t")
+        line, title = line.strip(), title.strip() or None
+        if not line or line.startswith("#"):
+            continue
+        if re.fullmatch(r"[\w-]{11}", line):
+            vid, url = line, f"https://www.youtube.com/watch?v={line}"
+        else:
+            vid, url = yt_id_from_url(line), line
+        if vid not in seen:
+            seen.add(vid)
+            targets.append((vid, url, title))
+    return targets
+
+
+# Checkpoint append-only: una línea JSON por vídeo terminado (o fallido)
+def load_done(checkpoint: Path) -> Set[str]:
+    done = set()
+    if checkpoint.exists():
+        for line in checkpoint.read_text(encoding="utf-8").splitlines():
+            try:
+                rec = json.loads(line)
+            except Exception:
+                continue   # línea truncada por una parada brusca
+            if rec.get("status") == "done":
+                done.add(rec["video_id"])
+    return done
+
+def _append_checkpoint(checkpoint: Path, rec: Dict) -> None:
+    checkpoint.parent.mkdir(parents=True, exist_ok=True)
+    with open(checkpoint, "a", encoding="utf-8") as f:
+        f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+def _record_failure(checkpoint: Path, vid: str, e: Exception) -> None:
+    _append_checkpoint(checkpoint, {"video_id": vid, "status": "failed", "error": str(e)})
+    print(f"✗ {vid}: {e}", file=sys.stderr)
+
+
+# Compara con el manifiesto del vídeo: None si no ha cambiado nada, si no el plan de
+# pipeline.plan_index con los chunks, sus hashes y las posiciones a subir
+def _plan(vid: str, rows, params: Dict) -> Dict | None:
+    from .pipeline import iter_chunks, plan_index
+
+    plan = plan_index(vid, rows, params)
+    if plan["current"]:
+        return None
+    chunks = list(iter_chunks(rows, params))
+    hashes = [chunk_hash(c) for c in chunks]
+    return dict(plan, chunks=chunks, hashes=hashes, changed=changed_positions(plan["old_hashes"], hashes))
+
+
+# Embebe los chunks cambiados de varios vídeos en un solo lote y los sube por vídeo.
+# Un error solo marca como fallidos los vídeos afectados (todos si falla el embebido).
+# Devuelve (chunks embebidos, vídeos terminados, vídeos fallidos).
+def _flush(pending: List[Dict], checkpoint: Path) -> Tuple[int, int, int]:
+    from .embeddings import embed_chunks
+    from .vector_store import upsert_chunks
+    from .pipeline import finish_index
+
+    all_chunks = [p["chunks"][i] for p in pending for i in p["changed"]]
+    try:
+        embedded = embed_chunks(all_chunks) if all_chunks else []
+    except Exception as e:
+        for p in pending:
+            _record_failure(checkpoint, p["video_id"], e)
+        failed = len(pending)
+        pending.clear()
+        return 0, 0, failed
+    pos = done = failed = 0
+    for p in pending:
+        vid = p["video_id"]
+        mine = embedded[pos:pos + len(p["changed"])]
+        pos += len(p["changed"])
+        try:
+            upserted = cur = 0
+            for a, b in contiguous_runs(p["changed"]):
+                report = upsert_chunks(mine[cur:cur + b - a], video_id=vid, title=p["params"]["title"], lang="auto", offset=a)
+                upserted += report["upserted"]
+                cur += b - a
+            deleted = finish_index(p, p["chunks"], p["hashes"], upserted)
+        except Exception as e:
+            failed += 1
+            _record_failure(checkpoint, vid, e)
+            continue
+        done += 1
+        _append_checkpoint(checkpoint, {"video_id": vid, "status": "done", "chunks": len(p["chunks"]), "upserted": upserted, "deleted": deleted})
+    pending.clear()
+    return len(all_chunks), done, failed
+
+
+def run_batch(
+    targets: List[Tuple[str, str, Optional[str]]],
+    workers: int = 4,
+    rate: float = 0.5,
+    burst: float = 2.0,
+    embed_batch: int = 256,
+    window: int = 60,
+    overlap: int = 12,
+    checkpoint: Path = CHECKPOINT_PATH,
+    cookiefile: str | None = None,
+    mode: str | None = None,
+    max_tokens: int | None = None,
+    overlap_tokens: int | None = None,
+) -> Dict:
+    from .vector_store import ensure_index
+    from .pipeline import segment_params
+
+    # El título de cada línea va en los metadatos y en el manifiesto de su vídeo
+    params = segment_params(window, overlap, None, "auto", mode=mode, max_tokens=max_tokens, overlap_tokens=overlap_tokens)
+
+    done = load_done(checkpoint)
+    todo = [(vid, url, title) for vid, url, title in targets if vid not in done]
+    print(f"Vídeos: {len(targets)} | ya indexados: {len(targets) - len(todo)} | pendientes: {len(todo)}")
+    if not todo:
+        return {"videos": 0, "unchanged": 0, "failed": 0, "chunks": 0, "seconds": 0.0, "videos_per_min": 0.0}
+
+    ensure_index()
+    limiter = TokenBucket(rate=rate, capacity=burst)
+    t0 = time.perf_counter()
+    pending: List[Dict] = []
+    pending_chunks = 0
+    ok = failed = unchanged = chunks_total = 0
+
+    def fetch(vid: str, url: str):
+        return get_transcript_auto(vid, fallback_url=url, cookiefile=cookiefile, rate_limiter=limiter)
+
+    def flush():
+        nonlocal ok, failed, chunks_total, pending_chunks
+        n, n_done, n_failed = _flush(pending, checkpoint)
+        chunks_total += n
+        ok += n_done
+        failed += n_failed
+        pending_chunks = 0
+
+    # Los fallos de un vídeo (descarga, segmentación, embebido, subida) se apuntan en el
+    # checkpoint y el lote sigue; si aun así hay que abortar, no se esperan las descargas
+    # que quedan en cola
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        futures = {ex.submit(fetch, vid, url): (vid, title) for vid, url, title in todo}
+        try:
+            for fut in as_completed(futures):
+                vid, title = futures[fut]
+                try:
+                    plan = _plan(vid, fut.result(), dict(params, title=title))
+                except Exception as e:
+                    failed += 1
+                    _record_failure(checkpoint, vid, e)
+                    continue
+                if plan is None:
+                    ok += 1
+                    unchanged += 1
+                    _append_checkpoint(checkpoint, {"video_id": vid, "status": "done", "unchanged": True})
+                    print(f"= {vid}: sin cambios")
+                    continue
+                pending.append(plan)
+                pending_chunks += len(plan["changed"])
+                print(f"✓ {vid}: {len(plan['chunks'])} chunks ({len(plan['changed'])} nuevos o cambiados)")
+                if pending_chunks >= embed_batch:
+                    flush()
+            if pending:
+                flush()
+        except BaseException:
+            for fut in futures:
+                fut.cancel()
+            raise
+
+    dt = time.perf_counter() - t0
+    return {
+        "videos": ok,
+        "unchanged": unchanged,
+        "failed": failed,
+        "chunks": chunks_total,
+        "seconds": dt,
+        "videos_per_min": ok / dt * 60 if dt > 0 else 0.0,
+    }
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Indexa en lote vídeos de YouTube (fichero de URLs o IDs).")
+    ap.add_argument("targets", help="Fichero con una URL o VIDEO_ID por línea (opcional: tabulador + título)")
+    ap.add_argument("--workers", type=int, default=4, help="Descargas de subtítulos en paralelo")
+    ap.add_argument("--rate", type=float, default=0.5, help="Peticiones/segundo a YouTube (compartidas)")
+    ap.add_argument("--burst", type=float, default=2.0, help="Ráfaga máxima del token bucket")
+    ap.add_argument("--embed-batch", type=int, default=256, help="Chunks por lote de embeddings (entre vídeos)")
+    ap.add_argument("--window", type=int, default=60)
+    ap.add_argument("--overlap", type=int, default=12)
+    ap.add_argument("--mode", choices=("time", "tokens"), default=None, help="Segmentación (por defecto SEGMENT_MODE)")
+    ap.add_argument("--max-tokens", type=int, default=None, help="Modo tokens: tokens por chunk (por defecto el límite del modelo)")
+    ap.add_argument("--overlap-tokens", type=int, default=None)
+    ap.add_argument("--checkpoint", default=str(CHECKPOINT_PATH))
+    ap.add_argument("--cookiefile", default=None)
+    args = ap.parse_args(argv)
+
+    report = run_batch(
+        read_targets(args.targets),
+        workers=args.workers,
+        rate=args.rate,
+        burst=args.burst,
+        embed_batch=args.embed_batch,
+        window=args.window,
+        overlap=args.overlap,
+        mode=args.mode,
+        max_tokens=args.max_tokens,
+        overlap_tokens=args.overlap_tokens,
+        checkpoint=Path(args.checkpoint),
+        cookiefile=args.cookiefile,
+    )
+    print(
+        f"Indexados: {report['videos']} (sin cambios: {report['unchanged']}) | fallidos: {report['failed']} | "
+        f"chunks embebidos: {report['chunks']} | "
+        f"{report['seconds']:.1f} s | {report['videos_per_min']:.1f} vídeos/min"
+    )
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
+import time
+from .embeddings import embed_texts
+from .retrieval import hybrid_query
+from . import rag_answer as ra
+
+
+# Responde varias preguntas sobre un mismo vídeo de una vez:
+#   1) embeddings de todas las preguntas en un único lote
+#   2) recuperación híbrida concurrente (vectorial + BM25, una consulta por pregunta)
+#   3) generación en lotes con padding (solo las que no están en la caché de respuestas)
+# Devuelve los resultados en el orden de entrada y métricas de rendimiento.
+def answer_many(
+    video_id: str,
+    questions: List[str],
+    model_name: str = ra._DEFAULT_MODEL,
+    top_k: int = 8,
+    ctx_max: int = 4,
+    cite_k: int = 2,
+    min_gap_sec: float = 45.0,
+    min_top_score: float = 0.35,
+    batch_size: int = 4,
+    workers: int = 4,
+) -> Dict:
+    t0 = time.perf_counter()
+    results: List[Dict] = [
+        {"question": q, "answer": ra.NOT_FOUND_ANSWERS[0], "citations": [], "cached": False}
+        for q in questions
+    ]
+    if not questions:
+        return {"results": results, "stats": {"questions": 0, "generated": 0, "cached": 0, "seconds": 0.0, "questions_per_sec": 0.0}}
+
+    # 1) Embeddings en lote
+    q_vecs = embed_texts(questions)
+    t_embed = time.perf_counter()
+
+    # 2) Recuperación concurrente
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(questions)))) as ex:
+        hits_all = list(ex.map(lambda qv: hybrid_query(qv[0], qv[1], video_id=video_id, top_k=top_k), zip(questions, q_vecs)))
+    t_retrieve = time.perf_counter()
+
+    # 3) Contexto + caché; lo que falta se genera en lotes
+    todo = []   # (i, context_hits, hits_dedup)
+    for i, (q, hits) in enumerate(zip(questions, hits_all)):
+        prepared = ra.prepare_context(hits, ctx_max=ctx_max, min_gap_sec=min_gap_sec, min_top_score=min_top_score)
+        if prepared is None:
+            continue
+        cached = ra.cached_answer(video_id, q, hits, model_name=model_name)
+        if cached is not None:
+            results[i].update(answer=cached[0], citations=cached[1], cached=True)
+            continue
+        todo.append((i, prepared[0], prepared[1]))
+
+    if todo:
+        answers = ra.generate_rag_answers(
+            [questions[i] for i, _, _ in todo],
+            [ctx for _, ctx, _ in todo],
+            model_name=model_name,
+            batch_size=batch_size,
+        )
+        for (i, _, hits_dedup), answer in zip(todo, answers):
+            citations = ra.citations_for_answer(video_id, answer, hits_dedup, cite_k=cite_k)
+            ra.store_answer(video_id, questions[i], hits_all[i], answer, citations, model_name=model_name)
+            results[i].update(answer=answer, citations=citations)
+    t_end = time.perf_counter()
+
+    dt = t_end - t0
+    return {
+        "results": results,
+        "stats": {
+            "questions": len(questions),
+            "generated": len(todo),
+            "cached": sum(r["cached"] for r in results),
+            "embed_sec": t_embed - t0,
+            "retrieve_sec": t_retrieve - t_embed,
+            "generate_sec": t_end - t_retrieve,
+            "seconds": dt,
+            "questions_per_sec": len(questions) / dt if dt > 0 else 0.0,
+        },
+    }
@@ -0,0 +1,83 @@
+from typing import List, Dict, Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+import json, random, time
+from . import metrics
+
+
+# Tamaño aproximado de un vector serializado (id + values + metadata)
+def payload_bytes(vec: Dict) -> int:
+    return len(json.dumps(vec, ensure_ascii=False).encode("utf-8"))
+
+
+# Lote de vectores que lleva su tamaño serializado (calculado una vez al partir)
+class Batch(list):
+    nbytes: int = 0
+
+
+# Parte la lista de vectores en lotes acotados por nº de vectores y por bytes
+def iter_batches(vecs: List[Dict], max_vectors: int = 100, max_bytes: int = 2_000_000) -> Iterator[Batch]:
+    batch = Batch()
+    for v in vecs:
+        b = payload_bytes(v)
+        if batch and (len(batch) >= max_vectors or batch.nbytes + b > max_bytes):
+            yield batch
+            batch = Batch()
+        batch.append(v)
+        batch.nbytes += b
+    if batch:
+        yield batch
+
+
+# Envía un lote con reintentos y backoff exponencial con jitter
+def _send_with_retry(send: Callable[[List[Dict]], None], batch: List[Dict], max_retries: int, backoff_base: float) -> int:
+    for attempt in range(1, max_retries + 1):
+        try:
+            send(batch)
+            return attempt
+        except Exception:
+            if attempt == max_retries:
+                metrics.inc("upsert_batch_failures_total")
+                raise
+            metrics.inc("upsert_retries_total")
+            time.sleep(min(8.0, backoff_base * (2 ** (attempt - 1))) + random.random() * backoff_base)
+    return max_retries
+
+
+# Envía los lotes en paralelo y devuelve un informe por lote (latencia/throughput)
+def send_batches(
+    send: Callable[[List[Dict]], None],
+    batches: List[List[Dict]],
+    workers: int = 4,
+    max_retries: int = 4,
+    backoff_base: float = 0.5,
+) -> Dict:
+    t0 = time.perf_counter()
+
+    def run(i_batch):
+        i, batch = i_batch
+        t = time.perf_counter()
+        attempts = _send_with_retry(send, batch, max_retries, backoff_base)
+        dt = time.perf_counter() - t
+        return {
+            "batch": i,
+            "vectors": len(batch),
+            "bytes": batch.nbytes if isinstance(batch, Batch) else sum(payload_bytes(v) for v in batch),
+            "attempts": attempts,
+            "seconds": dt,
+            "vectors_per_sec": len(batch) / dt if dt > 0 else float("inf"),
+        }
+
+    if workers <= 1 or len(batches) <= 1:
+        stats = [run(ib) for ib in enumerate(batches)]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            stats = list(ex.map(run, enumerate(batches)))
+
+    total = time.perf_counter() - t0
+    upserted = sum(s["vectors"] for s in stats)
+    return {
+        "upserted": upserted,
+        "batches": stats,
+        "seconds": total,
+        "vectors_per_sec": upserted / total if total > 0 else float("inf"),
+    }
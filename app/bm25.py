@@ -0,0 +1,133 @@
+from typing import List, Dict, Optional, Iterable, Tuple
+from collections import Counter, OrderedDict
+from pathlib import Path
+import json, math, os, re, threading, unicodedata
+
+
+# Índice léxico BM25 por vídeo, construido con los mismos chunks que el índice vectorial
+# (mismos ids "video_id:i"). Se guarda junto a la caché de transcripciones y se carga
+# en memoria bajo demanda. Los pesos BM25 se precalculan al construirlo, así que una
+# consulta es solo sumar los pesos de los términos de la pregunta.
+BM25_DIR = Path(os.getenv("BM25_DIR", "data/transcripts"))
+BM25_CACHE_VIDEOS = int(os.getenv("BM25_CACHE_VIDEOS", "32"))   # índices en memoria
+K1 = 1.2
+B = 0.75
+FORMAT_VERSION = 1
+
+_TOKEN_RE = re.compile(r"\w+(?:[.'’^]\w+)*")
+
+
+# Minúsculas, sin tildes; conserva números con punto/potencias ("2.5", "x^2") como un token
+def tokenize(text: str) -> List[str]:
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _TOKEN_RE.findall(text)
+
+
+class BM25Index:
+    def __init__(self, docs: List[Dict], postings: Dict[str, List[List]]):
+        self.docs = docs              # [{id, start_sec, end_sec, text}]
+        self.postings = postings      # término -> [[doc, peso], ...]
+
+    @classmethod
+    def build(cls, chunks: Iterable[Dict], video_id: str, offset: int = 0, k1: float = K1, b: float = B) -> "BM25Index":
+        docs, tfs = [], []
+        for i, c in enumerate(chunks):
+            docs.append({
+                "id": f"{video_id}:{offset + i}",
+                "start_sec": float(c["start_sec"]),
+                "end_sec": float(c["end_sec"]),
+                "text": c["text"],
+            })
+            tfs.append(Counter(tokenize(c["text"])))
+        n = len(docs)
+        lens = [sum(tf.values()) for tf in tfs]
+        avgdl = (sum(lens) / n) if n else 0.0
+        df = Counter(t for tf in tfs for t in tf)
+
+        postings: Dict[str, List[List]] = {}
+        for d, (tf, dl) in enumerate(zip(tfs, lens)):
+            norm = k1 * (1 - b + b * dl / avgdl) if avgdl else k1
+            for t, f in tf.items():
+                idf = math.log(1 + (n - df[t] + 0.5) / (df[t] + 0.5))
+                postings.setdefault(t, []).append([d, round(idf * f * (k1 + 1) / (f + norm), 6)])
+        return cls(docs, postings)
+
+    # Top-k chunks por BM25 (solo los que comparten algún término con la pregunta)
+    def search(self, question: str, top_k: int = 8) -> List[Dict]:
+        scores: Dict[int, float] = {}
+        for t in set(tokenize(question)):
+            for d, w in self.postings.get(t, ()):
+                scores[d] = scores.get(d, 0.0) + w
+        best = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:top_k]
+        return [dict(self.docs[d], bm25=s) for d, s in best]
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"version": FORMAT_VERSION, "docs": self.docs, "postings": self.postings}, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["BM25Index"]:
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != FORMAT_VERSION:
+            return None
+        return cls(data["docs"], data["postings"])
+
+
+def _path(video_id: str) -> Path:
+    return BM25_DIR / f"{video_id}.bm25.json"
+
+
+# Índices en memoria con la firma (inodo, mtime, tamaño) del fichero del que salieron: si otro
+# proceso (worker de trabajos, CLI por lotes) lo reescribe, se relee en la siguiente consulta
+_loaded: "OrderedDict[str, Tuple[BM25Index, Optional[Tuple[int, int, int]]]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _stamp(path: Path) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def _publish(video_id: str, index: BM25Index, stamp: Optional[Tuple[int, int, int]]) -> None:
+    with _lock:
+        _loaded[video_id] = (index, stamp)
+        _loaded.move_to_end(video_id)
+        while len(_loaded) > BM25_CACHE_VIDEOS:
+            _loaded.popitem(last=False)
+
+
+# Construye, guarda y publica en memoria el índice del vídeo (sustituye al anterior)
+def build_index(video_id: str, chunks: List[Dict]) -> BM25Index:
+    index = BM25Index.build(chunks, video_id)
+    index.save(_path(video_id))
+    _publish(video_id, index, _stamp(_path(video_id)))
+    return index
+
+
+def has_index(video_id: str) -> bool:
+    return video_id in _loaded or _path(video_id).exists()
+
+
+# Índice del vídeo (memoria si sigue al día → disco); None si el vídeo se indexó sin BM25
+def get_index(video_id: str) -> Optional[BM25Index]:
+    stamp = _stamp(_path(video_id))
+    with _lock:
+        cached = _loaded.get(video_id)
+        if cached is not None and cached[1] == stamp:
+            _loaded.move_to_end(video_id)
+            return cached[0]
+        _loaded.pop(video_id, None)
+    index = BM25Index.load(_path(video_id)) if stamp is not None else None
+    if index is None:
+        return None
+    _publish(video_id, index, stamp)
+    return index
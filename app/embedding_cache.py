@@ -0,0 +1,158 @@
+from typing import List, Optional, Dict
+from collections import OrderedDict
+from pathlib import Path
+import hashlib, os, re, threading, uuid
+import numpy as np
+from .utils import clean_text, file_lock
+
+
+# Caché de embeddings direccionada por contenido: un directorio por modelo con
+# vectores float32 en un fichero append-only (vectors.f32) y un registro también
+# append-only de pares "clave fila" (index.log), así cada put escribe solo lo nuevo.
+#
+# La CLI por lotes, el worker de trabajos y la UI pueden compartir el directorio:
+# todo acceso va bajo un cerrojo de fichero, la fila inicial de cada append sale del
+# tamaño real de vectors.f32 y cada instancia lee lo que otros añadieron al registro.
+# Compactar reescribe ambos ficheros con una cabecera nueva y los demás recargan.
+class EmbeddingCache:
+    def __init__(self, root: Path, model_name: str, dim: int, max_entries: int = 200_000):
+        self.dir = Path(root) / re.sub(r"[^\w.-]+", "__", model_name)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.data_path = self.dir / "vectors.f32"
+        self.log_path = self.dir / "index.log"
+        self.lock_path = self.dir / "lock"
+        self.model_name = model_name
+        self.dim = dim
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index: "OrderedDict[str, int]" = OrderedDict()   # clave -> fila (orden LRU)
+        self._rows = 0
+        self._head: Optional[bytes] = None    # cabecera del registro leído ("dim N generación")
+        self._log_pos = 0                     # bytes del registro ya leídos
+        self._mmap: Optional[np.memmap] = None
+        with self._lock, file_lock(self.lock_path):
+            self._sync()
+
+    # Clave: hash del texto normalizado (el modelo ya separa el directorio)
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha1(clean_text(text).encode("utf-8")).hexdigest()
+
+    # Pone el índice al día con el disco (con el cerrojo de fichero tomado): lee solo
+    # la cola nueva del registro, o todo si otro proceso lo compactó
+    def _sync(self) -> None:
+        try:
+            with open(self.log_path, "rb") as f:
+                head = f.readline()
+                if head != self._head:
+                    parts = head.split()
+                    if len(parts) != 3 or parts[:2] != [b"dim", str(self.dim).encode()] or not self.data_path.exists():
+                        return self._reset()
+                    self._head, self._log_pos = head, len(head)
+                    self._index = OrderedDict()
+                    self._mmap = None
+                f.seek(self._log_pos)
+                data = f.read()
+        except FileNotFoundError:
+            return self._reset()
+        data = data[:data.rfind(b"\n") + 1]          # una línea a medias (proceso caído) se ignora
+        self._log_pos += len(data)
+        self._rows = self.data_path.stat().st_size // (4 * self.dim)
+        for line in data.splitlines():
+            parts = line.split()
+            if len(parts) == 2 and parts[1].isdigit() and int(parts[1]) < self._rows:
+                self._index[parts[0].decode()] = int(parts[1])
+        while len(self._index) > self.max_entries:        # lo recargado respeta el límite
+            self._index.popitem(last=False)
+
+    # Reescribe ambos ficheros con las entradas dadas; sin ellas se empieza de cero
+    # (registro ausente, corrupto o de otra dimensión)
+    def _reset(self, live: Optional[np.ndarray] = None, keys: Optional[List[str]] = None) -> None:
+        keys = keys or []
+        head = f"dim {self.dim} {uuid.uuid4().hex}\n".encode()
+        tmp = self.data_path.with_suffix(".tmp")
+        tmp.write_bytes(np.ascontiguousarray(live, dtype=np.float32).tobytes() if keys else b"")
+        os.replace(tmp, self.data_path)
+        tmp = self.log_path.with_suffix(".tmp")
+        tmp.write_bytes(head + "".join(f"{k} {i}\n" for i, k in enumerate(keys)).encode())
+        os.replace(tmp, self.log_path)
+        (self.dir / "index.json").unlink(missing_ok=True)     # formato anterior
+        self._index = OrderedDict((k, i) for i, k in enumerate(keys))
+        self._rows = len(keys)
+        self._head, self._log_pos = head, self.log_path.stat().st_size
+        self._mmap = None
+
+    def _vectors(self) -> np.ndarray:
+        if self._mmap is None or self._mmap.shape[0] != self._rows:
+            self._mmap = np.memmap(self.data_path, dtype=np.float32, mode="r", shape=(self._rows, self.dim))
+        return self._mmap
+
+    # Búsqueda por lotes: devuelve un vector (o None si falla) por clave
+    def get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        with self._lock, file_lock(self.lock_path):
+            self._sync()
+            rows = [self._index.get(k) for k in keys]
+            found = [r for r in rows if r is not None]
+            vecs = np.asarray(self._vectors()[found]) if found else None
+            out, j = [], 0
+            for k, r in zip(keys, rows):
+                if r is None:
+                    out.append(None)
+                    self.misses += 1
+                else:
+                    out.append(vecs[j])
+                    j += 1
+                    self.hits += 1
+                    self._index.move_to_end(k)
+            return out
+
+    # Añade vectores tras la última fila completa del fichero y apunta las claves en el registro
+    def put_many(self, keys: List[str], vecs: np.ndarray) -> None:
+        vecs = np.ascontiguousarray(vecs, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock, file_lock(self.lock_path):
+            self._sync()
+            new: Dict[str, np.ndarray] = {}
+            for k, v in zip(keys, vecs):
+                if k not in self._index and k not in new:
+                    new[k] = v
+            if not new:
+                return
+            start = self._rows
+            with open(self.data_path, "r+b") as f:
+                f.seek(start * 4 * self.dim)
+                f.write(np.stack(list(new.values())).tobytes())
+            with open(self.log_path, "ab") as f:
+                f.write("".join(f"{k} {start + i}\n" for i, k in enumerate(new)).encode())
+                self._log_pos = f.tell()
+            for i, k in enumerate(new):
+                self._index[k] = start + i
+            self._rows = start + len(new)
+            self._evict()
+
+    # Expulsión LRU acotada por nº de entradas; compacta si sobran filas muertas
+    def _evict(self) -> None:
+        while len(self._index) > self.max_entries:
+            self._index.popitem(last=False)
+        if self._rows - len(self._index) > max(1024, len(self._index)):
+            self._compact()
+
+    # Reescribe solo las filas vivas (nueva cabecera: los demás procesos recargan)
+    def _compact(self) -> None:
+        live = list(self._index.items())
+        vecs = np.asarray(self._vectors()[[r for _, r in live]]) if live else None
+        self._reset(vecs, [k for k, _ in live])
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "model": self.model_name,
+                "entries": len(self._index),
+                "max_entries": self.max_entries,
+                "bytes": self._rows * self.dim * 4,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
@@ -1,15 +1,131 @@
-from typing import List, Dict
-from sentence_transformers import SentenceTransformer
+from typing import List, Dict, Optional
+from pathlib import Path
+import os, threading
 import numpy as np
+from .embedding_cache import EmbeddingCache
+from . import metrics
 
 
-# Cargamos el modelo una sola vez
-_model = SentenceTransformer("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+EMB_MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+EMB_CACHE_DIR = Path(os.getenv("EMB_CACHE_DIR", "data/emb_cache"))
+EMB_CACHE_MAX_ENTRIES = int(os.getenv("EMB_CACHE_MAX_ENTRIES", "200000"))   # 0 = sin caché
+EMB_TORCH_THREADS = int(os.getenv("EMB_TORCH_THREADS", "0"))                # 0 = valor por defecto de torch
+
+# Registro único de modelos del proceso: una instancia por nombre, compartida por
+# la ingesta (documentos) y la UI (consultas). Se carga en el primer uso.
+_models: Dict[str, object] = {}
+_caches: Dict[str, EmbeddingCache] = {}
+_lock = threading.Lock()
+
+
+# Acceso thread-safe al modelo (y a su caché, que depende de la dimensión)
+def get_model(model_name: str = EMB_MODEL_NAME):
+    model = _models.get(model_name)
+    if model is not None:
+        return model
+    with _lock:
+        model = _models.get(model_name)
+        if model is None:
+            import torch
+            from sentence_transformers import SentenceTransformer
+            if EMB_TORCH_THREADS > 0:
+                torch.set_num_threads(EMB_TORCH_THREADS)   # afecta a todo el proceso
+            with metrics.span("embed_model_load"):
+                model = SentenceTransformer(model_name)
+            if EMB_CACHE_MAX_ENTRIES > 0:
+                _caches[model_name] = EmbeddingCache(EMB_CACHE_DIR, model_name, model.get_sentence_embedding_dimension(), EMB_CACHE_MAX_ENTRIES)
+            _models[model_name] = model
+    return model
+
+
+# Precarga el modelo (por defecto en un hilo en segundo plano)
+def warmup(model_name: str = EMB_MODEL_NAME, background: bool = True) -> Optional[threading.Thread]:
+    if not background:
+        get_model(model_name)
+        return None
+    t = threading.Thread(target=get_model, args=(model_name,), name="warmup-embeddings", daemon=True)
+    t.start()
+    return t
 
 
 # Devuelve un array [n, dim] con embeddings para cada texto.
-def embed_texts(texts: List[str]) -> np.ndarray:
-    return _model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
+# Solo los textos que no están en caché pasan por el modelo (en un único lote).
+@metrics.timed("embed_texts")
+def embed_texts(texts: List[str], model_name: str = EMB_MODEL_NAME) -> np.ndarray:
+    model = get_model(model_name)
+    cache = _caches.get(model_name)
+    if cache is None:
+        metrics.inc("embed_texts_total", len(texts), result="uncached")
+        with metrics.span("embed_encode"):
+            return model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
+
+    keys = [cache.key(t) for t in texts]
+    found = cache.get_many(keys)
+    out = np.empty((len(texts), cache.dim), dtype=np.float32)
+
+    # Fallos únicos (un mismo texto repetido se codifica una vez)
+    missing: Dict[str, List[int]] = {}
+    for i, (k, v) in enumerate(zip(keys, found)):
+        if v is None:
+            missing.setdefault(k, []).append(i)
+        else:
+            out[i] = v
+    n_miss = sum(len(v) for v in missing.values())
+    metrics.inc("embed_texts_total", len(texts) - n_miss, result="hit")
+    metrics.inc("embed_texts_total", n_miss, result="miss")
+    if missing:
+        miss_keys = list(missing)
+        with metrics.span("embed_encode"):
+            embs = model.encode([texts[missing[k][0]] for k in miss_keys], convert_to_numpy=True, show_progress_bar=False)
+        cache.put_many(miss_keys, embs)
+        for k, e in zip(miss_keys, embs):
+            out[missing[k]] = e
+    return out
+
+
+# Embedding [dim] de una pregunta, con el mismo modelo que los documentos.
+# No pasa por la caché en disco: las preguntas rara vez se repiten y escribirlas
+# ahí (bajo el lock entre procesos) solo desplazaría embeddings de documentos.
+@metrics.timed("embed_query")
+def embed_query(question: str, model_name: str = EMB_MODEL_NAME) -> np.ndarray:
+    model = get_model(model_name)
+    metrics.inc("embed_texts_total", 1, result="query")
+    with metrics.span("embed_encode"):
+        return np.asarray(model.encode([question], convert_to_numpy=True, show_progress_bar=False)[0], dtype=np.float32)
+
+
+# Longitud en tokens de cada texto con el tokenizer del modelo (sin tokens especiales)
+def token_lengths(texts: List[str], model_name: str = EMB_MODEL_NAME) -> List[int]:
+    if not texts:
+        return []
+    tokenizer = get_model(model_name).tokenizer
+    return [len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]]
+
+
+# Tokens de texto que caben sin truncar (max_seq_length menos [CLS]/[SEP] o <s>/</s>)
+def max_tokens(model_name: str = EMB_MODEL_NAME) -> int:
+    return int(get_model(model_name).max_seq_length) - 2
+
+
+# Contadores de la caché de embeddings (hits/misses/tamaño)
+def embedding_cache_stats(model_name: str = EMB_MODEL_NAME) -> Dict:
+    cache = _caches.get(model_name)
+    return cache.stats() if cache is not None else {"entries": 0, "hits": 0, "misses": 0, "hit_rate": 0.0}
+
+
+# Memoria de los modelos cargados (parámetros + buffers) e hilos de torch
+def embedding_models_info() -> Dict:
+    info = {"models": {}, "torch_threads": None}
+    for name, model in list(_models.items()):
+        tensors = list(model.parameters()) + list(model.buffers())
+        info["models"][name] = {
+            "bytes": sum(t.numel() * t.element_size() for t in tensors),
+            "dim": model.get_sentence_embedding_dimension(),
+        }
+    if _models:
+        import torch
+        info["torch_threads"] = torch.get_num_threads()
+    return info
 
 
 # Añade embeddings a cada chunk del transcript.
@@ -19,6 +135,6 @@ def embed_chunks(chunks: List[Dict]) -> List[Dict]:
     out = []
     for c, e in zip(chunks, embs):
         c2 = dict(c)
-        c2["embedding"] = e.tolist()  # guardamos como lista para JSON/DB
+        c2["embedding"] = e   # fila float32 del lote (sin copiar); los stores la convierten si hace falta
         out.append(c2)
     return out
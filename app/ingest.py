@@ -1,121 +1,185 @@
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator, Callable, Optional, Tuple
 from youtube_transcript_api import (
     YouTubeTranscriptApi,
     TranscriptsDisabled,
     NoTranscriptFound,
 )
 from .utils import clean_text
-import tempfile, os, re
-import json, time, random
+from . import metrics
+from .transcript_cache import TranscriptColumns, migrate_json, normalize_rows, read_rows, write_rows
+import codecs, html, os, re
+import logging, time, random
 from pathlib import Path
 
+log = logging.getLogger(__name__)
 
-# Caché local de transcripciones
+
+# Caché local de transcripciones (formato columnar mapeable, ver transcript_cache)
 CACHE_DIR = Path("data/transcripts")
 CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
 def _cache_path(video_id: str) -> Path:
-    return CACHE_DIR / f"{video_id}.json"
+    return CACHE_DIR / f"{video_id}.trc"
 
 def _load_cached_transcript(video_id: str):
     p = _cache_path(video_id)
-    if p.exists():
-        try:
-            return json.loads(p.read_text(encoding="utf-8"))
-        except Exception:
+    if not p.exists():
+        legacy = CACHE_DIR / f"{video_id}.json"   # caché antigua: se migra al leerla
+        if not legacy.exists() or migrate_json(legacy) is None:
             return None
-    return None
+    try:
+        return read_rows(p)
+    except (OSError, ValueError):
+        log.warning("Caché de transcripción ilegible, se descarta: %s", p, exc_info=True)
+        return None
 
 def _save_cached_transcript(video_id: str, rows):
     try:
-        _cache_path(video_id).write_text(json.dumps(rows, ensure_ascii=False), encoding="utf-8")
+        write_rows(_cache_path(video_id), rows)
     except Exception:
-        pass
+        log.warning("No se pudo guardar la caché de %s", video_id, exc_info=True)
 
 
-# Parser de VTT a filas {text, start, duration}
-def _parse_vtt_to_rows(vtt_text: str):
-    def ts_to_seconds(ts):
-        parts = ts.replace(",", ".").split(":")
-        parts = [float(p) for p in parts]
-        if len(parts) == 3:
-            h, m, s = parts
-        else:
-            h, m, s = 0.0, parts[0], parts[1]
-        return h*3600 + m*60 + s
-
-    rows = []
-    lines = vtt_text.splitlines()
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
+# Parser de VTT en streaming: consume líneas y emite filas {text, start, duration}
+# según se cierran los cues. Admite ajustes tras el tiempo final ("align:start
+# position:0%"), identificadores de cue, etiquetas (<c>, <i>, <00:00:01.500>) y entidades.
+_VTT_TAG = re.compile(r"<[^>]*>")
+
+
+def _vtt_ts_to_seconds(ts: str) -> float:
+    parts = [float(p) for p in ts.replace(",", ".").split(":")]
+    if len(parts) == 3:
+        h, m, s = parts
+    else:
+        h, m, s = 0.0, parts[0], parts[1]
+    return h*3600 + m*60 + s
+
+
+def _iter_vtt_rows(lines: Iterable[str]) -> Iterator[Dict]:
+    start = end = None
+    text_lines: List[str] = []
+
+    def flush():
+        text = html.unescape(_VTT_TAG.sub("", " ".join(text_lines)))
+        text = re.sub(r"\s+", " ", text).strip()
+        if text:
+            return {"text": text, "start": start, "duration": max(0.0, end - start)}
+        return None
+
+    for raw in lines:
+        line = raw.strip()
         if "-->" in line:
-            start_ts, end_ts = [p.strip() for p in line.split("-->")]
-            start = ts_to_seconds(start_ts)
-            end = ts_to_seconds(end_ts)
-            i += 1
+            if start is not None and (row := flush()):
+                yield row
+            start_ts, rest = [p.strip() for p in line.split("-->", 1)]
+            start, end = _vtt_ts_to_seconds(start_ts.split()[-1]), _vtt_ts_to_seconds(rest.split()[0])
             text_lines = []
-            while i < len(lines) and lines[i].strip() and "-->" not in lines[i]:
-                text_lines.append(lines[i].strip())
-                i += 1
-            text = re.sub(r"\s+", " ", " ".join(text_lines)).strip()
-            if text:
-                rows.append({"text": text, "start": start, "duration": max(0.0, end - start)})
-        i += 1
+        elif not line:
+            if start is not None and (row := flush()):
+                yield row
+            start, text_lines = None, []
+        elif start is not None:
+            text_lines.append(line)
+    if start is not None and (row := flush()):
+        yield row
+
+
+# Parser de VTT a filas {text, start, duration} (texto completo en memoria)
+def _parse_vtt_to_rows(vtt_text: str):
+    return list(_iter_vtt_rows(vtt_text.splitlines()))
+
+
+# Líneas de un flujo de bytes leído por bloques (sin cargar el fichero entero)
+def _iter_lines(read, chunk_size: int = 64 * 1024) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending = ""
+    while True:
+        data = read(chunk_size)
+        pending += decoder.decode(data or b"", final=not data)
+        *complete, pending = pending.split("\n")
+        yield from complete
+        if not data:
+            break
+    if pending:
+        yield pending
+
+
+# Pista manual de subtítulos preferida en un info de yt-dlp: (idioma, formato vtt) o None.
+# Mismo orden que la API (_track_rank); se ignoran automáticos y el chat en directo.
+def _pick_subtitle_track(info: Dict, lang_priority) -> Optional[Tuple[str, Dict]]:
+    best = None
+    for lang, formats in (info.get("subtitles") or {}).items():
+        if lang == "live_chat":
+            continue
+        vtt = next((f for f in formats if f.get("ext") == "vtt" and f.get("url")), None)
+        if vtt is None:
+            continue
+        rank = _track_rank(lang, lang_priority)
+        if rank[0] < 10_000 and (best is None or rank < best[0]):
+            best = (rank, lang, vtt)
+    return (best[1], best[2]) if best else None
+
+
+# Una sola consulta de metadatos (lista las pistas) y descarga solo la pista elegida
+def _fetch_subtitles_with(ydl, video_url: str, lang_priority, rate_limiter=None) -> List[Dict]:
+    if rate_limiter is not None:
+        rate_limiter.acquire()
+    metrics.inc("transcript_ytdlp_attempts_total")
+    info = ydl.extract_info(video_url, download=False)
+    picked = _pick_subtitle_track(info, lang_priority)
+    if picked is None:
+        available = sorted(k for k in (info.get("subtitles") or {}) if k != "live_chat")
+        raise RuntimeError(
+            "yt-dlp no encontró subtítulos MANUALES en los idiomas solicitados "
+            f"(disponibles: {', '.join(available) or 'ninguno'})."
+        )
+    lang, track = picked
+    if rate_limiter is not None:
+        rate_limiter.acquire()
+    with ydl.urlopen(track["url"]) as resp:
+        rows = list(_iter_vtt_rows(_iter_lines(resp.read)))
+    if not rows:
+        raise RuntimeError(f"La pista de subtítulos '{lang}' está vacía.")
+    log.info("Subtítulos vía yt-dlp: %s (%d líneas)", lang, len(rows))
     return rows
 
 
 # yt-dlp (fallback) SOLO MANUALES (no autosubs)
+@metrics.timed("transcript_ytdlp")
 def _get_transcript_via_ytdlp(
     video_url: str,
     lang_priority=("es", "es-419", "en", "en-GB", "pt-BR", "pt"),
     cookiefile: str | None = None,
     cookiesfrombrowser: tuple | None = None,   
+    rate_limiter=None,
+    attempts: int = 2,
 ):
     from yt_dlp import YoutubeDL
 
-    common = {
+    opts = {
         "skip_download": True,
-        "writesubtitles": True,          
-        "writeautomaticsub": False,      
-        "subtitlesformat": "vtt",
         "quiet": True,
         "no_warnings": True,
         "http_headers": {"User-Agent": "Mozilla/5.0"},
         "retries": 8,
         "retry_sleep": "exp",
-        "sleep_interval_requests": 1.0,
-        "max_sleep_interval_requests": 3.0,
     }
     if cookiefile and os.path.exists(cookiefile):
-        common["cookiefile"] = cookiefile
+        opts["cookiefile"] = cookiefile
     if cookiesfrombrowser:
-        common["cookiesfrombrowser"] = cookiesfrombrowser
-
-    # Intentar idiomas en orden
-    for attempt_lang, lang in enumerate(lang_priority, start=1):
-        with tempfile.TemporaryDirectory() as tmpd:
-            opts = dict(common, outtmpl=os.path.join(tmpd, "%(id)s.%(ext)s"), subtitleslangs=[lang])
-            try:
-                with YoutubeDL(opts) as ydl:
-                    info = ydl.extract_info(video_url, download=False)
-                    ydl.download([video_url])
-                vid_id = info["id"]
-                vtts = [p for p in os.listdir(tmpd) if p.startswith(vid_id) and p.endswith(".vtt")]
-                if not vtts:
-                    time.sleep(0.8 + random.random() * 0.7)
-                    continue
-                with open(os.path.join(tmpd, vtts[0]), "r", encoding="utf-8") as f:
-                    vtt_txt = f.read()
-                rows = _parse_vtt_to_rows(vtt_txt)
-                if rows:
-                    return rows
-            except Exception:
-                time.sleep(min(3.0, 0.8 * (1.6 ** attempt_lang)) + random.random() * 0.9)
-                continue
+        opts["cookiesfrombrowser"] = cookiesfrombrowser
 
-    # No intentamos 'all' porque reintroduciría autosubs
-    raise RuntimeError("yt-dlp no encontró subtítulos MANUALES en los idiomas solicitados.")
+    # Un reintento corto solo para errores de red/extracción (no si faltan pistas)
+    for attempt in range(attempts):
+        try:
+            with YoutubeDL(opts) as ydl:
+                return _fetch_subtitles_with(ydl, video_url, lang_priority, rate_limiter=rate_limiter)
+        except RuntimeError:
+            raise
+        except Exception:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(0.8 + random.random() * 0.7)
 
 
 # Preferencia de idioma y selección de pista
@@ -126,15 +190,23 @@ def _prefer_lang_code(lang_code: str, preferred=("es", "en")) -> int:
             return i
     return 10_000  
 
+# Orden de una pista: prioridad del idioma; a igual prioridad, el código pedido tal cual
+# ("es" antes que "es-419"), manual antes que automática y, por último, el código, para
+# que el desempate no dependa del orden en que YouTube liste las pistas
+def _track_rank(lang_code: str, preferred=("es", "en"), generated: bool = False) -> Tuple:
+    lang_code = (lang_code or "").lower()
+    prio = _prefer_lang_code(lang_code, preferred)
+    exact = prio < len(preferred) and lang_code == preferred[prio].lower()
+    return (prio, not exact, generated, lang_code)
+
 def _best_track(transcripts, preferred=("es", "en")):
     manuals = []
     for tr in transcripts:
         if getattr(tr, "is_generated", False):
             continue  # ignoramos autogenerados
-        prio = _prefer_lang_code(tr.language_code, preferred)
-        manuals.append((prio, tr))
+        manuals.append((_track_rank(tr.language_code, preferred, False), tr))
     manuals.sort(key=lambda x: x[0])
-    if manuals and manuals[0][0] < 10_000:
+    if manuals and manuals[0][0][0] < 10_000:
         return manuals[0][1]
     return None
 
@@ -152,6 +224,7 @@ def has_manual_subs(video_id: str, cookies: str | None = None) -> bool:
 
 
 # Descarga subtítulos (manuales)
+@metrics.timed("transcript_fetch")
 def get_transcript_auto(
     video_id: str,
     preferred_langs: tuple = ("es", "en"),
@@ -161,25 +234,36 @@ def get_transcript_auto(
     fallback_url: str | None = None,
     max_retries: int = 4,
     backoff_base: float = 1.5,
+    rate_limiter=None,   # TokenBucket compartido (ingesta por lotes)
 ):
     # 0) Cache local
     cached = _load_cached_transcript(video_id)
     if cached:
+        metrics.inc("transcript_cache_total", result="hit")
         return cached
+    metrics.inc("transcript_cache_total", result="miss")
 
     # 1) API con reintentos (solo manuales)
     for attempt in range(max_retries):
+        metrics.inc("transcript_api_attempts_total")
         try:
+            if rate_limiter is not None:
+                rate_limiter.acquire()
             transcripts = YouTubeTranscriptApi.list_transcripts(video_id, cookies=cookies)
             tr = _best_track(transcripts, preferred=preferred_langs)  # ignora autogenerados
             if tr is None:
                 raise RuntimeError("Este vídeo no tiene subtítulos manuales disponibles en los idiomas preferidos.")
-            rows = tr.fetch()
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            rows = normalize_rows(tr.fetch())
             _save_cached_transcript(video_id, rows)
+            metrics.inc("transcript_source_total", source="api")
             return rows
         except (TranscriptsDisabled, NoTranscriptFound):
+            metrics.inc("transcript_api_errors_total", kind="no_transcript")
             break
         except Exception:
+            metrics.inc("transcript_api_errors_total", kind="error")
             if attempt < max_retries - 1:
                 time.sleep(backoff_base ** attempt)
                 continue
@@ -187,51 +271,170 @@ def get_transcript_auto(
 
     # 2) Fallback con yt-dlp SOLO manuales
     if fallback_url:
+        metrics.inc("transcript_fallback_total")
         rows = _get_transcript_via_ytdlp(
             fallback_url,
             lang_priority=("es", "es-419", "en", "en-GB", "pt-BR", "pt"),
             cookiefile=cookiefile,
             cookiesfrombrowser=cookiesfrombrowser,
+            rate_limiter=rate_limiter,
         )
         _save_cached_transcript(video_id, rows)
+        metrics.inc("transcript_source_total", source="ytdlp")
         return rows
 
     raise RuntimeError("No se pudieron obtener subtítulos manuales (API + fallback).")
 
 
-# Segmentación/chunking de los subtítulos
-def segment_transcript(
+# Cadena completa de intentos (la de la UI): anónimo → cookies.txt → cookies del navegador.
+# on_warning recibe los avisos para mostrarlos (la UI o el log del job).
+def get_transcript_with_fallbacks(
+    video_id: str,
+    url: str,
+    preferred_langs: tuple = ("es", "en"),
+    cookiefile: str = "cookies.txt",
+    browsers: tuple = (("chrome",), ("edge",)),
+    on_warning=None,
+):
+    try:
+        return get_transcript_auto(
+            video_id,
+            preferred_langs=preferred_langs,
+            fallback_url=url,
+            cookiefile=cookiefile,
+            max_retries=6,
+            backoff_base=2.0,
+        )
+    except Exception as e:
+        first_error = e
+
+    if cookiefile and Path(cookiefile).exists():
+        try:
+            return get_transcript_auto(video_id, preferred_langs=preferred_langs, fallback_url=url, cookiefile=cookiefile)
+        except Exception:
+            pass
+
+    for browser in browsers:
+        if on_warning:
+            on_warning(f"No pude obtener subtítulos de forma anónima ({first_error}). Intentando usar cookies de {browser[0]}…")
+        try:
+            return get_transcript_auto(video_id, preferred_langs=preferred_langs, fallback_url=url, cookiesfrombrowser=browser)
+        except Exception:
+            continue
+
+    raise RuntimeError(
+        "No se pudieron obtener subtítulos (API + yt-dlp). "
+        "Prueba a exportar cookies a 'cookies.txt' o cierra el navegador/usa el flag "
+        "--disable-features=LockProfileCookieDatabase y reintenta."
+    )
+
+
+# Columnas (inicios, finales, texto por índice) de una lista de dicts o de una caché columnar
+def _columns(rows):
+    if isinstance(rows, TranscriptColumns):
+        starts = rows.start.tolist()
+        ends = (rows.start + rows.duration).tolist()
+        return starts, ends, rows.text
+    starts = [r["start"] for r in rows]
+    ends = [r["start"] + r["duration"] for r in rows]
+    return starts, ends, lambda i: rows[i]["text"]
+
+
+# Segmentación/chunking de los subtítulos (generador: cada chunk sale en cuanto
+# se cierra su ventana, sin esperar al resto del vídeo)
+def iter_segments(
     rows: List[Dict],
     window: int = 60,
     overlap: int = 12
-) -> List[Dict]:
-    if not rows:
-        return []
+) -> Iterator[Dict]:
+    if not len(rows):
+        return
 
-    end_total = max(r["start"] + r["duration"] for r in rows)
-    segments: List[Dict] = []
+    starts, ends, text_at = _columns(rows)
+    end_total = max(ends)
     start = 0.0
 
+    # Barrido sobre las líneas ordenadas por inicio: cada línea entra una vez
+    # en la ventana activa y sale una vez, O(n log n) en vez de O(n × ventanas)
+    order = sorted(range(len(starts)), key=starts.__getitem__)
+    nxt = 0
+    active: List[int] = []
+
     while start < end_total:
         end = start + window
 
-        # Reunimos todas las líneas que intersectan [start, end)
-        texts = []
-        for r in rows:
-            line_start = r["start"]
-            line_end = r["start"] + r["duration"]
-            if line_start < end and line_end > start:
-                texts.append(r["text"])
+        # Entran las líneas que empiezan antes del final de la ventana
+        while nxt < len(order) and starts[order[nxt]] < end:
+            active.append(order[nxt])
+            nxt += 1
+
+        # Salen las que terminan antes del inicio (las ventanas solo avanzan)
+        active = [i for i in active if ends[i] > start]
+
+        # Reunimos todas las líneas que intersectan [start, end), en su orden original
+        texts = [text_at(i) for i in sorted(active)]
 
         chunk_text = clean_text(" ".join(texts))
 
         if chunk_text:
-            segments.append({
+            yield {
                 "start_sec": float(start),
                 "end_sec": float(min(end, end_total)),
                 "text": chunk_text
-            })
+            }
 
         start += (window - overlap)
 
-    return segments
+
+def segment_transcript(
+    rows: List[Dict],
+    window: int = 60,
+    overlap: int = 12
+) -> List[Dict]:
+    return list(iter_segments(rows, window=window, overlap=overlap))
+
+
+# Segmentación por presupuesto de tokens: empaqueta líneas completas de subtítulos
+# (en orden de inicio) hasta max_tokens medidos con el tokenizer del modelo de
+# embeddings, así ningún chunk se trunca al codificarlo y los silencios no gastan
+# vectores. Cada chunk repite las últimas líneas del anterior hasta overlap_tokens.
+# Los tiempos son los reales: inicio de la primera línea y final de la última.
+# Una línea que por sí sola supera el presupuesto va sola en su chunk.
+def iter_token_segments(
+    rows: List[Dict],
+    count_tokens: Callable[[List[str]], List[int]],
+    max_tokens: int = 126,
+    overlap_tokens: int = 24,
+) -> Iterator[Dict]:
+    if not len(rows):
+        return
+    if not 0 <= overlap_tokens < max_tokens:
+        raise ValueError("overlap_tokens debe estar entre 0 y max_tokens - 1")
+
+    starts, ends, text_at = _columns(rows)
+    lines = [(i, clean_text(text_at(i))) for i in sorted(range(len(starts)), key=starts.__getitem__)]
+    order = [i for i, t in lines if t]
+    texts = [t for _, t in lines if t]
+    lens = count_tokens(texts)
+
+    k = 0
+    while k < len(order):
+        # Llenamos el chunk con líneas enteras mientras quepan
+        j, used = k, 0
+        while j < len(order) and (j == k or used + lens[j] <= max_tokens):
+            used += lens[j]
+            j += 1
+        yield {
+            "start_sec": float(starts[order[k]]),
+            "end_sec": float(max(ends[order[m]] for m in range(k, j))),
+            "text": " ".join(texts[k:j]),
+        }
+        if j >= len(order):
+            break
+
+        # El siguiente empieza por la cola de este que quepa en overlap_tokens
+        nxt, tail = j, 0
+        while nxt - 1 > k and tail + lens[nxt - 1] <= overlap_tokens:
+            nxt -= 1
+            tail += lens[nxt]
+        k = nxt
@@ -0,0 +1,255 @@
+from typing import Dict, Iterator, List, Optional, Callable
+from contextlib import contextmanager
+from pathlib import Path
+import json, logging, os, sqlite3, sys, threading, time, uuid
+
+log = logging.getLogger(__name__)
+
+
+# Cola local de trabajos de indexación (SQLite) con un pool de workers en hilos.
+# La UI encola y consulta el progreso; el trabajo sobrevive a recargas del navegador
+# y, con JOBS_WORKERS=1, dos usuarios no compiten por la CPU (se indexa de uno en uno).
+# Un mismo vídeo no se encola dos veces mientras tenga un trabajo pendiente o en curso.
+#
+# También puede correr en otro proceso:  python -m app.jobs  (solo workers, sin UI)
+JOBS_DB = Path(os.getenv("JOBS_DB", "data/jobs/jobs.db"))
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "1"))
+JOBS_STALE_SEC = float(os.getenv("JOBS_STALE_SEC", "300"))   # sin latido → se reencola
+JOBS_POLL_SEC = 0.5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id         TEXT PRIMARY KEY,
+    video_id   TEXT NOT NULL,
+    url        TEXT NOT NULL,
+    params     TEXT NOT NULL,
+    status     TEXT NOT NULL,          -- queued | running | done | failed
+    embedded   INTEGER NOT NULL DEFAULT 0,
+    upserted   INTEGER NOT NULL DEFAULT 0,
+    total_est  INTEGER NOT NULL DEFAULT 0,
+    message    TEXT,
+    result     TEXT,
+    error      TEXT,
+    created    REAL NOT NULL,
+    started    REAL,
+    heartbeat  REAL,
+    finished   REAL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_active_video ON jobs(video_id) WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs(status, created);
+"""
+
+
+# Cadena por defecto: subtítulos (con todos los reintentos) → segmentar → embeber → subir
+def run_index_job(video_id: str, url: str, params: Dict, progress: Callable[..., None]) -> Dict:
+    from .ingest import get_transcript_with_fallbacks
+    from .pipeline import estimate_chunks, index_video, segment_params
+    from .vector_store import ensure_index
+
+    progress(message="Descargando subtítulos…")
+    rows = get_transcript_with_fallbacks(
+        video_id,
+        url,
+        preferred_langs=tuple(params.get("langs", ("es", "es-419", "en"))),
+        on_warning=lambda m: progress(message=m),
+    )
+    seg = segment_params(
+        params.get("window", 60),
+        params.get("overlap", 12),
+        params.get("title"),
+        params.get("lang"),
+        mode=params.get("mode"),
+        max_tokens=params.get("max_tokens"),
+        overlap_tokens=params.get("overlap_tokens"),
+    )
+    progress(total_est=estimate_chunks(rows, seg), message="Indexando…")
+    ensure_index()
+    return index_video(
+        video_id,
+        rows,
+        window=seg.get("window", 60),
+        overlap=seg.get("overlap", 12),
+        title=seg["title"],
+        lang=seg["lang"],
+        mode=seg["mode"],
+        max_tokens=seg.get("max_tokens"),
+        overlap_tokens=seg.get("overlap_tokens"),
+        on_progress=lambda embedded, upserted: progress(embedded=embedded, upserted=upserted),
+    )
+
+
+class JobQueue:
+    def __init__(self, db_path: Path = JOBS_DB, workers: int = JOBS_WORKERS, runner: Callable = run_index_job):
+        self.db_path = Path(db_path)
+        self.workers = workers
+        self.runner = runner
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.executescript(_SCHEMA)
+
+    # Una conexión por operación: sqlite3 no comparte conexiones entre hilos
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        con = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        con.row_factory = sqlite3.Row
+        try:
+            yield con
+        finally:
+            con.close()
+
+    @staticmethod
+    def _row(r: Optional[sqlite3.Row]) -> Optional[Dict]:
+        if r is None:
+            return None
+        d = dict(r)
+        d["params"] = json.loads(d["params"])
+        d["result"] = json.loads(d["result"]) if d["result"] else None
+        return d
+
+    # Encola un vídeo; si ya tiene un trabajo pendiente o en curso devuelve ese id
+    def submit(self, video_id: str, url: str, params: Optional[Dict] = None) -> str:
+        job_id = uuid.uuid4().hex
+        with self._connect() as con:
+            try:
+                con.execute(
+                    "INSERT INTO jobs (id, video_id, url, params, status, created) VALUES (?, ?, ?, ?, 'queued', ?)",
+                    (job_id, video_id, url, json.dumps(params or {}), time.time()),
+                )
+                return job_id
+            except sqlite3.IntegrityError:
+                row = con.execute(
+                    "SELECT id FROM jobs WHERE video_id = ? AND status IN ('queued', 'running')", (video_id,)
+                ).fetchone()
+                if row is None:      # terminó entre el INSERT y el SELECT
+                    return self.submit(video_id, url, params)
+                return row["id"]
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._connect() as con:
+            return self._row(con.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def active_for(self, video_id: str) -> Optional[Dict]:
+        with self._connect() as con:
+            return self._row(con.execute(
+                "SELECT * FROM jobs WHERE video_id = ? AND status IN ('queued', 'running')", (video_id,)
+            ).fetchone())
+
+    def list(self, limit: int = 20) -> List[Dict]:
+        with self._connect() as con:
+            return [self._row(r) for r in con.execute("SELECT * FROM jobs ORDER BY created DESC LIMIT ?", (limit,))]
+
+    # Toma el trabajo más antiguo de forma atómica (varios hilos o procesos a la vez)
+    def _claim(self) -> Optional[Dict]:
+        now = time.time()
+        with self._connect() as con:
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                # Trabajos "running" sin latido: su proceso murió, vuelven a la cola
+                con.execute(
+                    "UPDATE jobs SET status = 'queued', message = 'Reintentando tras una interrupción' "
+                    "WHERE status = 'running' AND heartbeat < ?",
+                    (now - JOBS_STALE_SEC,),
+                )
+                row = con.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1").fetchone()
+                if row is not None:
+                    con.execute(
+                        "UPDATE jobs SET status = 'running', started = ?, heartbeat = ?, error = NULL WHERE id = ?",
+                        (now, now, row["id"]),
+                    )
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+        return self._row(row)
+
+    def _update(self, job_id: str, **fields) -> None:
+        fields["heartbeat"] = time.time()
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._connect() as con:
+            con.execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+
+    # Ejecuta un trabajo; devuelve False si no había ninguno
+    def run_once(self) -> bool:
+        job = self._claim()
+        if job is None:
+            return False
+        last = [0.0]
+
+        def progress(**fields):
+            # Limita las escrituras a ~4/s salvo mensajes (que siempre se guardan)
+            now = time.time()
+            if "message" in fields or now - last[0] >= 0.25:
+                last[0] = now
+                self._update(job["id"], **fields)
+
+        # Latido periódico aunque el runner no informe (p. ej. reintentos de subtítulos)
+        running = threading.Event()
+        def beat():
+            while not running.wait(JOBS_STALE_SEC / 5):
+                self._update(job["id"])
+        threading.Thread(target=beat, name=f"heartbeat-{job['id'][:8]}", daemon=True).start()
+
+        try:
+            result = self.runner(job["video_id"], job["url"], job["params"], progress)
+        except Exception as e:
+            log.warning("Trabajo %s (%s) fallido", job["id"], job["video_id"], exc_info=True)
+            self._update(job["id"], status="failed", error=str(e), finished=time.time())
+            return True
+        finally:
+            running.set()
+        self._update(
+            job["id"],
+            status="done",
+            embedded=result.get("chunks", 0),
+            upserted=result.get("upserted", 0),
+            result=json.dumps(result),
+            message=None,
+            finished=time.time(),
+        )
+        return True
+
+    def _worker(self) -> None:
+        while not self._stop.is_set():
+            try:
+                if not self.run_once():
+                    self._stop.wait(JOBS_POLL_SEC)
+            except Exception:
+                log.exception("Error en el worker de indexación")
+                self._stop.wait(JOBS_POLL_SEC)
+
+    def start(self) -> "JobQueue":
+        if self._threads:
+            return self
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"index-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+
+# Proceso dedicado de workers (la UI puede arrancarse con JOBS_WORKERS=0): lo que
+# reescribe en disco (vectores, BM25, caché de respuestas) la UI lo relee por firma de fichero
+def main(argv: List[str] | None = None) -> int:
+    logging.basicConfig(level=logging.INFO)
+    workers = int(argv[0]) if argv else max(1, JOBS_WORKERS)
+    queue = JobQueue(workers=workers).start()
+    print(f"Workers de indexación: {workers} | cola: {queue.db_path}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        queue.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,427 @@
+from typing import List, Dict, Optional
+import os, json, threading, time
+import numpy as np
+from pathlib import Path
+from dotenv import load_dotenv
+from . import metrics, quantize
+from .ann import IVFIndex, default_nlist
+
+load_dotenv()
+
+
+# Índice vectorial local: una matriz float32 contigua por vídeo en data/index/<video_id>/
+LOCAL_INDEX_DIR = Path(os.getenv("LOCAL_INDEX_DIR", "data/index"))
+
+DIM = 384        # MiniLM L12 v2
+METRIC = "cosine"
+
+# Formato de búsqueda: float32 | float16 | int8. Con float16/int8 se recorre la copia
+# cuantizada (codes-<tipo>.npy) y los RESCORE_FACTOR·k mejores candidatos se reordenan
+# con los float32 de vectors.npy, que solo se leen (mmap) para esas filas.
+LOCAL_VECTOR_DTYPE = quantize.check_dtype(os.getenv("LOCAL_VECTOR_DTYPE", "float32").strip().lower())
+RESCORE_FACTOR = int(os.getenv("RESCORE_FACTOR", "4"))
+
+# Índice aproximado (IVF) para consultas sin video_id; por debajo de ANN_MIN_VECTORS
+# la búsqueda exacta es igual de rápida y no se entrena nada
+LOCAL_ANN = os.getenv("LOCAL_ANN", "1") == "1"
+ANN_MIN_VECTORS = int(os.getenv("ANN_MIN_VECTORS", "50000"))
+ANN_NLIST = int(os.getenv("ANN_NLIST", "0"))             # 0 = ~4·√N
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "8"))           # listas recorridas por consulta
+ANN_RETRAIN_GROWTH = 4.0                                 # reentrena si el índice crece x4
+ANN_TRAIN_SAMPLE = 100_000
+
+_lock = threading.RLock()
+_videos: Dict[str, Dict] = {}   # video_id -> {"ids", "meta", "vecs", "codes", "scales", "stamp"}
+_ann: Optional[IVFIndex] = None
+_ann_stamps: Dict[str, tuple] = {}   # video_id -> firma de sus ficheros al meterlo en el IVF
+
+
+def _video_dir(video_id: str) -> Path:
+    return LOCAL_INDEX_DIR / video_id
+
+
+def _ann_dir() -> Path:
+    return LOCAL_INDEX_DIR / "_ann"
+
+
+# Escritura atómica: fichero temporal + rename
+def _atomic_save_npy(path: Path, arr: np.ndarray) -> None:
+    tmp = path.with_suffix(".tmp.npy")
+    np.save(tmp, arr)
+    os.replace(tmp, path)
+
+def _atomic_write_json(path: Path, obj) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(obj, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+# Normaliza filas a norma 1 (coseno = producto escalar)
+def _normalize(m: np.ndarray) -> np.ndarray:
+    m = np.ascontiguousarray(m, dtype=np.float32)
+    norms = np.linalg.norm(m, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
+
+
+# Copia cuantizada de los vectores de un vídeo (se genera la primera vez y se cachea en disco)
+def _load_codes(d: Path, vecs: np.ndarray):
+    if LOCAL_VECTOR_DTYPE == "float32":
+        return vecs, None
+    codes_path, scales_path = d / f"codes-{LOCAL_VECTOR_DTYPE}.npy", d / f"scales-{LOCAL_VECTOR_DTYPE}.npy"
+    try:
+        codes = np.load(codes_path, mmap_mode="r")
+        scales = np.load(scales_path, mmap_mode="r") if LOCAL_VECTOR_DTYPE == "int8" else None
+        if len(codes) == len(vecs):
+            return codes, scales
+    except (OSError, ValueError):
+        pass
+    codes, scales = quantize.quantize(vecs, LOCAL_VECTOR_DTYPE)
+    _atomic_save_npy(codes_path, codes)
+    if scales is not None:
+        _atomic_save_npy(scales_path, scales)
+    return codes, scales
+
+
+# Firma (inodo, mtime, tamaño) de vectors.npy y meta.json; None si falta alguno.
+# Se escriben con rename, así que cada reescritura cambia al menos el inodo.
+def _stamp(d: Path) -> Optional[tuple]:
+    try:
+        return tuple((st.st_ino, st.st_mtime_ns, st.st_size) for st in ((d / "vectors.npy").stat(), (d / "meta.json").stat()))
+    except OSError:
+        return None
+
+
+# Carga (memory-mapped) los vectores de un vídeo; si otro proceso (worker, CLI por
+# lotes) reescribió sus ficheros, la firma cambia y se releen
+def _load_video(video_id: str) -> Optional[Dict]:
+    with _lock:
+        d = _video_dir(video_id)
+        stamp = _stamp(d)
+        entry = _videos.get(video_id)
+        if entry is not None and entry["stamp"] == stamp:
+            return entry
+        _videos.pop(video_id, None)
+        if stamp is None:
+            return None
+        vec_path, meta_path = d / "vectors.npy", d / "meta.json"
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        vecs = np.load(vec_path, mmap_mode="r")
+        if len(vecs) != len(meta["ids"]):
+            return None           # otro proceso está a mitad de reescribirlo
+        codes, scales = _load_codes(d, vecs)
+        entry = {
+            "ids": meta["ids"],
+            "meta": meta["metadata"],
+            "vecs": vecs,
+            "codes": codes,
+            "scales": scales,
+            "stamp": stamp,
+        }
+        _videos[video_id] = entry
+        return entry
+
+
+# Descarta las matrices cargadas (se releen del disco en la siguiente consulta)
+def reset_client() -> None:
+    global _ann
+    with _lock:
+        _videos.clear()
+        _ann = None
+        _ann_stamps.clear()
+
+
+def _all_video_ids() -> List[str]:
+    if not LOCAL_INDEX_DIR.exists():
+        return []
+    return sorted(p.name for p in LOCAL_INDEX_DIR.iterdir() if (p / "vectors.npy").exists())
+
+
+# Crea el directorio del índice si no existe
+def ensure_index(index_name: str = "local", dim: int = DIM) -> None:
+    LOCAL_INDEX_DIR.mkdir(parents=True, exist_ok=True)
+
+
+# Sube los chunks al índice (sobrescribe ids existentes; offset = posición del primer chunk).
+# Devuelve el mismo informe que pinecone_store.upsert_chunks (un único lote).
+@metrics.timed("local_upsert")
+def upsert_chunks(
+    chunks_with_embs: List[Dict],
+    video_id: str,
+    title: Optional[str] = None,
+    lang: Optional[str] = None,
+    offset: int = 0,
+) -> Dict:
+    t0 = time.perf_counter()
+    if not chunks_with_embs:
+        return {"upserted": 0, "batches": [], "seconds": 0.0, "vectors_per_sec": 0.0}
+    ids, metas = [], []
+    for i, c in enumerate(chunks_with_embs):
+        ids.append(f"{video_id}:{offset + i}")   # id único por chunk
+        metas.append({
+            "video_id": video_id,
+            "start_sec": float(c["start_sec"]),
+            "end_sec": float(c["end_sec"]),
+            "text": c["text"],
+            **({"title": title} if title else {}),
+            **({"lang": lang} if lang else {}),
+        })
+    new_vecs = _normalize(np.stack([np.asarray(c["embedding"], dtype=np.float32) for c in chunks_with_embs]))
+
+    with _lock:
+        old = _load_video(video_id)
+        if old is not None:
+            all_ids = list(old["ids"])
+            all_meta = list(old["meta"])
+            vecs = np.array(old["vecs"], dtype=np.float32)
+            pos = {vid: j for j, vid in enumerate(all_ids)}
+            extra = []
+            for k, vid in enumerate(ids):
+                if vid in pos:
+                    vecs[pos[vid]] = new_vecs[k]
+                    all_meta[pos[vid]] = metas[k]
+                else:
+                    extra.append(k)
+                    all_ids.append(vid)
+                    all_meta.append(metas[k])
+            if extra:
+                vecs = np.vstack([vecs, new_vecs[extra]])
+        else:
+            all_ids, all_meta, vecs = ids, metas, new_vecs
+
+        d = _video_dir(video_id)
+        d.mkdir(parents=True, exist_ok=True)
+        _atomic_save_npy(d / "vectors.npy", np.ascontiguousarray(vecs, dtype=np.float32))
+        _atomic_write_json(d / "meta.json", {"ids": all_ids, "metadata": all_meta})
+        _videos.pop(video_id, None)
+        _refresh_derived(video_id)
+    dt = time.perf_counter() - t0
+    return {
+        "upserted": len(ids),
+        "batches": [{"batch": 0, "vectors": len(ids), "attempts": 1, "seconds": dt}],
+        "seconds": dt,
+        "vectors_per_sec": len(ids) / dt if dt > 0 else float("inf"),
+    }
+
+
+# Borra vectores por id ("video_id:i"); los ids que no existen se ignoran
+@metrics.timed("local_delete")
+def delete_ids(ids: List[str]) -> int:
+    by_video: Dict[str, set] = {}
+    for i in ids:
+        by_video.setdefault(i.split(":", 1)[0], set()).add(i)
+    deleted = 0
+    with _lock:
+        for video_id, drop in by_video.items():
+            old = _load_video(video_id)
+            if old is None:
+                continue
+            keep = [j for j, vid in enumerate(old["ids"]) if vid not in drop]
+            if len(keep) == len(old["ids"]):
+                continue
+            deleted += len(old["ids"]) - len(keep)
+            d = _video_dir(video_id)
+            _atomic_save_npy(d / "vectors.npy", np.ascontiguousarray(old["vecs"][keep], dtype=np.float32))
+            _atomic_write_json(d / "meta.json", {"ids": [old["ids"][j] for j in keep], "metadata": [old["meta"][j] for j in keep]})
+            _videos.pop(video_id, None)
+            _refresh_derived(video_id)
+    return deleted
+
+
+# Asignación a listas IVF de un vídeo, cacheada en disco por versión de centroides
+def _ann_lists(ann: IVFIndex, video_id: str, vecs: np.ndarray) -> np.ndarray:
+    path = _video_dir(video_id) / f"ivf-{ann.version}.npy"
+    try:
+        lists = np.load(path)
+        if len(lists) == len(vecs):
+            return lists
+    except (OSError, ValueError):
+        pass
+    lists = ann.assign(vecs)
+    _atomic_save_npy(path, lists)
+    return lists
+
+
+# Mete (o sustituye) un vídeo en el IVF y apunta con qué ficheros se hizo
+def _ann_add(ann: IVFIndex, video_id: str, entry: Dict) -> None:
+    ann.add(video_id, entry["vecs"], _ann_lists(ann, video_id, entry["vecs"]))
+    _ann_stamps[video_id] = entry["stamp"]
+
+
+def _ann_remove(ann: IVFIndex, video_id: str) -> None:
+    ann.remove(video_id)
+    _ann_stamps.pop(video_id, None)
+
+
+# Tras reescribir un vídeo: borra sus ficheros derivados (asignaciones IVF, copias
+# cuantizadas) y lo reinserta en el IVF cargado
+def _refresh_derived(video_id: str) -> None:
+    for pattern in ("ivf-*.npy", "codes-*.npy", "scales-*.npy"):
+        for p in _video_dir(video_id).glob(pattern):
+            p.unlink(missing_ok=True)
+    if _ann is None:
+        return
+    entry = _load_video(video_id)
+    if entry is None or len(entry["ids"]) == 0:
+        _ann_remove(_ann, video_id)
+    else:
+        _ann_add(_ann, video_id, entry)
+
+
+# Entrena los centroides con una muestra de todos los vídeos y recarga el IVF
+@metrics.timed("local_ann_build")
+def build_ann(nlist: Optional[int] = None, seed: int = 0) -> Optional[IVFIndex]:
+    global _ann
+    with _lock:
+        entries = [(vid, _load_video(vid)) for vid in _all_video_ids()]
+        entries = [(vid, e) for vid, e in entries if e is not None and len(e["ids"])]
+        total = sum(len(e["ids"]) for _, e in entries)
+        if total == 0:
+            return None
+        nlist = nlist or ANN_NLIST or default_nlist(total)
+        rng = np.random.default_rng(seed)
+        frac = min(1.0, ANN_TRAIN_SAMPLE / total)
+        sample = np.concatenate([
+            e["vecs"][np.sort(rng.choice(len(e["ids"]), max(1, round(len(e["ids"]) * frac)), replace=False))]
+            for _, e in entries
+        ])
+        ann = IVFIndex.train(sample, nlist, seed=seed, dtype=LOCAL_VECTOR_DTYPE)
+        d = _ann_dir()
+        d.mkdir(parents=True, exist_ok=True)
+        _atomic_save_npy(d / "centroids.npy", ann.centroids)
+        _atomic_write_json(d / "meta.json", {"version": ann.version, "nlist": ann.nlist, "trained_on": total})
+        for p in LOCAL_INDEX_DIR.glob("*/ivf-*.npy"):
+            if p.name != f"ivf-{ann.version}.npy":
+                p.unlink(missing_ok=True)
+        _ann_stamps.clear()
+        for vid, e in entries:
+            _ann_add(ann, vid, e)
+        _ann = ann
+        return ann
+
+
+# IVF listo para consultar (lo carga o entrena bajo demanda); None → búsqueda exacta,
+# también si el corpus vivo baja de ANN_MIN_VECTORS (se comprueba en cada llamada).
+# Sincroniza los vídeos añadidos, borrados o reescritos (firma de ficheros distinta)
+# desde otro proceso, para que las filas guardadas en el IVF sigan siendo válidas.
+def _get_ann(video_ids: List[str]) -> Optional[IVFIndex]:
+    global _ann
+    if not LOCAL_ANN:
+        return None
+    with _lock:
+        entries = {vid: _load_video(vid) for vid in video_ids}
+        entries = {vid: e for vid, e in entries.items() if e is not None and len(e["ids"])}
+        total = sum(len(e["ids"]) for e in entries.values())
+        if total < ANN_MIN_VECTORS:
+            return None
+        if _ann is None:
+            d = _ann_dir()
+            try:
+                meta = json.loads((d / "meta.json").read_text(encoding="utf-8"))
+                ann = IVFIndex(np.load(d / "centroids.npy"), dtype=LOCAL_VECTOR_DTYPE)
+            except (OSError, ValueError):
+                meta, ann = None, None
+            if ann is None or ann.version != meta.get("version") or total > ANN_RETRAIN_GROWTH * meta["trained_on"]:
+                return build_ann()
+            _ann_stamps.clear()
+            for vid, entry in entries.items():
+                _ann_add(ann, vid, entry)
+            _ann = ann
+            return _ann
+        for vid in set(_ann.keys()) - set(entries):
+            _ann_remove(_ann, vid)
+        for vid, entry in entries.items():
+            if _ann_stamps.get(vid) != entry["stamp"]:
+                _ann_add(_ann, vid, entry)
+        return _ann
+
+
+# Asegura que el vector es un array float32 normalizado
+def _as_array(vec) -> np.ndarray:
+    if isinstance(vec, (np.ndarray, list)):
+        return _normalize(np.asarray(vec, dtype=np.float32).reshape(-1))
+    raise TypeError(f"query_embedding debe ser list o numpy.ndarray, no {type(vec)}")
+
+
+# Puntuación float32 exacta de unas filas (lee del mmap solo esas filas)
+def _rescore(entry: Dict, rows: np.ndarray, q: np.ndarray) -> np.ndarray:
+    return np.asarray(entry["vecs"][rows], dtype=np.float32) @ q
+
+
+# Top-k por coseno: un matmul + argpartition sobre la copia de búsqueda; si está
+# cuantizada, los RESCORE_FACTOR·k mejores se reordenan en float32.
+# Devuelve (filas, puntuaciones) de mayor a menor.
+def _top_k(entry: Dict, q: np.ndarray, k: int):
+    n = len(entry["ids"])
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    scores = quantize.scores(entry["codes"], entry["scales"], q)
+    quantized = entry["scales"] is not None or entry["codes"].dtype != np.float32
+    kc = min(n, k * RESCORE_FACTOR) if quantized else k
+    idx = np.argpartition(-scores, kc - 1)[:kc]
+    if quantized:
+        idx = np.sort(idx)
+        scores = _rescore(entry, idx, q)
+        best = np.argsort(-scores, kind="stable")[:k]
+        return idx[best], scores[best]
+    idx = idx[np.argsort(-scores[idx], kind="stable")]
+    return idx, scores[idx]
+
+
+# Consulta k vecinos más cercanos. Sin video_id y con índice grande usa el IVF
+# (nprobe listas; por defecto ANN_NPROBE); exact=True fuerza la búsqueda exacta.
+@metrics.timed("local_query")
+def query(query_embedding, top_k: int = 4, video_id: Optional[str] = None, nprobe: Optional[int] = None, exact: bool = False) -> List[Dict]:
+    q = _as_array(query_embedding)
+    video_ids = [video_id] if video_id else _all_video_ids()
+
+    cands = []
+    ann = None if (video_id or exact) else _get_ann(video_ids)
+    if ann is not None:
+        metrics.inc("local_ann_queries_total")
+        quantized = ann.dtype != "float32"
+        k, probe = (top_k * RESCORE_FACTOR if quantized else top_k), nprobe or ANN_NPROBE
+        found = ann.search(q, k, probe)
+        # Con listas poco pobladas nprobe listas pueden no llegar a top_k: se amplía
+        # (nprobe = nlist recorre todo el índice)
+        while len(found) < min(top_k, len(ann)) and probe < ann.nlist:
+            probe = min(ann.nlist, probe * 4)
+            found = ann.search(q, k, probe)
+        # Candidatos agrupados por vídeo: una carga y (si está cuantizado) un rescore por vídeo
+        by_video: Dict[str, List] = {}
+        for score, vid, j in found:
+            by_video.setdefault(vid, []).append((j, score))
+        for vid, hits in by_video.items():
+            entry = _load_video(vid)
+            if entry is None:
+                continue
+            hits = sorted(h for h in hits if h[0] < len(entry["ids"]))
+            rows = np.array([j for j, _ in hits], dtype=np.int64)
+            scores = _rescore(entry, rows, q).tolist() if quantized and len(rows) else [s for _, s in hits]
+            for j, score in zip(rows.tolist(), scores):
+                cands.append((score, entry["ids"][j], entry["meta"][j]))
+        video_ids = []
+
+    for vid in video_ids:
+        entry = _load_video(vid)
+        if entry is None or len(entry["ids"]) == 0:
+            continue
+        idx, scores = _top_k(entry, q, top_k)
+        for j, score in zip(idx.tolist(), scores.tolist()):
+            cands.append((score, entry["ids"][j], entry["meta"][j]))
+
+    cands.sort(key=lambda x: x[0], reverse=True)
+    out = []
+    for score, chunk_id, md in cands[:top_k]:
+        out.append({
+            "id": chunk_id,
+            "score": score,
+            "video_id": md.get("video_id"),
+            "start_sec": md.get("start_sec"),
+            "end_sec": md.get("end_sec"),
+            "text": md.get("text"),
+            "title": md.get("title"),
+            "lang": md.get("lang"),
+        })
+    return out
@@ -0,0 +1,97 @@
+from typing import List, Dict, Optional
+from pathlib import Path
+import hashlib, json, os, time
+
+
+# Manifiesto de indexación por vídeo (data/manifests/<video_id>.json): con qué
+# transcripción, parámetros y modelo se indexó, y el hash de cada chunk por posición
+# (el chunk i es el vector "video_id:i"). Permite saltarse vídeos sin cambios, subir
+# solo los chunks que cambian y borrar los ids que sobran.
+MANIFEST_DIR = Path(os.getenv("MANIFEST_DIR", "data/manifests"))
+FORMAT_VERSION = 1
+
+
+# Hash estable de la transcripción (dicts o caché columnar)
+def transcript_hash(rows) -> str:
+    h = hashlib.sha1()
+    for r in rows:
+        h.update(f"{float(r['start']):.3f}|{float(r['duration']):.3f}|{r['text']}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+# Hash de un chunk: texto (→ embedding) y tiempos (→ metadata)
+def chunk_hash(chunk: Dict) -> str:
+    raw = f"{float(chunk['start_sec']):.3f}|{float(chunk['end_sec']):.3f}|{chunk['text']}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _path(video_id: str) -> Path:
+    return MANIFEST_DIR / f"{video_id}.json"
+
+
+def load_manifest(video_id: str) -> Optional[Dict]:
+    try:
+        m = json.loads(_path(video_id).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return m if m.get("version") == FORMAT_VERSION else None
+
+
+def save_manifest(manifest: Dict) -> None:
+    p = _path(manifest["video_id"])
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, p)
+
+
+def build_manifest(video_id: str, thash: str, params: Dict, model: str, backend: str, chunk_hashes: List[str]) -> Dict:
+    return {
+        "version": FORMAT_VERSION,
+        "video_id": video_id,
+        "transcript_hash": thash,
+        "params": params,            # pipeline.segment_params: modo, ventana o tokens, title, lang
+        "model": model,
+        "backend": backend,
+        "chunk_count": len(chunk_hashes),
+        "chunks": chunk_hashes,
+        "updated": time.time(),
+    }
+
+
+# ¿Se indexó exactamente con esta transcripción, parámetros, modelo y backend?
+def is_current(manifest: Optional[Dict], thash: str, params: Dict, model: str, backend: str) -> bool:
+    return (
+        manifest is not None
+        and manifest["transcript_hash"] == thash
+        and manifest["params"] == params
+        and manifest["model"] == model
+        and manifest["backend"] == backend
+    )
+
+
+# Hashes por posición que siguen siendo válidos en el índice. Si cambia el modelo, el
+# backend o la metadata común (título/idioma), no se reaprovecha ningún vector.
+def reusable_hashes(manifest: Optional[Dict], params: Dict, model: str, backend: str) -> List[str]:
+    if manifest is None or manifest["model"] != model or manifest["backend"] != backend:
+        return []
+    old = manifest["params"]
+    if (old.get("title"), old.get("lang")) != (params.get("title"), params.get("lang")):
+        return []
+    return list(manifest["chunks"])
+
+
+# Posiciones cuyo chunk es nuevo o distinto del indexado (start = posición del primero)
+def changed_positions(old_hashes: List[str], hashes: List[str], start: int = 0) -> List[int]:
+    return [start + k for k, h in enumerate(hashes) if start + k >= len(old_hashes) or old_hashes[start + k] != h]
+
+
+# Agrupa posiciones ordenadas en tramos contiguos [(inicio, fin_exclusivo), ...]
+def contiguous_runs(positions: List[int]) -> List[tuple]:
+    runs = []
+    for p in positions:
+        if runs and runs[-1][1] == p:
+            runs[-1][1] = p + 1
+        else:
+            runs.append([p, p + 1])
+    return [tuple(r) for r in runs]
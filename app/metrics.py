@@ -0,0 +1,200 @@
+from typing import Dict, List, Optional, Tuple
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+import atexit, functools, os, threading, time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+# Métricas ligeras del proceso: contadores, histogramas de latencia y spans.
+#   METRICS_ENABLED=1  activa la recogida (desactivada, cada llamada es un if y vuelve)
+#   METRICS_PORT=9108  sirve /metrics en formato de texto de Prometheus
+#   METRICS_FILE=...   vuelca el mismo texto a un fichero al salir (o con write_prometheus)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0") == "1"
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+PREFIX = "ytrag_"
+
+# Cubos de latencia (segundos): de una consulta local (ms) a una generación del LLM (decenas de s)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, Labels], float] = {}
+_histograms: Dict[Tuple[str, Labels], List] = {}        # [cuentas por cubo..., suma, total]
+_recent: deque = deque(maxlen=200)                       # últimos spans (depuración)
+_local = threading.local()
+
+
+def _labels(labels: Dict) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1.0, **labels) -> None:
+    if not METRICS_ENABLED:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0.0) + value
+
+
+def observe(name: str, seconds: float, **labels) -> None:
+    if not METRICS_ENABLED:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = [0] * len(BUCKETS) + [0.0, 0]
+        for i, b in enumerate(BUCKETS):
+            if seconds <= b:
+                h[i] += 1
+                break
+        h[-2] += seconds
+        h[-1] += 1
+
+
+# Span con nombre: mide la duración del bloque en el histograma span_seconds{span=...}
+# y anota el span padre (por hilo) para ver de dónde sale el tiempo.
+def span(name: str, **labels):
+    if not METRICS_ENABLED:
+        return _NOOP
+    return _span(name, labels)
+
+
+_NOOP = nullcontext()
+
+
+# Decorador equivalente a envolver la función en span(name)
+def timed(name: str):
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not METRICS_ENABLED:
+                return fn(*args, **kwargs)
+            with _span(name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+@contextmanager
+def _span(name: str, labels: Dict):
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    parent = stack[-1] if stack else None
+    stack.append(name)
+    t0 = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        dt = time.perf_counter() - t0
+        stack.pop()
+        observe("span_seconds", dt, span=name, **labels)
+        if status == "error":
+            inc("span_errors_total", span=name)
+        with _lock:
+            _recent.append({"span": name, "parent": parent, "seconds": dt, "status": status, "labels": labels, "ts": time.time()})
+
+
+def recent_spans(n: int = 50) -> List[Dict]:
+    with _lock:
+        return list(_recent)[-n:]
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+        _recent.clear()
+
+
+def _fmt_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+
+# Exposición en formato de texto de Prometheus (v0.0.4)
+def render_prometheus() -> str:
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: list(v) for k, v in _histograms.items()}
+
+    lines: List[str] = []
+    for name in sorted({n for n, _ in counters}):
+        lines.append(f"# TYPE {PREFIX}{name} counter")
+        for (n, labels), v in sorted(counters.items()):
+            if n == name:
+                lines.append(f"{PREFIX}{name}{_fmt_labels(labels)} {v:g}")
+    for name in sorted({n for n, _ in histograms}):
+        lines.append(f"# TYPE {PREFIX}{name} histogram")
+        for (n, labels), h in sorted(histograms.items()):
+            if n != name:
+                continue
+            cum = 0
+            for b, c in zip(BUCKETS, h):
+                cum += c
+                lines.append(f"{PREFIX}{name}_bucket{_fmt_labels(labels, ('le', f'{b:g}'))} {cum}")
+            lines.append(f"{PREFIX}{name}_bucket{_fmt_labels(labels, ('le', '+Inf'))} {h[-1]}")
+            lines.append(f"{PREFIX}{name}_sum{_fmt_labels(labels)} {h[-2]:.6f}")
+            lines.append(f"{PREFIX}{name}_count{_fmt_labels(labels)} {h[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: str = METRICS_FILE) -> None:
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_suffix(p.suffix + ".tmp")
+    tmp.write_text(render_prometheus(), encoding="utf-8")
+    os.replace(tmp, p)
+
+
+_server = None
+
+
+# Endpoint local /metrics (hilo en segundo plano); devuelve el servidor o None
+def start_http_server(port: int = METRICS_PORT, host: str = "127.0.0.1"):
+    global _server
+    if _server is not None or port <= 0:
+        return _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") not in ("", "/metrics"):
+                self.send_error(404)
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    _server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    return _server
+
+
+# Arranca las salidas configuradas por entorno (endpoint y/o volcado a fichero al salir)
+def start_exporter() -> None:
+    if not METRICS_ENABLED:
+        return
+    if METRICS_PORT > 0:
+        start_http_server(METRICS_PORT)
+    if METRICS_FILE:
+        atexit.register(write_prometheus, METRICS_FILE)
@@ -1,9 +1,10 @@
 from typing import List, Dict, Optional, Tuple
-import os
+import os, threading
 import numpy as np
 from dotenv import load_dotenv
-from pinecone import Pinecone, ServerlessSpec
 from .utils import hhmmss, time_url
+from .batching import iter_batches, send_batches
+from . import metrics
 
 load_dotenv()
 
@@ -12,49 +13,112 @@ PINECONE_API_KEY = os.getenv("PINECONE_API_KEY", "")
 PINECONE_INDEX = os.getenv("PINECONE_INDEX", "rag-youtube-idx")
 PINECONE_CLOUD = os.getenv("PINECONE_CLOUD", "aws")
 PINECONE_REGION = os.getenv("PINECONE_REGION", "us-east-1")
+PINECONE_HOST = os.getenv("PINECONE_HOST", "")            # opcional: evita consultar el host al plano de control
+PINECONE_POOL_SIZE = int(os.getenv("PINECONE_POOL_SIZE", "8"))   # conexiones HTTP reutilizables
+
+# Límites por petición de upsert (Pinecone: 1000 vectores / 2 MB) y concurrencia
+UPSERT_BATCH_VECTORS = int(os.getenv("PINECONE_UPSERT_BATCH", "100"))
+UPSERT_BATCH_BYTES = int(os.getenv("PINECONE_UPSERT_MAX_BYTES", "1800000"))
+UPSERT_WORKERS = int(os.getenv("PINECONE_UPSERT_WORKERS", "4"))
+UPSERT_MAX_RETRIES = int(os.getenv("PINECONE_UPSERT_RETRIES", "4"))
+DELETE_BATCH_IDS = 1000   # límite de ids por petición de delete
 
 DIM = 384        # MiniLM L12 v2
 METRIC = "cosine"
 
-
-# Verificamos que la configuración está bien
-def _client() -> Pinecone:
-    if not PINECONE_API_KEY:
-        raise RuntimeError("Falta PINECONE_API_KEY en el entorno (.env).")
-    return Pinecone(api_key=PINECONE_API_KEY)
-
-
-# Crea el índice serverless si no existe
-def ensure_index(index_name: str = PINECONE_INDEX, dim: int = DIM) -> None:
+# Handles compartidos por todo el proceso (cliente, índices y los ya verificados)
+_lock = threading.Lock()
+_pc = None
+_indexes: Dict[str, object] = {}
+_verified: set = set()
+
+
+# Verificamos que la configuración está bien (un único cliente por proceso;
+# el SDK de Pinecone se importa aquí, no al importar el módulo)
+def _client():
+    global _pc
+    if _pc is not None:
+        return _pc
+    with _lock:
+        if _pc is None:
+            if not PINECONE_API_KEY:
+                raise RuntimeError("Falta PINECONE_API_KEY en el entorno (.env).")
+            from pinecone import Pinecone
+            _pc = Pinecone(api_key=PINECONE_API_KEY, pool_threads=PINECONE_POOL_SIZE)
+        return _pc
+
+
+# Olvida cliente e índices cacheados y relee la configuración del entorno
+# (p. ej. tras cambiar la API key o el índice en .env)
+def reset_client() -> None:
+    global _pc, PINECONE_API_KEY, PINECONE_INDEX, PINECONE_CLOUD, PINECONE_REGION, PINECONE_HOST, PINECONE_POOL_SIZE
+    with _lock:
+        load_dotenv(override=True)
+        PINECONE_API_KEY = os.getenv("PINECONE_API_KEY", "")
+        PINECONE_INDEX = os.getenv("PINECONE_INDEX", "rag-youtube-idx")
+        PINECONE_CLOUD = os.getenv("PINECONE_CLOUD", "aws")
+        PINECONE_REGION = os.getenv("PINECONE_REGION", "us-east-1")
+        PINECONE_HOST = os.getenv("PINECONE_HOST", "")
+        PINECONE_POOL_SIZE = int(os.getenv("PINECONE_POOL_SIZE", "8"))
+        _pc = None
+        _indexes.clear()
+        _verified.clear()
+
+
+# Crea el índice serverless si no existe (solo se comprueba una vez por proceso)
+def ensure_index(index_name: Optional[str] = None, dim: int = DIM) -> None:
+    index_name = index_name or PINECONE_INDEX
+    if index_name in _verified:
+        return
     pc = _client()
     existing = {idx["name"] for idx in pc.list_indexes()}
-    if index_name in existing:
-        return
-    pc.create_index(
-        name=index_name,
-        dimension=dim,
-        metric=METRIC,
-        spec=ServerlessSpec(cloud=PINECONE_CLOUD, region=PINECONE_REGION),
-    )
-
-
-# Acceso al índice
-def _index():
+    if index_name not in existing:
+        from pinecone import ServerlessSpec
+        pc.create_index(
+            name=index_name,
+            dimension=dim,
+            metric=METRIC,
+            spec=ServerlessSpec(cloud=PINECONE_CLOUD, region=PINECONE_REGION),
+        )
+    _verified.add(index_name)
+
+
+# Acceso al índice (handle reutilizado, con su pool de conexiones)
+def _index(index_name: Optional[str] = None):
+    index_name = index_name or PINECONE_INDEX
+    idx = _indexes.get(index_name)
+    if idx is not None:
+        return idx
     pc = _client()
-    return pc.Index(PINECONE_INDEX)
-
-
-# Sube los chunks al índice
+    with _lock:
+        idx = _indexes.get(index_name)
+        if idx is None:
+            host = PINECONE_HOST if index_name == PINECONE_INDEX else ""
+            idx = pc.Index(
+                name=index_name,
+                host=host,
+                pool_threads=PINECONE_POOL_SIZE,
+                connection_pool_maxsize=PINECONE_POOL_SIZE,
+            )
+            _indexes[index_name] = idx
+        return idx
+
+
+# Sube los chunks al índice en lotes concurrentes (offset = posición del primer chunk en el vídeo).
+# Devuelve un informe con el total subido y latencia/throughput por lote.
+@metrics.timed("pinecone_upsert")
 def upsert_chunks(
     chunks_with_embs: List[Dict],
     video_id: str,
     title: Optional[str] = None,
     lang: Optional[str] = None,
-) -> int:
+    offset: int = 0,
+    index=None,
+) -> Dict:
     vecs = []
     for i, c in enumerate(chunks_with_embs):
         vecs.append({
-            "id": f"{video_id}:{i}",   # id único por chunk
+            "id": f"{video_id}:{offset + i}",   # id único por chunk
             "values": c["embedding"] if isinstance(c["embedding"], list) else c["embedding"].tolist(),
             "metadata": {
                 "video_id": video_id,
@@ -65,10 +129,28 @@ def upsert_chunks(
                 **({"lang": lang} if lang else {}),
             }
         })
-    idx = _index()
-    # idx.upsert(vectors=vecs, namespace=video_id) # opcional: namespace por video
-    idx.upsert(vectors=vecs)
-    return len(vecs)
+    idx = index if index is not None else _index()
+    batches = list(iter_batches(vecs, max_vectors=UPSERT_BATCH_VECTORS, max_bytes=UPSERT_BATCH_BYTES))
+    # idx.upsert(vectors=batch, namespace=video_id) # opcional: namespace por video
+
+    def send(batch):
+        with metrics.span("pinecone_upsert_request"):
+            idx.upsert(vectors=batch)
+
+    report = send_batches(send, batches, workers=UPSERT_WORKERS, max_retries=UPSERT_MAX_RETRIES)
+    metrics.inc("pinecone_upserted_vectors_total", report["upserted"])
+    return report
+
+
+# Borra vectores por id en lotes (mismo paralelismo y reintentos que el upsert)
+@metrics.timed("pinecone_delete")
+def delete_ids(ids: List[str], index=None) -> int:
+    if not ids:
+        return 0
+    idx = index if index is not None else _index()
+    batches = [ids[i:i + DELETE_BATCH_IDS] for i in range(0, len(ids), DELETE_BATCH_IDS)]
+    report = send_batches(lambda batch: idx.delete(ids=batch), batches, workers=UPSERT_WORKERS, max_retries=UPSERT_MAX_RETRIES)
+    return report["upserted"]   # nº de ids enviados
 
 
 # Asegura que el vector es una lista de floats
@@ -82,6 +164,7 @@ def _as_list(vec):
 
 
 # Consulta k vecinos más cercanos
+@metrics.timed("pinecone_query")
 def query(query_embedding, top_k: int = 4, video_id: Optional[str] = None) -> List[Dict]:
     idx = _index()
     flt = {"video_id": {"$eq": video_id}} if video_id else None
@@ -95,6 +178,7 @@ def query(query_embedding, top_k: int = 4, video_id: Optional[str] = None) -> Li
     for m in res["matches"]:
         md = m["metadata"]
         out.append({
+            "id": m["id"],
             "score": float(m["score"]),
             "video_id": md.get("video_id"),
             "start_sec": md.get("start_sec"),
@@ -0,0 +1,210 @@
+from typing import List, Dict, Optional, Callable, Iterator
+import os, queue, threading, time
+from .ingest import iter_segments, iter_token_segments
+from .embeddings import embed_chunks, max_tokens as model_max_tokens, token_lengths, EMB_MODEL_NAME
+from .vector_store import VECTOR_BACKEND, upsert_chunks, delete_ids
+from .answer_cache import invalidate_video
+from .bm25 import build_index, has_index
+from .manifest import (
+    build_manifest, changed_positions, chunk_hash, contiguous_runs, is_current, load_manifest, reusable_hashes,
+    save_manifest, transcript_hash,
+)
+
+
+EMBED_BATCH = 32     # chunks por lote de embeddings
+QUEUE_SIZE = 2       # lotes pendientes de subir (backpressure)
+
+# Segmentación: "time" (ventanas de window s con overlap s) o "tokens" (líneas enteras
+# hasta el límite del modelo de embeddings, con solape en tokens)
+SEGMENT_MODE = os.getenv("SEGMENT_MODE", "time").strip().lower()
+SEGMENT_MAX_TOKENS = int(os.getenv("SEGMENT_MAX_TOKENS", "0"))          # 0 = límite del modelo
+SEGMENT_OVERLAP_TOKENS = int(os.getenv("SEGMENT_OVERLAP_TOKENS", "24"))
+
+_DONE = object()
+
+
+# Parámetros de indexación (los que guarda el manifiesto): cambiar cualquiera reindexa
+def segment_params(
+    window: int = 60,
+    overlap: int = 12,
+    title: Optional[str] = None,
+    lang: Optional[str] = None,
+    mode: Optional[str] = None,
+    max_tokens: Optional[int] = None,
+    overlap_tokens: Optional[int] = None,
+) -> Dict:
+    mode = mode or SEGMENT_MODE
+    if mode == "time":
+        return {"mode": "time", "window": window, "overlap": overlap, "title": title, "lang": lang}
+    if mode == "tokens":
+        return {
+            "mode": "tokens",
+            "max_tokens": max_tokens or SEGMENT_MAX_TOKENS or model_max_tokens(),
+            "overlap_tokens": SEGMENT_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens,
+            "title": title,
+            "lang": lang,
+        }
+    raise ValueError(f"SEGMENT_MODE desconocido: {mode!r} (usa 'time' o 'tokens').")
+
+
+# Chunks del vídeo según el modo de segmentación de params
+def iter_chunks(rows, params: Dict) -> Iterator[Dict]:
+    if params["mode"] == "tokens":
+        return iter_token_segments(rows, token_lengths, max_tokens=params["max_tokens"], overlap_tokens=params["overlap_tokens"])
+    return iter_segments(rows, window=params["window"], overlap=params["overlap"])
+
+
+# Estimación del nº de chunks (para barras de progreso, antes de segmentar)
+def estimate_chunks(rows, params: Dict) -> int:
+    if params["mode"] == "tokens":
+        words = sum(len(r["text"].split()) for r in rows)
+        return max(1, int(words * 1.5 / (params["max_tokens"] - params["overlap_tokens"])) + 1)
+    end = max(r["start"] + r["duration"] for r in rows)
+    return max(1, int(end // (params["window"] - params["overlap"])) + 1)
+
+
+# Agrupa un iterador de chunks en lotes de tamaño fijo
+def _batched(chunks: Iterator[Dict], size: int) -> Iterator[List[Dict]]:
+    batch: List[Dict] = []
+    for c in chunks:
+        batch.append(c)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Estado incremental del vídeo frente a su manifiesto (compartido con la ingesta por
+# lotes): si está al día, hashes reutilizables por posición y nº de chunks indexados
+def plan_index(video_id: str, rows: List[Dict], params: Dict, force: bool = False) -> Dict:
+    thash = transcript_hash(rows)
+    manifest = load_manifest(video_id)
+    return {
+        "video_id": video_id,
+        "thash": thash,
+        "params": params,
+        "current": not force and is_current(manifest, thash, params, EMB_MODEL_NAME, VECTOR_BACKEND) and has_index(video_id),
+        "old_hashes": [] if force else reusable_hashes(manifest, params, EMB_MODEL_NAME, VECTOR_BACKEND),
+        "old_count": manifest["chunk_count"] if manifest else 0,
+    }
+
+
+# Cierre de una indexación incremental: borra los ids "video_id:i" que sobran, invalida
+# las respuestas cacheadas y reconstruye BM25 si algo cambió, y guarda el manifiesto.
+# Devuelve el nº de vectores borrados.
+def finish_index(plan: Dict, chunks: List[Dict], hashes: List[str], upserted: int) -> int:
+    video_id = plan["video_id"]
+    orphans = [f"{video_id}:{i}" for i in range(len(chunks), plan["old_count"])]
+    deleted = delete_ids(orphans) if orphans else 0
+    if upserted or deleted or not has_index(video_id):
+        invalidate_video(video_id)   # las respuestas cacheadas del vídeo dejan de valer
+        build_index(video_id, chunks)
+    save_manifest(build_manifest(video_id, plan["thash"], plan["params"], EMB_MODEL_NAME, VECTOR_BACKEND, hashes))
+    return deleted
+
+
+# Pipeline por etapas solapadas: segmentar → embeber (hilo actual) → subir (hilo aparte).
+# Mientras un lote se sube al índice, el siguiente ya se está codificando; la cola
+# acotada frena la codificación si el índice va más lento.
+#
+# Incremental: con el manifiesto del vídeo, si nada ha cambiado no se hace nada; si no,
+# solo se embeben y suben los chunks cuyo hash cambia en su posición y se borran los
+# ids "video_id:i" que sobran cuando la nueva segmentación tiene menos chunks.
+# force=True lo reindexa todo.
+def index_video(
+    video_id: str,
+    rows: List[Dict],
+    window: int = 60,
+    overlap: int = 12,
+    title: Optional[str] = None,
+    lang: Optional[str] = None,
+    batch_size: int = EMBED_BATCH,
+    queue_size: int = QUEUE_SIZE,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    force: bool = False,
+    mode: Optional[str] = None,
+    max_tokens: Optional[int] = None,
+    overlap_tokens: Optional[int] = None,
+) -> Dict:
+    t0 = time.perf_counter()
+    params = segment_params(window, overlap, title, lang, mode=mode, max_tokens=max_tokens, overlap_tokens=overlap_tokens)
+    plan = plan_index(video_id, rows, params, force=force)
+    if plan["current"]:
+        return {
+            "chunks": plan["old_count"],
+            "upserted": 0,
+            "unchanged": plan["old_count"],
+            "deleted": 0,
+            "skipped": True,
+            "batches": 0,
+            "first_upsert_sec": None,
+            "total_sec": time.perf_counter() - t0,
+        }
+    old_hashes = plan["old_hashes"]
+
+    q: "queue.Queue" = queue.Queue(maxsize=queue_size)
+    state = {"upserted": 0, "first_upsert_sec": None, "error": None}
+
+    def uploader():
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if state["error"] is not None:
+                continue   # drenamos la cola para no bloquear al productor
+            offset, batch = item
+            try:
+                report = upsert_chunks(batch, video_id=video_id, title=title, lang=lang, offset=offset)
+                state["upserted"] += report["upserted"]
+                if state["first_upsert_sec"] is None:
+                    state["first_upsert_sec"] = time.perf_counter() - t0
+            except Exception as e:
+                state["error"] = e
+
+    worker = threading.Thread(target=uploader, name=f"upsert-{video_id}", daemon=True)
+    worker.start()
+
+    embedded = 0   # chunks procesados (embebidos o sin cambios)
+    batches = 0
+    chunks: List[Dict] = []   # para el índice BM25 (mismos ids que los vectores)
+    hashes: List[str] = []
+    try:
+        for batch in _batched(iter_chunks(rows, params), batch_size):
+            if state["error"] is not None:
+                break
+            pos0 = len(chunks)
+            chunks.extend(batch)
+            hashes.extend(chunk_hash(c) for c in batch)
+            changed = [p - pos0 for p in changed_positions(old_hashes, hashes[pos0:], start=pos0)]
+            if changed:
+                embs = embed_chunks([batch[k] for k in changed])
+                cur = 0
+                for a, b in contiguous_runs(changed):   # un upsert por tramo de posiciones seguidas
+                    q.put((pos0 + a, embs[cur:cur + b - a]))
+                    cur += b - a
+                batches += 1
+            embedded += len(batch)
+            if on_progress:
+                on_progress(embedded, state["upserted"])
+    finally:
+        q.put(_DONE)
+        worker.join()
+
+    if state["error"] is not None:
+        raise state["error"]
+
+    deleted = finish_index(plan, chunks, hashes, state["upserted"])
+    if on_progress:
+        on_progress(embedded, state["upserted"])
+
+    return {
+        "chunks": embedded,
+        "upserted": state["upserted"],
+        "unchanged": len(chunks) - state["upserted"],
+        "deleted": deleted,
+        "skipped": False,
+        "batches": batches,
+        "first_upsert_sec": state["first_upsert_sec"],
+        "total_sec": time.perf_counter() - t0,
+    }
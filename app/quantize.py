@@ -0,0 +1,48 @@
+from typing import Optional, Tuple
+import numpy as np
+
+
+# Almacenamiento compacto de vectores normalizados para la búsqueda de candidatos:
+#   float32 → 4 B/dim (sin cuantizar)
+#   float16 → 2 B/dim
+#   int8    → 1 B/dim + 4 B de escala por vector (escala = max|x| / 127)
+# Los candidatos se reordenan después con los float32 originales (rescoring).
+DTYPES = ("float32", "float16", "int8")
+BLOCK = 1024    # filas por bloque al descomprimir (cabe en caché)
+
+
+def check_dtype(dtype: str) -> str:
+    if dtype not in DTYPES:
+        raise ValueError(f"Tipo de almacenamiento desconocido: {dtype!r} (usa {', '.join(DTYPES)}).")
+    return dtype
+
+
+# Codifica [n, dim] float32 → (códigos, escalas o None)
+def quantize(vecs: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    vecs = np.asarray(vecs, dtype=np.float32)
+    if check_dtype(dtype) == "float32":
+        return np.ascontiguousarray(vecs), None
+    if dtype == "float16":
+        return vecs.astype(np.float16), None
+    scales = np.abs(vecs).max(axis=1) / 127.0 if len(vecs) else np.empty(0, np.float32)
+    scales = np.where(scales == 0, 1.0, scales).astype(np.float32)
+    codes = np.clip(np.rint(vecs / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+# Productos escalares aproximados codes·q (numpy no tiene matmul rápido en float16/int8:
+# se pasa a float32 por bloques para no duplicar la matriz entera en memoria)
+def scores(codes: np.ndarray, scales: Optional[np.ndarray], q: np.ndarray) -> np.ndarray:
+    if codes.dtype == np.float32:
+        return codes @ q
+    out = np.empty(len(codes), dtype=np.float32)
+    for i in range(0, len(codes), BLOCK):
+        out[i:i + BLOCK] = codes[i:i + BLOCK].astype(np.float32) @ q
+    if scales is not None:
+        out *= scales
+    return out
+
+
+# Bytes por vector de cada formato (para informes de memoria)
+def bytes_per_vector(dim: int, dtype: str) -> int:
+    return {"float32": 4 * dim, "float16": 2 * dim, "int8": dim + 4}[check_dtype(dtype)]
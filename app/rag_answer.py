@@ -1,79 +1,279 @@
-from typing import List, Dict, Tuple
-from .utils import hhmmss, time_url
-from transformers import AutoModelForCausalLM, AutoTokenizer, TextGenerationPipeline
-import torch
-from transformers import StoppingCriteria, StoppingCriteriaList
-import re
+from typing import List, Dict, Tuple, Optional, Iterator, TYPE_CHECKING
+from .utils import hhmmss, time_url, rss_bytes
+from .answer_cache import AnswerCache, get_answer_cache
+from . import metrics
+import copy, os, re, threading, time
+
+# torch/transformers se importan al cargar el modelo, no al importar el módulo
+if TYPE_CHECKING:
+    from transformers import TextGenerationPipeline
 
 
 _DEFAULT_MODEL = "Qwen/Qwen2.5-1.5B-Instruct"
 # _DEFAULT_MODEL = "TinyLlama/TinyLlama-1.1B-Chat-v1.0"
 
-# Cargamos el modelo una sola vez
+# Precisión del LLM en CPU: "fp32" (por defecto), "bf16" (si la CPU lo soporta)
+# o "int8" (cuantización dinámica de las capas Linear)
+LLM_PRECISION = os.getenv("LLM_PRECISION", "fp32").strip().lower()
+_PRECISIONS = ("fp32", "bf16", "int8")
+
+# Cargamos el modelo una sola vez (en el primer uso)
 _tokenizer = None
 _model = None
-_pipe: TextGenerationPipeline | None = None
+_pipe: Optional["TextGenerationPipeline"] = None
+_loaded: Optional[Tuple[str, str]] = None   # (modelo, precisión) cargados
+_lock = threading.Lock()
+
+# KV-cache del prefijo del prompt (system + cabecera del turno de usuario)
+LLM_PREFIX_CACHE = os.getenv("LLM_PREFIX_CACHE", "1") != "0"
+_prefix_kv = None   # (ids del prefijo, past_key_values)
+
+# Métricas del LLM cargado (memoria, tokens/s)
+_stats: Dict = {}
+
+
+def _bf16_supported() -> bool:
+    import torch
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except Exception:
+        return False
 
 
-def _load_llm(model_name: str = _DEFAULT_MODEL) -> TextGenerationPipeline:
-    global _tokenizer, _model, _pipe
-    if _pipe is not None:
+# Precisión con la que se cargaría el modelo: valida y, si la CPU no tiene bf16 nativo,
+# cae a fp32 (sería más lento). La clave de la caché de respuestas usa la misma.
+def _resolve_precision(precision: Optional[str] = None) -> str:
+    precision = (precision or LLM_PRECISION).lower()
+    if precision not in _PRECISIONS:
+        raise ValueError(f"LLM_PRECISION desconocida: {precision!r} (usa {', '.join(_PRECISIONS)}).")
+    if precision == "bf16" and not _bf16_supported():
+        precision = "fp32"
+    return precision
+
+
+# Carga el modelo una vez; con precision=None reutiliza el ya cargado (o usa LLM_PRECISION
+# en la primera carga), y con una precisión explícita distinta lo recarga
+def _load_llm(model_name: str = _DEFAULT_MODEL, precision: Optional[str] = None) -> "TextGenerationPipeline":
+    global _tokenizer, _model, _pipe, _loaded, _prefix_kv
+    if precision is not None:
+        precision = _resolve_precision(precision)
+    if _pipe is not None and (precision is None or _loaded == (model_name, precision)):
         return _pipe
-    _tokenizer = AutoTokenizer.from_pretrained(model_name)
-    _model = AutoModelForCausalLM.from_pretrained(
-        model_name,
-        torch_dtype=torch.float32,   
-        low_cpu_mem_usage=True
-    )
-    _pipe = TextGenerationPipeline(
-        model=_model,
-        tokenizer=_tokenizer,
-        device=-1,                   
-        return_full_text=False
-    )
+    with _lock:
+        if _pipe is not None and (precision is None or _loaded == (model_name, precision)):
+            return _pipe
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer, TextGenerationPipeline
+
+        precision = precision or _resolve_precision()
+
+        # Liberamos el modelo anterior antes de cargar otro
+        _tokenizer = _model = _pipe = _prefix_kv = None
+        t0 = time.perf_counter()
+        with metrics.span("llm_load", precision=precision):
+            _tokenizer = AutoTokenizer.from_pretrained(model_name)
+            model = AutoModelForCausalLM.from_pretrained(
+                model_name,
+                torch_dtype=torch.bfloat16 if precision == "bf16" else torch.float32,
+                low_cpu_mem_usage=True
+            )
+            if precision == "int8":
+                model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        model.eval()
+        _model = model
+        _pipe = TextGenerationPipeline(
+            model=_model,
+            tokenizer=_tokenizer,
+            device=-1,                   
+            return_full_text=False
+        )
+        _loaded = (model_name, precision)
+        _stats.clear()
+        _stats.update({
+            "model": model_name,
+            "precision": precision,
+            "load_sec": time.perf_counter() - t0,
+            "rss_bytes": rss_bytes(),
+            "tokens": 0,
+            "gen_sec": 0.0,
+        })
     return _pipe
 
 
+# Memoria residente del proceso y rendimiento de generación del LLM cargado
+def llm_stats() -> Dict:
+    out = dict(_stats)
+    if out:
+        out["rss_bytes"] = rss_bytes()
+        out["tokens_per_sec"] = out["tokens"] / out["gen_sec"] if out["gen_sec"] > 0 else 0.0
+    return out
+
+
+# Precarga el LLM (por defecto en un hilo en segundo plano)
+def warmup(model_name: str = _DEFAULT_MODEL, background: bool = True) -> Optional[threading.Thread]:
+    if not background:
+        _load_llm(model_name)
+        return None
+    t = threading.Thread(target=_load_llm, args=(model_name,), name="warmup-llm", daemon=True)
+    t.start()
+    return t
+
+
 # Detiene la generación si el modelo empieza a escribir '[End of answer]'.
-class StopOnEnd(StoppingCriteria):
-    def __init__(self, tokenizer):
-        self.stop_ids = tokenizer("[End of answer]", add_special_tokens=False, return_tensors="pt").input_ids[0]
-    def __call__(self, input_ids, scores, **kwargs):
-        L = self.stop_ids.shape[0]
-        if input_ids.shape[1] >= L and (input_ids[0, -L:] == self.stop_ids).all():
-            return True
-        return False
+# La clase se crea al primer uso para no importar transformers al cargar el módulo.
+_StopOnEnd = None
 
+def _stop_on_end(tokenizer):
+    global _StopOnEnd
+    if _StopOnEnd is None:
+        from transformers import StoppingCriteria
 
-# Genera respuesta breve con LLM y contexto
-def generate_rag_answer(question: str, hits: List[Dict], model_name: str = _DEFAULT_MODEL) -> str:
-    pipe = _load_llm(model_name)
-
-    ctx_lines = []
-    for h in hits[:4]:
-        txt = h["text"].strip()
-        if len(txt) > 400:
-            txt = txt[:400] + "..."
-        rng = f"[{hhmmss(h['start_sec'])}–{hhmmss(h['end_sec'])}]"
-        ctx_lines.append(f"{rng} {txt}")
+        class StopOnEnd(StoppingCriteria):
+            def __init__(self, tokenizer):
+                self.stop_ids = tokenizer("[End of answer]", add_special_tokens=False, return_tensors="pt").input_ids[0]
+            # Un booleano por fila, para poder generar en lotes
+            def __call__(self, input_ids, scores, **kwargs):
+                import torch
+                L = self.stop_ids.shape[0]
+                if input_ids.shape[1] < L:
+                    return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+                return (input_ids[:, -L:] == self.stop_ids.to(input_ids.device)).all(dim=1)
+
+        _StopOnEnd = StopOnEnd
+    return _StopOnEnd(tokenizer)
+
+
+# Detiene la generación cuando se activa el evento (el consumidor del streaming paró)
+_StopOnEvent = None
+
+def _stop_on_event(event: threading.Event):
+    global _StopOnEvent
+    if _StopOnEvent is None:
+        from transformers import StoppingCriteria
+
+        class StopOnEvent(StoppingCriteria):
+            def __init__(self, event):
+                self.event = event
+            def __call__(self, input_ids, scores, **kwargs):
+                import torch
+                return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+        _StopOnEvent = StopOnEvent
+    return _StopOnEvent(event)
+
+
+NOT_FOUND_ANSWERS = ("Not found in the subtitles.", "No se encuentra en los subtítulos.")
+
+# Versión del prompt: súbela al cambiar SYSTEM_PROMPT o _build_prompt (invalida la caché de respuestas)
+PROMPT_VERSION = "v2"
+
+# Presupuesto de tokens del bloque <context> (medidos con el tokenizer del LLM)
+LLM_CONTEXT_TOKENS = int(os.getenv("LLM_CONTEXT_TOKENS", "512"))
+
+# Prompt de sistema constante: su prefill (KV) se calcula una vez y se reutiliza
+SYSTEM_PROMPT = (
+    "You are a factual, concise QA assistant for YouTube videos. "
+    "You must follow the RULES exactly.\n"
+    "RULES:\n"
+    "1) Use ONLY information inside the <context> block.\n"
+    "2) If the answer is not explicitly supported by <context>, reply with EXACTLY ONE of these strings, "
+    "matching the QUESTION language, with no extra words:\n"
+    "   - If the question is in english → Not found in the subtitles.\n"
+    "   - If the question is in spanish → No se encuentra en los subtítulos.\n"
+    "3) Do NOT use outside knowledge. Do NOT guess.\n"
+    "4) Write 1–2 sentences, entirely in the SAME language as the QUESTION (no code-switching).\n"
+    "5) Do NOT include timestamps, links, citations, lists, bullet points, labels, or closing markers.\n"
+    "6) Output must be ONLY the final answer text. No preambles, no language labels."
+)
+
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+
+
+def _token_counts(texts: List[str]) -> List[int]:
+    return [len(ids) for ids in _tokenizer(texts, add_special_tokens=False)["input_ids"]] if texts else []
+
+
+# Texto de b a continuación de a sin repetir el solape (sufijo de a = prefijo de b)
+def _merge_text(a: str, b: str) -> str:
+    wa, wb = a.split(), b.split()
+    for k in range(min(len(wa), len(wb)), 0, -1):
+        if wa[-k:] == wb[:k]:
+            return " ".join(wa + wb[k:])
+    return " ".join(wa + wb)
+
+
+# Une hits del mismo vídeo que se solapan o se tocan en el tiempo (el solape entre
+# chunks de segment_transcript) en tramos; conserva el orden del primer hit de cada tramo
+def _merge_hits(hits: List[Dict]) -> List[Dict]:
+    spans: List[Dict] = []
+    for h in hits:
+        s, e, txt = float(h["start_sec"]), float(h["end_sec"]), h["text"].strip()
+        for sp in spans:
+            if sp["video_id"] == h.get("video_id") and s <= sp["end_sec"] and e >= sp["start_sec"]:
+                if s >= sp["start_sec"]:
+                    sp["text"] = _merge_text(sp["text"], txt)
+                else:
+                    sp["text"] = _merge_text(txt, sp["text"])
+                sp["start_sec"], sp["end_sec"] = min(s, sp["start_sec"]), max(e, sp["end_sec"])
+                break
+        else:
+            spans.append({"video_id": h.get("video_id"), "start_sec": s, "end_sec": e, "text": txt})
+    return spans
+
+
+# Prefijo de text que cabe en budget tokens: frases enteras; si ni la primera cabe
+# (subtítulos automáticos sin puntuación), corte por palabras con "…"
+def _trim_to_tokens(text: str, budget: int) -> str:
+    sentences = _SENTENCE_END.split(text)
+    kept, used = [], 0
+    for sent, n in zip(sentences, _token_counts(sentences)):
+        if used + n > budget:
+            break
+        kept.append(sent)
+        used += n
+    if kept:
+        return " ".join(kept)
+    words = text.split()
+    lo, hi = 0, len(words)
+    while lo < hi:   # mayor nº de palabras que cabe (búsqueda binaria)
+        mid = (lo + hi + 1) // 2
+        if _token_counts([" ".join(words[:mid]) + "…"])[0] <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return " ".join(words[:lo]) + "…" if lo else ""
+
+
+# Líneas "[inicio–fin] texto" del contexto: tramos en orden de relevancia hasta llenar
+# budget tokens; el último que no cabe entero se recorta
+def _pack_context(hits: List[Dict], budget: int = LLM_CONTEXT_TOKENS) -> List[str]:
+    lines, left = [], budget
+    for sp in _merge_hits(hits):
+        rng = f"[{hhmmss(sp['start_sec'])}–{hhmmss(sp['end_sec'])}]"
+        line = f"{rng} {sp['text']}"
+        n = _token_counts([line + "\n"])[0]
+        if n > left:
+            head = _token_counts([rng + " \n"])[0]
+            txt = _trim_to_tokens(sp["text"], left - head) if left > head else ""
+            if not txt:
+                continue
+            line = f"{rng} {txt}"
+            n = _token_counts([line + "\n"])[0]
+            if n > left:
+                continue
+        lines.append(line)
+        left -= n
+    metrics.inc("llm_context_tokens_total", budget - left)
+    return lines
+
+
+# Construye el prompt de chat (system con RULES + pregunta y contexto)
+def _build_prompt(question: str, hits: List[Dict]) -> str:
+    ctx_lines = _pack_context(hits)
     has_context = len(ctx_lines) > 0
     context = "\n".join(ctx_lines) if has_context else "(no context)"
 
-    system = (
-        "You are a factual, concise QA assistant for YouTube videos. "
-        "You must follow the RULES exactly.\n"
-        "RULES:\n"
-        "1) Use ONLY information inside the <context> block.\n"
-        "2) If the answer is not explicitly supported by <context>, reply with EXACTLY ONE of these strings, "
-        "matching the QUESTION language, with no extra words:\n"
-        "   - If the question is in english → Not found in the subtitles.\n"
-        "   - If the question is in spanish → No se encuentra en los subtítulos.\n"
-        "3) Do NOT use outside knowledge. Do NOT guess.\n"
-        "4) Write 1–2 sentences, entirely in the SAME language as the QUESTION (no code-switching).\n"
-        "5) Do NOT include timestamps, links, citations, lists, bullet points, labels, or closing markers.\n"
-        "6) Output must be ONLY the final answer text. No preambles, no language labels."
-    )
-
     user = (
         "QUESTION:\n"
         f"{question}\n\n"
@@ -89,27 +289,208 @@ def generate_rag_answer(question: str, hits: List[Dict], model_name: str = _DEFA
 
 
     messages = [
-        {"role": "system", "content": system},
+        {"role": "system", "content": SYSTEM_PROMPT},
         {"role": "user",   "content": user},
     ]
 
-    prompt = _tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
-    stop_criteria = StoppingCriteriaList([StopOnEnd(_tokenizer)])
+    return _tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
 
-    out = _pipe(
-        prompt,
+
+# Parámetros de generación comunes (greedy, parada en '[End of answer]')
+def _gen_kwargs() -> Dict:
+    from transformers import StoppingCriteriaList
+    return dict(
         max_new_tokens=160,
         do_sample=False,
         repetition_penalty=1.05,
-        stopping_criteria=stop_criteria,
+        stopping_criteria=StoppingCriteriaList([_stop_on_end(_tokenizer)]),
         eos_token_id=_tokenizer.eos_token_id,
     )
 
-    text = out[0]["generated_text"].strip()
+
+# Texto del prompt anterior al contenido del usuario (idéntico para todas las preguntas)
+def _prompt_prefix() -> str:
+    marker = "<<QUESTION>>"
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user",   "content": marker},
+    ]
+    text = _tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+    return text[:text.index(marker)]
+
+
+# Prefill del prefijo una vez por modelo cargado; devuelve (ids, past_key_values)
+def _get_prefix_kv():
+    global _prefix_kv
+    if _prefix_kv is not None:
+        return _prefix_kv
+    with _lock:
+        if _prefix_kv is None:
+            import torch
+            from transformers import DynamicCache
+            ids = _tokenizer(_prompt_prefix(), return_tensors="pt").input_ids
+            with torch.no_grad():
+                out = _model(input_ids=ids, past_key_values=DynamicCache(), use_cache=True)
+            _prefix_kv = (ids[0], out.past_key_values)
+    return _prefix_kv
+
+
+# Genera los ids nuevos para un prompt; reutiliza el KV del prefijo si el prompt
+# empieza exactamente por los mismos tokens
+@metrics.timed("llm_generate")
+def _generate(prompt: str, streamer=None, use_prefix_cache: Optional[bool] = None, stop: Optional[threading.Event] = None):
+    import torch
+
+    enc = _tokenizer(prompt, return_tensors="pt")
+    inputs = {"input_ids": enc["input_ids"], "attention_mask": enc["attention_mask"]}
+    kwargs = _gen_kwargs()
+    if stop is not None:
+        kwargs["stopping_criteria"].append(_stop_on_event(stop))
+    if use_prefix_cache is None:
+        use_prefix_cache = LLM_PREFIX_CACHE
+    if use_prefix_cache:
+        prefix_ids, prefix_kv = _get_prefix_kv()
+        ids = inputs["input_ids"][0]
+        n = prefix_ids.shape[0]
+        if ids.shape[0] > n and torch.equal(ids[:n], prefix_ids):
+            kwargs["past_key_values"] = copy.deepcopy(prefix_kv)   # generate() la modifica
+        metrics.inc("llm_prefix_cache_total", result="hit" if "past_key_values" in kwargs else "miss")
+    t0 = time.perf_counter()
+    with torch.no_grad():
+        out = _model.generate(**inputs, streamer=streamer, **kwargs)
+    new_ids = out[0, inputs["input_ids"].shape[1]:]
+    dt = time.perf_counter() - t0
+    with _lock:
+        _stats["tokens"] = _stats.get("tokens", 0) + int(new_ids.shape[0])
+        _stats["gen_sec"] = _stats.get("gen_sec", 0.0) + dt
+        _stats["last_tokens_per_sec"] = new_ids.shape[0] / dt if dt > 0 else 0.0
+    metrics.inc("llm_prompt_tokens_total", inputs["input_ids"].shape[1])
+    metrics.inc("llm_generated_tokens_total", new_ids.shape[0])
+    return new_ids
+
+
+# Genera respuesta breve con LLM y contexto
+def generate_rag_answer(
+    question: str,
+    hits: List[Dict],
+    model_name: str = _DEFAULT_MODEL,
+    use_prefix_cache: Optional[bool] = None,
+) -> str:
+    _load_llm(model_name)
+    prompt = _build_prompt(question, hits)
+
+    new_ids = _generate(prompt, use_prefix_cache=use_prefix_cache)
+
+    text = _tokenizer.decode(new_ids, skip_special_tokens=True, clean_up_tokenization_spaces=True).strip()
     text = re.sub(r"\s+", " ", text).strip()
     return text
 
 
+# Genera respuestas para varias preguntas en lotes con padding a la izquierda.
+# Los prompts se ordenan por longitud para minimizar el padding; el resultado
+# vuelve en el orden de entrada. (Sin KV del prefijo: el padding lo desalinea.)
+def generate_rag_answers(
+    questions: List[str],
+    hits_list: List[List[Dict]],
+    model_name: str = _DEFAULT_MODEL,
+    batch_size: int = 4,
+) -> List[str]:
+    import torch
+
+    _load_llm(model_name)
+    prompts = [_build_prompt(q, h) for q, h in zip(questions, hits_list)]
+    # Relleno a la izquierda solo durante el lote: el tokenizer es el mismo que usan
+    # _generate, stream_rag_answer y _pack_context
+    saved = (_tokenizer.pad_token, _tokenizer.padding_side)
+    if _tokenizer.pad_token_id is None:
+        _tokenizer.pad_token = _tokenizer.eos_token
+    _tokenizer.padding_side = "left"
+    try:
+        order = sorted(range(len(prompts)), key=lambda i: len(prompts[i]))
+        answers: List[str] = [""] * len(prompts)
+        for b in range(0, len(order), batch_size):
+            idxs = order[b:b + batch_size]
+            enc = _tokenizer([prompts[i] for i in idxs], return_tensors="pt", padding=True)
+            t0 = time.perf_counter()
+            with metrics.span("llm_generate_batch"), torch.no_grad():
+                out = _model.generate(
+                    input_ids=enc["input_ids"],
+                    attention_mask=enc["attention_mask"],
+                    pad_token_id=_tokenizer.pad_token_id,
+                    **_gen_kwargs(),
+                )
+            new_ids = out[:, enc["input_ids"].shape[1]:]
+            dt = time.perf_counter() - t0
+            with _lock:
+                _stats["tokens"] = _stats.get("tokens", 0) + int((new_ids != _tokenizer.pad_token_id).sum())
+                _stats["gen_sec"] = _stats.get("gen_sec", 0.0) + dt
+            metrics.inc("llm_generated_tokens_total", int((new_ids != _tokenizer.pad_token_id).sum()))
+            for row, i in enumerate(idxs):
+                text = _tokenizer.decode(new_ids[row], skip_special_tokens=True, clean_up_tokenization_spaces=True)
+                answers[i] = re.sub(r"\s+", " ", text).strip()
+    finally:
+        _tokenizer.pad_token, _tokenizer.padding_side = saved
+    return answers
+
+
+# Normaliza espacios de forma incremental: la concatenación de lo emitido es
+# igual a re.sub(r"\s+", " ", texto).strip() sobre el texto completo
+def _normalize_stream(pieces: Iterator[str]) -> Iterator[str]:
+    started = False
+    pending_space = False
+    for piece in pieces:
+        out = []
+        for part in re.split(r"(\s+)", piece):
+            if not part:
+                continue
+            if part.isspace():
+                pending_space = started
+                continue
+            if pending_space:
+                out.append(" ")
+                pending_space = False
+            out.append(part)
+            started = True
+        if out:
+            yield "".join(out)
+
+
+# Variante en streaming: devuelve los fragmentos de texto según se decodifican
+def stream_rag_answer(question: str, hits: List[Dict], model_name: str = _DEFAULT_MODEL) -> Iterator[str]:
+    from transformers import TextIteratorStreamer
+
+    _load_llm(model_name)
+    prompt = _build_prompt(question, hits)
+    streamer = TextIteratorStreamer(
+        _tokenizer, skip_prompt=True, skip_special_tokens=True, clean_up_tokenization_spaces=True
+    )
+
+    errors = []
+    stop = threading.Event()
+    def run():
+        try:
+            _generate(prompt, streamer=streamer, stop=stop)
+        except Exception as e:
+            errors.append(e)
+            streamer.end()
+
+    worker = threading.Thread(target=run, name="llm-stream", daemon=True)
+    t0 = time.perf_counter()
+    worker.start()
+    first = True
+    try:
+        for piece in _normalize_stream(streamer):
+            if first:
+                metrics.observe("llm_first_token_seconds", time.perf_counter() - t0)
+                first = False
+            yield piece
+    finally:
+        stop.set()          # si el consumidor deja de leer, el hilo para en el siguiente token
+        worker.join()
+    if errors:
+        raise errors[0]
+
+
 # Devuelve citas listas para renderizar
 def format_citations(video_id: str, hits: List[Dict]) -> List[Dict]:
     citations = []
@@ -133,37 +514,91 @@ def rag_answer_with_citations(
     min_gap_sec: float = 45.0,
     min_top_score: float = 0.35,   
 ):
+    prepared = prepare_context(hits, ctx_max=ctx_max, min_gap_sec=min_gap_sec, min_top_score=min_top_score)
+    if prepared is None:
+        return NOT_FOUND_ANSWERS[0], []  # sin citas
+    context_hits, hits_dedup = prepared
+
+    cached = cached_answer(video_id, question, hits, model_name=model_name)
+    if cached is not None:
+        return cached
+
+    answer = generate_rag_answer(question, context_hits, model_name=model_name)
+    citations = citations_for_answer(video_id, answer, hits_dedup, cite_k=cite_k)
+    store_answer(video_id, question, hits, answer, citations, model_name=model_name)
+
+    return answer, citations
+
+
+# Modelo + precisión efectiva que generan la respuesta (parte de la clave de caché);
+# antes de cargar el modelo se resuelve igual que en _load_llm (bf16 → fp32 sin soporte)
+def _model_tag(model_name: str) -> str:
+    if _loaded is not None:
+        return f"{_loaded[0]}@{_loaded[1]}"
+    return f"{model_name}@{_resolve_precision()}"
+
+
+def _answer_key(video_id: str, question: str, hits: list[dict], model_name: str) -> str:
+    ids = [h.get("id") or f"{video_id}@{float(h['start_sec']):.1f}" for h in hits]
+    return AnswerCache.key(video_id, question, ids, _model_tag(model_name), PROMPT_VERSION)
+
+
+# Respuesta + citas cacheadas para estos hits, o None
+def cached_answer(video_id: str, question: str, hits: list[dict], model_name: str = _DEFAULT_MODEL) -> Optional[Tuple[str, list]]:
+    cache = get_answer_cache()
+    if cache is None:
+        return None
+    found = cache.get(_answer_key(video_id, question, hits, model_name))
+    metrics.inc("answer_cache_total", result="hit" if found is not None else "miss")
+    return found
+
+
+def store_answer(video_id: str, question: str, hits: list[dict], answer: str, citations: list, model_name: str = _DEFAULT_MODEL) -> None:
+    cache = get_answer_cache()
+    if cache is not None:
+        cache.put(_answer_key(video_id, question, hits, model_name), video_id, answer, citations)
+
+
+# Orden de relevancia: fusión RRF si el hit viene de la búsqueda híbrida, si no la similitud
+def _rank(h: dict) -> float:
+    return h.get("rrf", h["score"])
+
+
+# Umbral + de-dup temporal; devuelve (hits de contexto, hits sin duplicados) o None si no hay contexto
+def prepare_context(
+    hits: list[dict],
+    ctx_max: int = 4,
+    min_gap_sec: float = 45.0,
+    min_top_score: float = 0.35,
+) -> Optional[Tuple[list, list]]:
     if not hits:
-        return "Not found in the subtitles.", []
+        return None
 
-    # Ordena por score desc y aplica umbral ANTES de todo
-    hits_sorted = sorted(hits, key=lambda h: h["score"], reverse=True)
-    if hits_sorted[0]["score"] < min_top_score:
-        return "Not found in the subtitles.", []  # sin citas
+    # Ordena por relevancia desc y aplica umbral (sobre la similitud vectorial) ANTES de todo
+    hits_sorted = sorted(hits, key=_rank, reverse=True)
+    if max(h["score"] for h in hits_sorted) < min_top_score:
+        return None
 
     # De-dup temporal + preparar contexto
     hits_dedup = dedup_hits_by_time(hits_sorted, min_gap_sec=min_gap_sec)
-    context_hits = hits_dedup[:ctx_max]
+    return hits_dedup[:ctx_max], hits_dedup
 
-    answer = generate_rag_answer(question, context_hits, model_name=model_name)
 
+# Citas: top por score (post-dedupe), luego cronológico
+def citations_for_answer(video_id: str, answer: str, hits_dedup: list[dict], cite_k: int = 2) -> list[dict]:
     # Si el modelo niega, no mostramos citas
-    if answer.strip() in ("Not found in the subtitles.", "No se encuentra en los subtítulos."):
-        return answer, []
-
-    # Citas: top por score (post-dedupe), luego cronológico
-    top_for_citation = sorted(hits_dedup, key=lambda h: h["score"], reverse=True)[:cite_k]
+    if answer.strip() in NOT_FOUND_ANSWERS:
+        return []
+    top_for_citation = sorted(hits_dedup, key=_rank, reverse=True)[:cite_k]
     top_for_citation = sorted(top_for_citation, key=lambda h: h["start_sec"])
-    citations = [{"minute": hhmmss(h["start_sec"]), "url": time_url(video_id, h["start_sec"])} for h in top_for_citation]
-
-    return answer, citations
+    return [{"minute": hhmmss(h["start_sec"]), "url": time_url(video_id, h["start_sec"])} for h in top_for_citation]
 
 
 # Elimina hits muy cercanos en el tiempo (por solapamiento de chunks)
 def dedup_hits_by_time(hits: list[dict], min_gap_sec: float = 30.0) -> list[dict]:
     if not hits:
         return []
-    hits_sorted = sorted(hits, key=lambda h: h["score"], reverse=True)
+    hits_sorted = sorted(hits, key=_rank, reverse=True)
     kept = []
     last_kept_start = None
     for h in hits_sorted:
@@ -0,0 +1,31 @@
+import threading, time
+
+
+# Token bucket compartido entre hilos: `rate` peticiones/segundo con ráfagas de hasta `capacity`
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float | None = None):
+        if rate <= 0:
+            raise ValueError("rate debe ser > 0")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    # Bloquea hasta disponer de `tokens`; devuelve los segundos esperados
+    def acquire(self, tokens: float = 1.0) -> float:
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
@@ -0,0 +1,51 @@
+from typing import List, Dict, Optional
+import os
+from . import metrics
+from .bm25 import get_index
+from .vector_store import query
+
+
+# Recuperación híbrida: vecinos del índice vectorial + BM25 del vídeo, fusionados con
+# Reciprocal Rank Fusion (score_rrf = Σ 1 / (RRF_K + rango)). Cada hit conserva su
+# "score" de similitud (0.0 si solo lo encontró BM25) y añade "rrf" para ordenar.
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") == "1"
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+
+def rrf_fuse(ranked_lists: List[List[Dict]], k: int = RRF_K) -> List[Dict]:
+    fused: Dict[str, Dict] = {}
+    for hits in ranked_lists:
+        for rank, h in enumerate(hits, start=1):
+            cur = fused.get(h["id"])
+            if cur is None:
+                cur = fused[h["id"]] = dict(h, rrf=0.0)
+            else:
+                for key, v in h.items():     # completa campos que falten (p. ej. score vectorial)
+                    cur.setdefault(key, v)
+            cur["rrf"] += 1.0 / (k + rank)
+    for h in fused.values():
+        h.setdefault("score", 0.0)
+    return sorted(fused.values(), key=lambda h: h["rrf"], reverse=True)
+
+
+# Hits para una pregunta: vectoriales (con umbral min_score) y, si el vídeo tiene índice
+# BM25, léxicos; sin video_id o sin índice léxico se devuelven solo los vectoriales.
+# Si ningún hit vectorial supera el umbral no se devuelve nada: BM25 mejora el ranking
+# dentro de un vídeo relevante, pero no decide por sí solo que la pregunta lo sea.
+def hybrid_query(
+    question: str,
+    query_embedding,
+    video_id: Optional[str] = None,
+    top_k: int = 8,
+    min_score: float = 0.0,
+    hybrid: Optional[bool] = None,
+) -> List[Dict]:
+    vec_hits = [h for h in query(query_embedding, top_k=top_k, video_id=video_id) if float(h.get("score", 0)) >= min_score]
+    if hybrid is None:
+        hybrid = HYBRID_SEARCH
+    index = get_index(video_id) if (hybrid and video_id) else None
+    if index is None or not vec_hits:
+        return vec_hits
+    with metrics.span("bm25_search"):
+        lex_hits = [dict(h, video_id=video_id) for h in index.search(question, top_k=top_k)]
+    return rrf_fuse([vec_hits, lex_hits])[:top_k]
@@ -0,0 +1,157 @@
+from typing import Dict, Iterator, List, Optional, Sequence
+from pathlib import Path
+import json, logging, os, struct, sys, tempfile
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+
+# Caché de transcripciones en formato columnar (<video_id>.trc), pensada para mmap:
+#
+#   cabecera  "YTRC" | versión u32 | nº filas u64 | bytes de texto u64   (24 bytes, little-endian)
+#   start     float64[n]
+#   duration  float64[n]
+#   offsets   uint64[n + 1]   (posiciones de cada texto dentro del blob)
+#   texto     utf-8, todos los textos concatenados
+#
+# Cargar un vídeo no parsea nada: los arrays son vistas sobre el fichero mapeado y los
+# textos se decodifican solo cuando se piden.
+MAGIC = b"YTRC"
+VERSION = 1
+_HEADER = struct.Struct("<4sIQQ")
+
+
+# Vista columnar de una transcripción. Se comporta como la lista de dicts de siempre
+# (len, índices, iteración) y además expone las columnas para los bucles calientes.
+class TranscriptColumns(Sequence):
+    def __init__(self, start: np.ndarray, duration: np.ndarray, offsets: np.ndarray, blob):
+        self.start = start
+        self.duration = duration
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self) -> int:
+        return int(self.start.shape[0])
+
+    def text(self, i: int) -> str:
+        a, b = int(self._offsets[i]), int(self._offsets[i + 1])
+        return bytes(self._blob[a:b]).decode("utf-8")
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return {"text": self.text(i), "start": float(self.start[i]), "duration": float(self.duration[i])}
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def to_list(self) -> List[Dict]:
+        return list(self)
+
+
+# Acepta dicts o los objetos de youtube_transcript_api (>=1.0: atributos text/start/duration)
+def normalize_rows(rows) -> List[Dict]:
+    out = []
+    for r in rows:
+        if isinstance(r, dict):
+            text, start, duration = r["text"], r["start"], r["duration"]
+        else:
+            text, start, duration = r.text, r.start, r.duration
+        out.append({"text": str(text), "start": float(start), "duration": float(duration)})
+    return out
+
+
+# Escritura atómica: fichero temporal en el mismo directorio + os.replace
+def write_rows(path: Path, rows) -> None:
+    rows = rows if isinstance(rows, TranscriptColumns) else normalize_rows(rows)
+    n = len(rows)
+    if isinstance(rows, TranscriptColumns):
+        start, duration = np.asarray(rows.start, dtype="<f8"), np.asarray(rows.duration, dtype="<f8")
+        texts = [rows.text(i).encode("utf-8") for i in range(n)]
+    else:
+        start = np.fromiter((r["start"] for r in rows), dtype="<f8", count=n)
+        duration = np.fromiter((r["duration"] for r in rows), dtype="<f8", count=n)
+        texts = [r["text"].encode("utf-8") for r in rows]
+    offsets = np.zeros(n + 1, dtype="<u8")
+    if n:
+        offsets[1:] = np.cumsum([len(t) for t in texts])
+    blob = b"".join(texts)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=path.name + ".", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, n, len(blob)))
+            f.write(start.tobytes())
+            f.write(duration.tobytes())
+            f.write(offsets.tobytes())
+            f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+# Lectura mapeada en memoria; lanza ValueError si el fichero no es válido
+def read_rows(path: Path) -> TranscriptColumns:
+    size = path.stat().st_size
+    if size < _HEADER.size:
+        raise ValueError(f"{path}: fichero truncado")
+    with open(path, "rb") as f:
+        magic, version, n, text_bytes = _HEADER.unpack(f.read(_HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(f"{path}: no es una caché de transcripción")
+    if version != VERSION:
+        raise ValueError(f"{path}: versión {version} no soportada (se esperaba {VERSION})")
+    expected = _HEADER.size + 8 * n * 2 + 8 * (n + 1) + text_bytes
+    if size != expected:
+        raise ValueError(f"{path}: tamaño {size} != {expected} (fichero truncado)")
+
+    mm = np.memmap(path, dtype=np.uint8, mode="r")
+    pos = _HEADER.size
+    start = mm[pos:pos + 8 * n].view("<f8"); pos += 8 * n
+    duration = mm[pos:pos + 8 * n].view("<f8"); pos += 8 * n
+    offsets = mm[pos:pos + 8 * (n + 1)].view("<u8"); pos += 8 * (n + 1)
+    return TranscriptColumns(start, duration, offsets, mm[pos:pos + text_bytes])
+
+
+# Convierte una caché JSON antigua (lista de dicts) al formato columnar y borra el JSON
+def migrate_json(json_path: Path) -> Optional[Path]:
+    try:
+        rows = json.loads(json_path.read_text(encoding="utf-8"))
+        trc = json_path.with_suffix(".trc")
+        write_rows(trc, rows)
+    except Exception:
+        log.warning("No se pudo migrar la caché %s", json_path, exc_info=True)
+        return None
+    json_path.unlink()
+    return trc
+
+
+# python -m app.transcript_cache [directorio]: migra todas las cachés JSON de una vez
+def main(argv: List[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    cache_dir = Path(argv[0] if argv else "data/transcripts")
+    done = failed = 0
+    for p in sorted(cache_dir.glob("*.json")):
+        if p.name.endswith(".bm25.json"):
+            continue
+        if migrate_json(p) is None:
+            failed += 1
+        else:
+            done += 1
+    print(f"Migradas: {done} | fallidas: {failed}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
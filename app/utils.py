@@ -1,4 +1,5 @@
-import re
+import os, re
+from contextlib import contextmanager
 
 
 # Extrae el VIDEO_ID de un enlace de YouTube
@@ -25,4 +26,41 @@ def time_url(video_id: str, start_sec: float) -> str:
 # Limpia el texto
 def clean_text(t: str) -> str:
     t = re.sub(r"\s+", " ", t).strip()
-    return t
\ No newline at end of file
+    return t
+
+
+# Memoria residente (RSS) actual del proceso en bytes
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource, sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss   # pico; KB en Linux, bytes en macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return 0
+
+
+# Cerrojo exclusivo entre procesos sobre un fichero (fcntl en POSIX, msvcrt en Windows)
+@contextmanager
+def file_lock(path):
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
@@ -0,0 +1,17 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+# Backend vectorial: "pinecone" (por defecto) o "local" (en proceso, sin red)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone").strip().lower()
+
+if VECTOR_BACKEND == "local":
+    from .local_store import ensure_index, upsert_chunks, delete_ids, query, reset_client
+elif VECTOR_BACKEND == "pinecone":
+    from .pinecone_store import ensure_index, upsert_chunks, delete_ids, query, reset_client
+else:
+    raise RuntimeError(f"VECTOR_BACKEND desconocido: {VECTOR_BACKEND!r} (usa 'pinecone' o 'local').")
+
+__all__ = ["VECTOR_BACKEND", "ensure_index", "upsert_chunks", "delete_ids", "query", "reset_client"]
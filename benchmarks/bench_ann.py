@@ -0,0 +1,61 @@
+import os, sys, tempfile, time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import argparse
+from pathlib import Path
+import numpy as np
+from app import local_store
+from benchmarks.synthetic import synthetic_embeddings
+
+
+# Recall@k y latencia del IVF frente a la búsqueda exacta, sin filtro de vídeo:
+#   python benchmarks/bench_ann.py --videos 500 --per-video 200 --k 8
+# Las consultas son vectores del índice con ruido (preguntas "cercanas" a un chunk).
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--videos", type=int, default=500)
+    ap.add_argument("--per-video", type=int, default=200)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=8)
+    ap.add_argument("--nlist", type=int, default=0)
+    ap.add_argument("--nprobe", type=int, nargs="*", default=[1, 2, 4, 8, 16, 32, 64])
+    args = ap.parse_args(argv)
+
+    local_store.LOCAL_INDEX_DIR = Path(tempfile.mkdtemp(prefix="bench_ann_"))
+    local_store.ensure_index()
+    vecs = synthetic_embeddings(args.videos, args.per_video, dim=local_store.DIM, seed=1)
+    t0 = time.perf_counter()
+    for v in range(args.videos):
+        block = vecs[v * args.per_video:(v + 1) * args.per_video]
+        chunks = [{"start_sec": i * 48.0, "end_sec": i * 48.0 + 60.0, "text": "", "embedding": e} for i, e in enumerate(block)]
+        local_store.upsert_chunks(chunks, video_id=f"v{v:05d}")
+    print(f"vectores: {len(vecs)} ({args.videos} vídeos) | carga: {time.perf_counter() - t0:.1f} s")
+
+    t0 = time.perf_counter()
+    ann = local_store.build_ann(nlist=args.nlist or None)
+    print(f"IVF: nlist={ann.nlist} | entrenamiento + asignación: {time.perf_counter() - t0:.1f} s")
+
+    rng = np.random.default_rng(7)
+    qs = vecs[rng.choice(len(vecs), args.queries, replace=False)] + rng.normal(scale=0.03, size=(args.queries, vecs.shape[1]))
+    qs = qs.astype(np.float32)
+
+    def run(**kw):
+        out, t0 = [], time.perf_counter()
+        for q in qs:
+            out.append({h["id"] for h in local_store.query(q, top_k=args.k, **kw)})
+        return out, (time.perf_counter() - t0) / len(qs)
+
+    exact, t_exact = run(exact=True)
+    print(f"\n{'modo':>12} {'recall@' + str(args.k):>10} {'ms/consulta':>12} {'speedup':>8}")
+    print(f"{'exacta':>12} {1.0:10.3f} {t_exact * 1000:12.2f} {1.0:8.1f}")
+    for nprobe in args.nprobe:
+        if nprobe > ann.nlist:
+            break
+        got, t = run(nprobe=nprobe)
+        recall = np.mean([len(g & e) / len(e) for g, e in zip(got, exact)])
+        print(f"{'nprobe=' + str(nprobe):>12} {recall:10.3f} {t * 1000:12.2f} {t_exact / t:8.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+import os, subprocess, sys
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+MODULES = [
+    "app.utils",
+    "app.ingest",
+    "app.embedding_cache",
+    "app.embeddings",
+    "app.local_store",
+    "app.pinecone_store",
+    "app.vector_store",
+    "app.pipeline",
+    "app.rag_answer",
+]
+
+_SNIPPET = "import time, importlib; t = time.perf_counter(); importlib.import_module({mod!r}); print(time.perf_counter() - t)"
+
+
+# Coste de importar un módulo en un intérprete limpio (mejor de `repeat`)
+def import_time(mod: str, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", _SNIPPET.format(mod=mod)],
+            cwd=ROOT, capture_output=True, text=True,
+        )
+        if out.returncode != 0:
+            raise RuntimeError(f"{mod}: {out.stderr.strip().splitlines()[-1]}")
+        best = min(best, float(out.stdout.strip()))
+    return best
+
+
+# python benchmarks/bench_import.py [módulo ...]
+if __name__ == "__main__":
+    mods = sys.argv[1:] or MODULES
+    print(f"{'módulo':<24}{'import (ms)':>12}")
+    for mod in mods:
+        try:
+            print(f"{mod:<24}{import_time(mod) * 1000:>12.1f}")
+        except RuntimeError as e:
+            print(f"{mod:<24}{'error':>12}  {e}")
@@ -0,0 +1,112 @@
+import os, sys, json, platform, statistics, subprocess, tempfile, time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import argparse
+from benchmarks.synthetic import StubEmbedder, synthetic_rows, synthetic_vtt
+
+
+# Benchmark de extremo a extremo sin YouTube ni Pinecone:
+#   python benchmarks/bench_pipeline.py --rows 2000 --out bench_pipeline.json
+# Mide cada etapa por separado y guarda el resultado en JSON para comparar versiones.
+
+QUESTIONS = [
+    "What does the video say about the softmax in attention?",
+    "How are query, key and value vectors computed?",
+    "¿Qué papel tienen los embeddings?",
+    "What is a layer?",
+]
+
+
+# LLM de juguete: devuelve la primera frase del contexto (sin tokenizer ni modelo)
+def _stub_answer(question, hits):
+    from app.rag_answer import NOT_FOUND_ANSWERS
+    return hits[0]["text"].split(".")[0][:200] if hits else NOT_FOUND_ANSWERS[0]
+
+
+def _timed(fn, repeat: int):
+    times, result = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    return result, {"best_sec": min(times), "median_sec": statistics.median(times), "repeat": repeat}
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+# La app se importa aquí: main() elige antes el backend (VECTOR_BACKEND se lee al importar)
+def run(n_rows: int, window: int, overlap: int, top_k: int, repeat: int, embed: str, llm: str, seed: int = 0) -> dict:
+    from app import embeddings, rag_answer
+    from app.ingest import _parse_vtt_to_rows, segment_transcript
+    from app.vector_store import ensure_index, upsert_chunks, query
+
+    if embed == "stub":
+        embeddings._models[embeddings.EMB_MODEL_NAME] = StubEmbedder()   # sin caché de embeddings
+    generate = _stub_answer if llm == "stub" else (lambda q, h: rag_answer.generate_rag_answer(q, h, model_name=llm))
+
+    vid = "benchvideo0"
+    vtt = synthetic_vtt(synthetic_rows(n_rows, seed=seed))
+    stages = {}
+
+    rows, stages["parse_vtt"] = _timed(lambda: _parse_vtt_to_rows(vtt), repeat)
+    chunks, stages["segment"] = _timed(lambda: segment_transcript(rows, window=window, overlap=overlap), repeat)
+    embedded, stages["embed_chunks"] = _timed(lambda: embeddings.embed_chunks(chunks), repeat)
+    ensure_index()
+    _, stages["upsert"] = _timed(lambda: upsert_chunks(embedded, video_id=vid, title="bench", lang="en"), repeat)
+
+    q_vecs = embeddings.embed_texts(QUESTIONS)
+    hits_all, stages["query"] = _timed(lambda: [query(v, top_k=top_k, video_id=vid) for v in q_vecs], repeat)
+    dedup, stages["dedup"] = _timed(lambda: [rag_answer.dedup_hits_by_time(h, min_gap_sec=45.0) for h in hits_all], repeat)
+    if llm != "stub":
+        rag_answer._load_llm(llm)   # la carga del modelo no cuenta como generación
+    _, stages["generate"] = _timed(lambda: [generate(q, h[:4]) for q, h in zip(QUESTIONS, dedup)], 1 if llm != "stub" else repeat)
+
+    stages["query"]["per_query_ms"] = stages["query"]["best_sec"] / len(QUESTIONS) * 1000
+    stages["generate"]["per_answer_sec"] = stages["generate"]["best_sec"] / len(QUESTIONS)
+    return {
+        "meta": {
+            "git": _git_rev(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "params": {"rows": n_rows, "window": window, "overlap": overlap, "top_k": top_k, "repeat": repeat, "embed": embed, "llm": llm, "seed": seed},
+        "sizes": {"vtt_bytes": len(vtt.encode("utf-8")), "rows": len(rows), "chunks": len(chunks), "questions": len(QUESTIONS)},
+        "stages": stages,
+    }
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark offline del pipeline completo (tiempos por etapa).")
+    ap.add_argument("--rows", type=int, default=2000, help="Líneas de subtítulos sintéticos (~3 s cada una)")
+    ap.add_argument("--window", type=int, default=60)
+    ap.add_argument("--overlap", type=int, default=12)
+    ap.add_argument("--top-k", type=int, default=8)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--embed", default="stub", help="'stub' o 'model' (descarga MiniLM)")
+    ap.add_argument("--llm", default="stub", help="'stub' o nombre/ruta de un modelo de transformers")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default="bench_pipeline.json", help="Fichero JSON de salida")
+    args = ap.parse_args(argv)
+
+    # Sin red: índice local en un directorio temporal (antes de importar app.vector_store)
+    os.environ["VECTOR_BACKEND"] = "local"
+    os.environ.setdefault("LOCAL_INDEX_DIR", tempfile.mkdtemp(prefix="bench_index_"))
+    report = run(args.rows, args.window, args.overlap, args.top_k, args.repeat, args.embed, args.llm, args.seed)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"{report['sizes']['rows']} líneas → {report['sizes']['chunks']} chunks (embed={args.embed}, llm={args.llm})")
+    for name, st in report["stages"].items():
+        print(f"{name:>13}: {st['best_sec'] * 1000:9.2f} ms (mediana {st['median_sec'] * 1000:9.2f} ms)")
+    print(f"Resultados en {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+import os, sys, time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import rag_answer
+from benchmarks.synthetic import synthetic_rows
+from app.ingest import segment_transcript
+
+
+# Contexto realista: ctx_max=4 chunks de 60 s de una transcripción sintética
+def _hits(n: int = 4):
+    chunks = segment_transcript(synthetic_rows(400, seed=7))
+    return [dict(c, score=0.8 - 0.05 * i) for i, c in enumerate(chunks[:n])]
+
+
+# Prefill: forward sobre el prompt completo vs. solo el sufijo con el KV del prefijo
+def bench_prefill(prompt: str, repeat: int = 3):
+    import copy, torch
+    tok, model = rag_answer._tokenizer, rag_answer._model
+    ids = tok(prompt, return_tensors="pt").input_ids
+    prefix_ids, prefix_kv = rag_answer._get_prefix_kv()
+    n = prefix_ids.shape[0]
+    full, cached = float("inf"), float("inf")
+    with torch.no_grad():
+        for _ in range(repeat):
+            t = time.perf_counter()
+            model(input_ids=ids, use_cache=True)
+            full = min(full, time.perf_counter() - t)
+
+            t = time.perf_counter()
+            model(input_ids=ids[:, n:], past_key_values=copy.deepcopy(prefix_kv), use_cache=True)
+            cached = min(cached, time.perf_counter() - t)
+    return ids.shape[1], n, full, cached
+
+
+def bench_answer(question: str, hits, use_prefix_cache: bool, repeat: int = 2):
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        rag_answer.generate_rag_answer(question, hits, use_prefix_cache=use_prefix_cache)
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+# python benchmarks/bench_prefix_cache.py [modelo]
+if __name__ == "__main__":
+    model_name = sys.argv[1] if len(sys.argv) > 1 else rag_answer._DEFAULT_MODEL
+    rag_answer._load_llm(model_name)
+    hits = _hits(4)
+    question = "What does the video say about the softmax in attention?"
+    prompt = rag_answer._build_prompt(question, hits)
+
+    total, prefix, t_full, t_cached = bench_prefill(prompt)
+    print(f"tokens prompt: {total} | prefijo cacheado: {prefix}")
+    print(f"prefill sin caché: {t_full * 1000:8.1f} ms")
+    print(f"prefill con caché: {t_cached * 1000:8.1f} ms  (-{(1 - t_cached / t_full) * 100:.0f}%)")
+
+    t_no = bench_answer(question, hits, use_prefix_cache=False)
+    t_yes = bench_answer(question, hits, use_prefix_cache=True)
+    print(f"respuesta completa sin caché: {t_no:6.2f} s")
+    print(f"respuesta completa con caché: {t_yes:6.2f} s  (-{(1 - t_yes / t_no) * 100:.0f}%)")
@@ -0,0 +1,63 @@
+import os, sys, time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import argparse
+import numpy as np
+from app import quantize
+from benchmarks.synthetic import synthetic_embeddings
+
+
+# Memoria y recall de la búsqueda con vectores cuantizados (float16 / int8) frente a float32:
+#   python benchmarks/bench_quantized.py --vectors 100000 --k 8
+# "sin rescoring" = top-k directo sobre la copia cuantizada; "rescoring xF" = los F·k mejores
+# candidatos se reordenan con los float32 (lo que hace local_store con RESCORE_FACTOR=F).
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx])]
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--vectors", type=int, default=100_000)
+    ap.add_argument("--queries", type=int, default=100)
+    ap.add_argument("--k", type=int, default=8)
+    ap.add_argument("--rescore", type=int, nargs="*", default=[1, 2, 4])
+    ap.add_argument("--noise", type=float, default=0.05, help="Ruido de las consultas respecto a un chunk (más = más difícil)")
+    args = ap.parse_args(argv)
+
+    per_video = 200
+    vecs = synthetic_embeddings(max(1, args.vectors // per_video), per_video, seed=1)
+    n, dim = vecs.shape
+    rng = np.random.default_rng(7)
+    qs = vecs[rng.choice(n, args.queries, replace=False)] + rng.normal(scale=args.noise, size=(args.queries, dim))
+    qs = (qs / np.linalg.norm(qs, axis=1, keepdims=True)).astype(np.float32)
+    exact = [set(_top(vecs @ q, args.k).tolist()) for q in qs]
+
+    row = vecs[0]
+    as_list = sys.getsizeof(row.tolist()) + sum(sys.getsizeof(x) for x in row.tolist())
+    print(f"vectores: {n} x {dim} | consultas: {args.queries} | k={args.k}")
+    print(f"embedding como lista Python (antes en embed_chunks): {as_list} B/vector → {as_list * 1e6 / 2**20:,.0f} MiB por millón\n")
+    print(f"{'formato':>8} {'MiB/millón':>11} {'modo':>14} {'recall@' + str(args.k):>9} {'ms/consulta':>12}")
+
+    for dtype in quantize.DTYPES:
+        codes, scales = quantize.quantize(vecs, dtype)
+        mib = quantize.bytes_per_vector(dim, dtype) * 1e6 / 2**20
+        modes = [("exacto", 0)] if dtype == "float32" else [("sin rescoring", 0)] + [(f"rescoring x{f}", f) for f in args.rescore]
+        for name, factor in modes:
+            hits, t0 = [], time.perf_counter()
+            for q in qs:
+                s = quantize.scores(codes, scales, q)
+                if factor:
+                    cand = np.sort(np.argpartition(-s, args.k * factor - 1)[:args.k * factor])
+                    top = cand[_top(vecs[cand] @ q, args.k)]
+                else:
+                    top = _top(s, args.k)
+                hits.append(set(top.tolist()))
+            dt = (time.perf_counter() - t0) / len(qs)
+            recall = np.mean([len(h & e) / args.k for h, e in zip(hits, exact)])
+            print(f"{dtype:>8} {mib:11,.0f} {name:>14} {recall:9.4f} {dt * 1000:12.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
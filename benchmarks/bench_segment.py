@@ -0,0 +1,43 @@
+import os, sys, time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.ingest import segment_transcript
+from app.utils import clean_text
+from benchmarks.synthetic import synthetic_rows
+
+
+# Implementación original O(líneas × ventanas): línea base y referencia de los tests
+def segment_naive(rows, window=60, overlap=12):
+    if not rows:
+        return []
+    end_total = max(r["start"] + r["duration"] for r in rows)
+    segments, start = [], 0.0
+    while start < end_total:
+        end = start + window
+        texts = [r["text"] for r in rows if r["start"] < end and r["start"] + r["duration"] > start]
+        chunk_text = clean_text(" ".join(texts))
+        if chunk_text:
+            segments.append({"start_sec": float(start), "end_sec": float(min(end, end_total)), "text": chunk_text})
+        start += (window - overlap)
+    return segments
+
+
+def bench(fn, rows, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(rows, window=60, overlap=12)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+# Micro-benchmark: python benchmarks/bench_segment.py [n_líneas]
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    rows = synthetic_rows(n, seed=42)
+    assert segment_transcript(rows) == segment_naive(rows)
+    t_new = bench(segment_transcript, rows)
+    t_ref = bench(segment_naive, rows, repeat=1)
+    print(f"líneas: {n} | chunks: {len(segment_transcript(rows))}")
+    print(f"barrido:    {t_new * 1000:8.1f} ms")
+    print(f"referencia: {t_ref * 1000:8.1f} ms  (x{t_ref / t_new:.0f})")
@@ -0,0 +1,73 @@
+import os, sys, random
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import argparse
+from app.ingest import iter_segments, iter_token_segments
+from benchmarks.synthetic import StubTokenizer
+
+
+# Segmentación por tiempo frente a presupuesto de tokens:
+#   python benchmarks/bench_token_chunks.py --minutes 60 [--real]
+# Mide chunks (= vectores y llamadas de embedding), tokens que el modelo truncaría
+# (más allá de max_tokens) y relleno medio. --real usa el tokenizer de MiniLM.
+def paced_rows(minutes: int, seed: int = 0):
+    rnd = random.Random(seed)
+    words = ("attention", "query", "key", "value", "softmax", "embedding", "layer", "vector",
+             "modelo", "atención", "capa", "token", "matrix", "score", "the", "of", "y", "de")
+    rows, t = [], 0.0
+    for _ in range(minutes):
+        pace = rnd.choice(("rápido", "normal", "normal", "pausado", "silencio"))
+        end = t + 60
+        while t < end:
+            if pace == "silencio":
+                dur, n, gap = 2.0, rnd.randint(1, 2), rnd.uniform(15, 30)   # [música], aplausos…
+            else:
+                dur = rnd.uniform(2.0, 4.0)
+                n = int(dur * {"rápido": 3.3, "normal": 2.5, "pausado": 1.5}[pace])
+                gap = dur * rnd.uniform(0.9, 1.1)
+            rows.append({"text": " ".join(rnd.choice(words) for _ in range(n)), "start": round(t, 3), "duration": round(dur, 3)})
+            t += gap
+    return rows
+
+
+def stats(chunks, count, max_tokens):
+    lens = count([c["text"] for c in chunks])
+    return {
+        "chunks": len(chunks),
+        "truncated_chunks": sum(n > max_tokens for n in lens),
+        "lost_tokens": sum(max(0, n - max_tokens) for n in lens),
+        "fill": sum(min(n, max_tokens) for n in lens) / (len(lens) * max_tokens) if lens else 0.0,
+    }
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--minutes", type=int, default=60)
+    ap.add_argument("--max-tokens", type=int, default=126)
+    ap.add_argument("--overlap-tokens", type=int, default=24)
+    ap.add_argument("--real", action="store_true", help="Tokenizer del modelo de embeddings (descarga MiniLM)")
+    args = ap.parse_args(argv)
+
+    if args.real:
+        from app.embeddings import token_lengths as count
+    else:
+        tok = StubTokenizer()
+        count = lambda texts: [len(ids) for ids in tok(texts, add_special_tokens=False)["input_ids"]]
+
+    rows = paced_rows(args.minutes)
+    total = sum(count([r["text"] for r in rows]))
+    print(f"{args.minutes} min | {len(rows)} líneas | {total} tokens de subtítulos | presupuesto {args.max_tokens}\n")
+    print(f"{'modo':>22} {'chunks':>7} {'truncados':>10} {'tokens perdidos':>16} {'relleno':>8}")
+    modes = [
+        ("tiempo 60 s / 12 s", lambda: list(iter_segments(rows, window=60, overlap=12))),
+        ("tiempo 30 s / 6 s", lambda: list(iter_segments(rows, window=30, overlap=6))),
+        (f"tokens {args.max_tokens} / {args.overlap_tokens}", lambda: list(iter_token_segments(rows, count, args.max_tokens, args.overlap_tokens))),
+    ]
+    for name, fn in modes:
+        s = stats(fn(), count, args.max_tokens)
+        print(f"{name:>22} {s['chunks']:7d} {s['truncated_chunks']:10d} {s['lost_tokens']:16d} {s['fill']:8.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
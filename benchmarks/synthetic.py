@@ -0,0 +1,83 @@
+import random, zlib
+from typing import List, Dict
+
+
+# Transcripción sintética con el perfil de subtítulos reales (~3 s por línea).
+# irregular=True da casos límite: líneas solapadas, huecos, duración 0 y líneas
+# larguísimas; shuffle=True las desordena.
+def synthetic_rows(n: int, seed: int = 0, irregular: bool = False, shuffle: bool = False) -> List[Dict]:
+    rnd = random.Random(seed)
+    if irregular:
+        rows, t = [], 0.0
+        for i in range(n):
+            t += rnd.choice([0.0, 0.5, 1.7, 2.3, 4.0, 35.0 if rnd.random() < 0.01 else 3.1])
+            rows.append({"text": f" línea  {i} ", "start": round(t, 3), "duration": rnd.choice([0.0, 1.5, 2.8, 6.2, 70.0])})
+    else:
+        words = ("attention", "query", "key", "value", "softmax", "embedding", "layer",
+                 "vector", "modelo", "atención", "capa", "token", "matrix", "score")
+        rows, t = [], 0.0
+        for _ in range(n):
+            dur = round(rnd.uniform(1.5, 4.5), 3)
+            text = " ".join(rnd.choice(words) for _ in range(rnd.randint(4, 12)))
+            rows.append({"text": text, "start": round(t, 3), "duration": dur})
+            t += dur * rnd.uniform(0.7, 1.0)
+    if shuffle:
+        rnd.shuffle(rows)
+    return rows
+
+
+def _vtt_ts(sec: float) -> str:
+    h, rem = divmod(sec, 3600)
+    m, s = divmod(rem, 60)
+    return f"{int(h):02d}:{int(m):02d}:{s:06.3f}"
+
+
+# Las mismas filas en formato WebVTT (como las devuelve yt-dlp)
+def synthetic_vtt(rows: List[Dict]) -> str:
+    out = ["WEBVTT", "Kind: captions", "Language: en", ""]
+    for r in rows:
+        out.append(f"{_vtt_ts(r['start'])} --> {_vtt_ts(r['start'] + r['duration'])} align:start position:0%")
+        out.append(r["text"])
+        out.append("")
+    return "\n".join(out)
+
+
+# Embeddings sintéticos agrupados por temas (como MiniLM: cada vídeo trata pocos temas).
+# Devuelve una matriz (videos·per_video, dim) normalizada, en orden de vídeo.
+def synthetic_embeddings(videos: int, per_video: int, dim: int = 384, topics: int = 200, seed: int = 0):
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(topics, dim)).astype(np.float32)
+    out = np.empty((videos * per_video, dim), dtype=np.float32)
+    for v in range(videos):
+        own = rng.choice(topics, 3, replace=False)
+        t = own[rng.integers(0, 3, per_video)]
+        out[v * per_video:(v + 1) * per_video] = centers[t] + rng.normal(scale=0.9, size=(per_video, dim))
+    return out / np.linalg.norm(out, axis=1, keepdims=True)
+
+
+# Tokenizer de juguete: ~1 token por cada 4 letras de palabra (como un subword)
+class StubTokenizer:
+    def __call__(self, texts, add_special_tokens=True):
+        extra = 2 if add_special_tokens else 0
+        return {"input_ids": [[0] * (sum(-(-len(w) // 4) for w in t.split()) + extra) for t in texts]}
+
+
+# Embedder determinista (hash de palabras → vector) con la interfaz de SentenceTransformer
+class StubEmbedder:
+    max_seq_length = 128
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.tokenizer = StubTokenizer()
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, texts, convert_to_numpy=True, show_progress_bar=False):
+        import numpy as np
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, t in enumerate(texts):
+            for w in t.lower().split():
+                out[i, zlib.crc32(w.encode("utf-8")) % self.dim] += 1.0
+        return out
@@ -1,65 +1,101 @@
 import streamlit as st
-import json
-import streamlit.components.v1 as components
-from sentence_transformers import SentenceTransformer
+import html
+import time
 from app.utils import yt_id_from_url
-from app.ingest import get_transcript_auto, segment_transcript
-from app.embeddings import embed_chunks
-from app.pinecone_store import ensure_index, upsert_chunks, query
-from app.rag_answer import rag_answer_with_citations
-from pathlib import Path
+from app.embeddings import embed_query
+from app.jobs import JobQueue
+from app.retrieval import hybrid_query
+from app.rag_answer import (
+    prepare_context, stream_rag_answer, citations_for_answer, cached_answer, store_answer, NOT_FOUND_ANSWERS,
+)
+from app.answer_cache import answer_cache_stats
+from app import metrics
 
 
 APP_TITLE = "YouTube al grano"   # título de la app
 WINDOW_SEC = 60                  # tamaño de chunk
 OVERLAP_SEC = 12                 # solape de chunk
-PREFERRED_LANGS = ("es", "en")   # prioridad de lenguajes
+PREFERRED_LANGS = ("es", "es-419", "en")   # prioridad de lenguajes (va en cada trabajo)
 TOP_K = 8                        # vecinos a recuperar
 CTX_MAX = 4                      # trozos al LLM
 CITE_K = 2                       # nº de citas a mostrar 
 MIN_SCORE = 0.40                 # umbral de similitud para filtrar hits
+WARMUP_MODELS = True             # precarga embeddings + LLM en segundo plano al arrancar
 
-EMB_MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
-_emb_model = None
-
-
-# Efecto máquina de escribir para la respuesta
-def typewriter_card(text: str, height: int | None = None):
-    if height is None:
-        chars_per_line = 95
-        import math
-        lines = max(1, math.ceil(len(text) / chars_per_line))
-        height = 90 + lines * 26 
-
-    html = f"""
-    <div class="card typewriter-card">
-        <div class="card-title">Respuesta</div>
-        <div id="tw" style="font-size:1rem; line-height:1.6; color:#111827; font-family:'Poppins', sans-serif;"></div>
-    </div>
-    <script>
-        const el = document.getElementById('tw');
-        const txt = {json.dumps(text)};
-        let i = 0;
-        const speed = 14;
-        function step() {{
-            if (i <= txt.length) {{
-                el.textContent = txt.slice(0, i);
-                i++;
-                setTimeout(step, speed);
-            }}
-        }}
-        step();
-    </script>
-    """
-    components.html(html, height=height, scrolling=False)
+
+# Tarjeta de respuesta; se repinta en el mismo hueco según llegan los tokens
+def answer_card(slot, text: str, streaming: bool = False):
+    cursor = '<span class="tw-cursor">▍</span>' if streaming else ""
+    slot.markdown(
+        f"""
+        <div class="card typewriter-card">
+            <div class="card-title">Respuesta</div>
+            <div style="font-size:1rem; line-height:1.6; color:#111827; font-family:'Poppins', sans-serif;">{html.escape(text)}{cursor}</div>
+        </div>
+        """,
+        unsafe_allow_html=True,
+    )
+
+
+# Precarga de modelos en segundo plano (una vez por proceso)
+@st.cache_resource(show_spinner=False)
+def start_warmup():
+    from app.embeddings import warmup as warmup_embeddings
+    from app.rag_answer import warmup as warmup_llm
+    return warmup_embeddings(), warmup_llm()
 
 
+# Endpoint /metrics y/o volcado a fichero si METRICS_ENABLED=1 (una vez por proceso)
 @st.cache_resource(show_spinner=False)
-def get_embedder():
-    return SentenceTransformer(EMB_MODEL_NAME)
+def start_metrics():
+    metrics.start_exporter()
+    return True
+
+
+# Cola de indexación en segundo plano (una por proceso; JOBS_WORKERS=0 si corre aparte)
+@st.cache_resource(show_spinner=False)
+def get_job_queue():
+    return JobQueue().start()
+
+
+# Progreso del trabajo de indexación: se refresca solo, sin bloquear el resto de la página
+@st.fragment(run_every=1)
+def index_job_status():
+    job = get_job_queue().get(st.session_state["index_job"])
+    if job is None:
+        st.session_state.pop("index_job", None)
+        return
+    if job["status"] == "queued":
+        st.info("⏳ En cola: se indexará en cuanto acabe el trabajo anterior.")
+    elif job["status"] == "running":
+        total = max(job["total_est"], job["embedded"], 1)
+        st.progress(
+            min(1.0, job["embedded"] / total),
+            text=f"{job['message'] or 'Indexando...'} Chunks con embedding: {job['embedded']} · subidos: {job['upserted']}",
+        )
+    elif job["status"] == "failed":
+        st.session_state.pop("index_job", None)
+        st.error(job["error"])
+    else:
+        report = job["result"]
+        st.session_state.pop("index_job", None)
+        st.session_state["last_video_id"] = job["video_id"]
+        st.session_state["last_url"] = job["url"]
+        if report["skipped"]:
+            st.session_state["index_notice"] = f"✅ Sin cambios: el vídeo ya estaba indexado ({report['chunks']} chunks)."
+        else:
+            st.session_state["index_notice"] = (
+                f"✅ Indexado OK. Vectores subidos: {report['upserted']} "
+                f"(sin cambios: {report['unchanged']}, borrados: {report['deleted']})."
+            )
+        st.rerun()   # repinta la página entera para habilitar las preguntas
 
 
 st.set_page_config(page_title=APP_TITLE, page_icon="🎯", layout="wide")
+start_metrics()
+
+if WARMUP_MODELS:
+    start_warmup()
 
 st.markdown(
     """
@@ -111,6 +147,9 @@ st.markdown(
             line-height: 1.5;
         }
 
+        .tw-cursor { color:var(--primary); animation: tw-blink 1s steps(1) infinite; }
+        @keyframes tw-blink { 50% { opacity:0; } }
+
         .cites { margin-top:.6rem; }
         .cite-item {
             background:var(--panel-alt); 
@@ -160,71 +199,18 @@ with col_left:
             st.error(f"No se pudo extraer el VIDEO_ID: {e}")
             st.stop()
 
-        with st.spinner("Descargando y segmentando subtítulos..."):
-            try:
-                rows = get_transcript_auto(
-                    vid,
-                    preferred_langs=("es","es-419","en"),
-                    fallback_url=url,
-                    cookiefile="cookies.txt",
-                    max_retries=6,
-                    backoff_base=2.0,
-                )
-            except Exception as e1:
-                cookie_txt = Path("cookies.txt")
-                tried_cookiefile = False
-                if cookie_txt.exists():
-                    try:
-                        rows = get_transcript_auto(
-                            vid,
-                            preferred_langs=PREFERRED_LANGS,
-                            fallback_url=url,
-                            cookiefile=str(cookie_txt),
-                        )
-                        tried_cookiefile = True
-                    except Exception:
-                        pass
-                if not tried_cookiefile:
-                    got = False
-                    for browser in (('chrome',), ('edge',)):
-                        try:
-                            st.warning(
-                                f"No pude obtener subtítulos de forma anónima ({e1}). "
-                                f"Intentando usar cookies de {browser[0]}…"
-                            )
-                            rows = get_transcript_auto(
-                                vid,
-                                preferred_langs=PREFERRED_LANGS,
-                                fallback_url=url,
-                                cookiesfrombrowser=browser,
-                            )
-                            got = True
-                            break
-                        except Exception:
-                            continue
-                    if not got:
-                        st.error(
-                            "No se pudieron obtener subtítulos (API + yt-dlp). "
-                            "Prueba a exportar cookies a 'cookies.txt' o cierra el navegador/usa el flag "
-                            "--disable-features=LockProfileCookieDatabase y reintenta."
-                        )
-                        st.stop()
-
-        chunks = segment_transcript(rows, window=WINDOW_SEC, overlap=OVERLAP_SEC)
-        chunks_with_embs = embed_chunks(chunks)
-
-        with st.spinner("🚀 Subiendo embeddings al índice vectorial..."):
-            ensure_index()
-            n = upsert_chunks(
-                chunks_with_embs,
-                video_id=vid,
-                title="YouTube video",
-                lang="auto",
-            )
+        job_id = get_job_queue().submit(
+            vid,
+            url,
+            {"window": WINDOW_SEC, "overlap": OVERLAP_SEC, "title": "YouTube video", "lang": "auto", "langs": PREFERRED_LANGS},
+        )
+        st.session_state["index_job"] = job_id
+
+    if st.session_state.get("index_job"):
+        index_job_status()
 
-        st.session_state["last_video_id"] = vid
-        st.session_state["last_url"] = url
-        st.success(f"✅ Indexado OK. Vectores subidos: {n}.")
+    if st.session_state.get("index_notice"):
+        st.success(st.session_state.pop("index_notice"))
 
     last_vid_for_thumb = st.session_state.get("last_video_id")
     if last_vid_for_thumb:
@@ -257,21 +243,39 @@ with col_right:
                 st.stop()
 
             with st.spinner("🔎 Buscando fragmentos relevantes..."):
-                embedder = get_embedder()
-                q_vec = embedder.encode([question], convert_to_numpy=True)[0]
-                hits_all = query(q_vec, top_k=TOP_K, video_id=last_vid)
-                hits = [h for h in hits_all if float(h.get("score", 0)) >= MIN_SCORE]
+                q_vec = embed_query(question)
+                hits = hybrid_query(question, q_vec, video_id=last_vid, top_k=TOP_K, min_score=MIN_SCORE)
 
             if not hits:
                 st.info("No encontré fragmentos suficientemente relevantes en este video.")
                 st.stop()
 
-            with st.spinner("🧠 Generando respuesta..."):
-                answer, citations = rag_answer_with_citations(
-                    last_vid, question, hits, ctx_max=CTX_MAX, cite_k=CITE_K
-                )
-
-            typewriter_card(answer)
+            slot = st.empty()
+            prepared = prepare_context(hits, ctx_max=CTX_MAX)
+            if prepared is None:
+                answer, citations = NOT_FOUND_ANSWERS[0], []
+                answer_card(slot, answer)
+            else:
+                context_hits, hits_dedup = prepared
+                t0 = time.perf_counter()
+                cached = cached_answer(last_vid, question, hits)
+                if cached is not None:
+                    answer, citations = cached
+                    answer_card(slot, answer)
+                    stats = answer_cache_stats()
+                    st.caption(
+                        f"⚡ Respuesta desde caché en {(time.perf_counter() - t0) * 1000:.0f} ms "
+                        f"(aciertos: {stats['hits']}/{stats['hits'] + stats['misses']})"
+                    )
+                else:
+                    answer = ""
+                    with st.spinner("🧠 Generando respuesta..."):
+                        for delta in stream_rag_answer(question, context_hits):
+                            answer += delta
+                            answer_card(slot, answer, streaming=True)
+                    answer_card(slot, answer)
+                    citations = citations_for_answer(last_vid, answer, hits_dedup, cite_k=CITE_K)
+                    store_answer(last_vid, question, hits, answer, citations)
 
             st.markdown("**Citas**")
             if not citations:
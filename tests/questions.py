@@ -0,0 +1,19 @@
+# Preguntas de evaluación sobre el vídeo de StatQuest (Transformers)
+URL = "https://www.youtube.com/watch?v=zxQyTK8quyY"
+
+QUESTIONS = [
+    "¿Qué dice el video sobre por qué los transformadores usan autoatención?",
+    "¿Qué explica el video sobre la diferencia entre atención y autoatención?",
+    "¿Qué dice el video sobre consultas (queries), claves (keys) y valores (values)?",
+    "¿Qué comenta el video sobre codificación posicional y para qué sirve?",
+    "¿El video menciona algo sobre el entrenamiento de transformadores?",
+    "¿Qué explica el video sobre multi-head attention y su ventaja respecto a una sola cabeza?",
+    "¿Qué explica el video sobre el papel del softmax en la atención?",
+    "¿Qué dice el video sobre el flujo de información desde embeddings hasta la salida del modelo?",
+    "What does the video say about why transformers use self-attention?",
+    "What does the video say about why the dot product is scaled in attention?",
+    "What does the video explain about multi-head attention and its advantage over a single head?",
+    "What does the video say about reusing the weight matrices when computing queries, keys, and values?",
+    "What does the video explain about the similarity (attention score) matrix across words?",
+    "What does the video explain about the role of softmax in attention?",
+]
@@ -0,0 +1,101 @@
+import tempfile
+from pathlib import Path
+import numpy as np
+from app import local_store
+from benchmarks.synthetic import synthetic_embeddings
+
+# Índice local temporal; el IVF se activa a partir de 2000 vectores
+local_store.LOCAL_INDEX_DIR = Path(tempfile.mkdtemp())
+local_store.ANN_MIN_VECTORS = 2000
+local_store.ensure_index()
+
+VIDEOS, PER = 40, 100
+vecs = synthetic_embeddings(VIDEOS, PER, dim=local_store.DIM, seed=3)
+
+
+def upsert(v, block):
+    chunks = [{"start_sec": i * 48.0, "end_sec": i * 48.0 + 60.0, "text": f"v{v} c{i}", "embedding": e} for i, e in enumerate(block)]
+    local_store.upsert_chunks(chunks, video_id=f"v{v}")
+
+
+for v in range(VIDEOS):
+    upsert(v, vecs[v * PER:(v + 1) * PER])
+
+rng = np.random.default_rng(0)
+qs = vecs[rng.choice(len(vecs), 50, replace=False)] + rng.normal(scale=0.03, size=(50, local_store.DIM))
+
+
+def recall(**kw):
+    r = []
+    for q in qs:
+        exact = {h["id"] for h in local_store.query(q, top_k=8, exact=True)}
+        got = {h["id"] for h in local_store.query(q, top_k=8, **kw)}
+        r.append(len(exact & got) / len(exact))
+    return float(np.mean(r))
+
+
+# Se entrena solo en la primera consulta sin video_id
+assert local_store._ann is None
+hits = local_store.query(qs[0], top_k=8)
+ann = local_store._ann
+assert ann is not None and len(ann) == VIDEOS * PER and (local_store.LOCAL_INDEX_DIR / "_ann" / "centroids.npy").exists()
+assert [h["score"] for h in hits] == sorted((h["score"] for h in hits), reverse=True)
+
+# nprobe = nlist es exacto; más nprobe nunca empeora el recall
+r1, r4, rall = recall(nprobe=1), recall(nprobe=4), recall(nprobe=ann.nlist)
+print(f"nlist={ann.nlist} | recall@8 nprobe=1: {r1:.3f}  nprobe=4: {r4:.3f}  nprobe=nlist: {rall:.3f}")
+assert rall == 1.0 and r1 <= r4 <= rall and r4 >= 0.8
+
+# Aunque las nprobe listas no lleguen a top_k candidatos, se devuelven top_k
+assert len(local_store.query(qs[0], top_k=500, nprobe=1)) == 500
+
+# Con video_id no se usa el IVF (búsqueda exacta dentro del vídeo)
+assert {h["video_id"] for h in local_store.query(qs[0], top_k=5, video_id="v3")} == {"v3"}
+
+# Inserción incremental: un vídeo nuevo es visible sin reentrenar
+new = synthetic_embeddings(1, PER, dim=local_store.DIM, seed=99)
+upsert(VIDEOS, new)
+assert local_store._ann is ann and f"v{VIDEOS}" in ann
+assert local_store.query(new[5], top_k=1)[0]["id"] == f"v{VIDEOS}:5"
+
+# Borrado por ids: desaparecen del IVF
+local_store.delete_ids([f"v{VIDEOS}:{i}" for i in range(PER)])
+assert f"v{VIDEOS}" not in ann
+assert all(not h["id"].startswith(f"v{VIDEOS}:") for h in local_store.query(new[5], top_k=8, nprobe=ann.nlist))
+
+# Sustituir un vídeo reutiliza su código: la tabla de claves no crece
+n_keys = len(ann._keys)
+for _ in range(3):
+    upsert(0, vecs[:PER])
+assert len(ann._keys) == n_keys and len(ann) == VIDEOS * PER
+
+# Otro proceso reescribe un vídeo en sitio (filas invertidas): el IVF lo resincroniza
+local_store._ann = None
+upsert(1, vecs[2 * PER - 1:PER - 1:-1])
+local_store._ann = ann
+hit = local_store.query(vecs[PER], top_k=1, nprobe=ann.nlist)[0]
+assert hit["id"] == f"v1:{PER - 1}" and abs(hit["score"] - 1.0) < 1e-5
+
+# Por debajo de ANN_MIN_VECTORS (tras borrar) vuelve la búsqueda exacta aunque el IVF esté cargado
+local_store.ANN_MIN_VECTORS = VIDEOS * PER + 1
+assert local_store._get_ann(local_store._all_video_ids()) is None
+local_store.ANN_MIN_VECTORS = 2000
+
+# Otro proceso (reset) recarga centroides y asignaciones del disco sin reentrenar
+version = ann.version
+local_store.reset_client()
+local_store.query(qs[0], top_k=8)
+assert local_store._ann.version == version and len(local_store._ann) == VIDEOS * PER
+
+# IVF en int8: los candidatos se reordenan en float32 (un rescore por vídeo) y con
+# nprobe = nlist coinciden con la búsqueda exacta, puntuaciones incluidas
+local_store.LOCAL_VECTOR_DTYPE = "int8"
+local_store.reset_client()
+local_store.query(qs[0], top_k=1)       # recarga el IVF (mismos centroides) en int8
+for q in qs[:10]:
+    exact = local_store.query(q, top_k=8, exact=True)
+    got = local_store.query(q, top_k=8, nprobe=local_store._ann.nlist)
+    assert [h["id"] for h in got] == [h["id"] for h in exact]
+    assert all(abs(a["score"] - b["score"]) < 1e-5 for a, b in zip(got, exact))
+assert local_store._ann.dtype == "int8"
+print("OK")
@@ -0,0 +1,77 @@
+import tempfile, time
+from pathlib import Path
+from app.answer_cache import AnswerCache
+from app import rag_answer
+
+path = Path(tempfile.mkdtemp()) / "answers.json"
+cache = AnswerCache(path, max_entries=3, ttl=3600)
+
+k = AnswerCache.key("vidA", "¿Qué es la autoatención?", ["vidA:3", "vidA:1"], "qwen@fp32", "v1")
+
+# La normalización de la pregunta y el orden de los ids no cambian la clave
+assert k == AnswerCache.key("vidA", "  qué es la   AUTOATENCIÓN ", ["vidA:1", "vidA:3"], "qwen@fp32", "v1")
+assert k != AnswerCache.key("vidA", "¿Qué es la autoatención?", ["vidA:1", "vidA:4"], "qwen@fp32", "v1")
+assert k != AnswerCache.key("vidA", "¿Qué es la autoatención?", ["vidA:1", "vidA:3"], "qwen@int8", "v1")
+assert k != AnswerCache.key("vidA", "¿Qué es la autoatención?", ["vidA:1", "vidA:3"], "qwen@fp32", "v2")
+
+assert cache.get(k) is None
+cache.put(k, "vidA", "Una respuesta.", [{"minute": "01:00", "url": "u"}])
+t = time.perf_counter()
+assert cache.get(k) == ("Una respuesta.", [{"minute": "01:00", "url": "u"}])
+assert time.perf_counter() - t < 0.005
+
+# Persistente entre instancias
+assert AnswerCache(path, max_entries=3).get(k) is not None
+
+# LRU acotada: k se usó hace poco y sobrevive a dos inserciones
+cache.put("k2", "vidB", "b", [])
+cache.put("k3", "vidB", "c", [])
+cache.get(k)
+cache.put("k4", "vidB", "d", [])
+assert cache.get("k2") is None and cache.get(k) is not None
+
+# Invalidación por vídeo al reindexar
+assert cache.invalidate_video("vidA") == 1 and cache.get(k) is None
+
+# Otra instancia sobre el mismo fichero (el worker en otro proceso) invalida un vídeo:
+# esta lo ve y su siguiente put no resucita lo invalidado
+cache.put("k5", "vidA", "e", [])
+ui, worker = AnswerCache(path, max_entries=3), AnswerCache(path, max_entries=3)
+assert ui.get("k5") is not None
+assert worker.invalidate_video("vidA") == 1
+assert ui.get("k5") is None
+ui.put("k6", "vidB", "f", [])
+assert worker.get("k5") is None and worker.get("k6") is not None
+
+# Cada put solo añade una línea al registro; con muchas líneas muertas se compacta
+# y la otra instancia recarga desde la cabecera nueva
+size = path.stat().st_size
+ui.put("k7", "vidB", "g", [])
+assert path.read_bytes()[size:].count(b"\n") == 1
+for i in range(300):
+    ui.put(f"x{i}", "vidD", str(i), [])
+assert len(path.read_bytes().splitlines()) < 300
+assert worker.get("x299") == ("299", []) and worker.get("k7") is None
+
+# Un fichero del formato anterior (JSON entero) se descarta sin romper
+old = Path(tempfile.mkdtemp()) / "answers.json"
+old.write_text('{"entries": []}', encoding="utf-8")
+legacy = AnswerCache(old)
+assert legacy.get("k") is None
+legacy.put("k", "vidA", "a", [])
+assert AnswerCache(old).get("k") == ("a", [])
+
+# TTL
+short = AnswerCache(Path(tempfile.mkdtemp()) / "a.json", ttl=0.0)
+short.put("x", "vidC", "x", [])
+time.sleep(0.01)
+assert short.get("x") is None
+
+# La clave usa la precisión efectiva: bf16 sin soporte en la CPU cuenta como fp32
+# también antes de cargar el modelo (misma clave antes y después del fallback)
+rag_answer.LLM_PRECISION, rag_answer._bf16_supported = "bf16", lambda: False
+before = rag_answer._model_tag("qwen")
+rag_answer._loaded = ("qwen", rag_answer._resolve_precision())
+assert before == rag_answer._model_tag("qwen") == "qwen@fp32"
+rag_answer._loaded = None
+print("stats:", cache.stats())
@@ -0,0 +1,43 @@
+import os, tempfile, time
+# Caché de respuestas vacía en un directorio temporal: todo se genera (también al repetir)
+os.environ["ANSWER_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "answers.jsonl")
+
+from app.utils import yt_id_from_url
+from app.ingest import get_transcript_auto, segment_transcript
+from app.embeddings import embed_chunks, embed_texts
+from app.vector_store import ensure_index, upsert_chunks
+from app.retrieval import hybrid_query
+from app.rag_answer import NOT_FOUND_ANSWERS, generate_rag_answer, prepare_context
+from app.batch_qa import answer_many
+from questions import URL, QUESTIONS
+
+
+VID = yt_id_from_url(URL)
+rows = get_transcript_auto(VID, fallback_url=URL)
+ensure_index()
+upsert_chunks(embed_chunks(segment_transcript(rows, window=60, overlap=12)), video_id=VID, title="StatQuest: Transformers", lang="en")
+
+# Una a una (referencia): misma recuperación y mismo contexto que answer_many
+t0 = time.perf_counter()
+one_by_one = []
+for q, vec in zip(QUESTIONS, embed_texts(QUESTIONS)):
+    prepared = prepare_context(hybrid_query(q, vec, video_id=VID, top_k=8), ctx_max=4, min_gap_sec=45.0, min_top_score=0.35)
+    one_by_one.append(generate_rag_answer(q, prepared[0]) if prepared else NOT_FOUND_ANSWERS[0])
+t_seq = time.perf_counter() - t0
+
+# En lote
+batch = answer_many(VID, QUESTIONS, batch_size=4)
+print(f"Secuencial: {len(QUESTIONS) / t_seq:.2f} preguntas/s | en lote: {batch['stats']['questions_per_sec']:.2f} preguntas/s")
+print("Tiempos en lote:", {k: round(v, 2) for k, v in batch["stats"].items() if k.endswith("_sec")})
+
+for r in batch["results"]:
+    print("\nQ:", r["question"])
+    print("A:", r["answer"])
+    for c in r["citations"]:
+        print(f"- {c['minute']} -> {c['url']}")
+
+# Nada sale de la caché, el orden es el de entrada y, con decodificación greedy, el lote
+# con padding a la izquierda responde lo mismo que la generación una a una
+assert batch["stats"]["cached"] == 0
+assert [r["question"] for r in batch["results"]] == QUESTIONS
+assert [r["answer"] for r in batch["results"]] == one_by_one
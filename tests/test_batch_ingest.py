@@ -0,0 +1,60 @@
+import json, os, tempfile
+from pathlib import Path
+os.environ["VECTOR_BACKEND"] = "local"
+os.environ["ANSWER_CACHE_MAX"] = "0"
+
+from app import batch_ingest, bm25, embeddings, local_store, manifest, vector_store
+from benchmarks.synthetic import StubEmbedder, synthetic_rows
+
+tmp = Path(tempfile.mkdtemp())
+local_store.LOCAL_INDEX_DIR = tmp / "index"
+bm25.BM25_DIR = tmp / "bm25"
+manifest.MANIFEST_DIR = tmp / "manifests"
+embeddings._models[embeddings.EMB_MODEL_NAME] = StubEmbedder()
+checkpoint = tmp / "checkpoint.jsonl"
+
+
+# Descarga de prueba: "nosubs0000a" no tiene subtítulos
+def fake_fetch(vid, fallback_url=None, cookiefile=None, rate_limiter=None):
+    if vid == "nosubs0000a":
+        raise RuntimeError("sin subtítulos")
+    return synthetic_rows(200, seed=sum(map(ord, vid)))
+
+
+# Subida de prueba: falla para "upfails000a"
+real_upsert = vector_store.upsert_chunks
+def flaky_upsert(chunks, video_id=None, **kw):
+    if video_id == "upfails000a":
+        raise OSError("disco lleno")
+    return real_upsert(chunks, video_id=video_id, **kw)
+
+
+batch_ingest.get_transcript_auto = fake_fetch
+vector_store.upsert_chunks = flaky_upsert
+
+# Fichero de entrada: URL o VIDEO_ID, con título opcional tras un tabulador
+urls = tmp / "urls.txt"
+urls.write_text("# canal\nokvideo000a\tPrimer vídeo\nnosubs0000a\n\nhttps://youtu.be/upfails000a\nokvideo000b\t  Segundo vídeo \nokvideo000a\n", encoding="utf-8")
+targets = batch_ingest.read_targets(str(urls))
+assert [(v, t) for v, _, t in targets] == [("okvideo000a", "Primer vídeo"), ("nosubs0000a", None), ("upfails000a", None), ("okvideo000b", "Segundo vídeo")]
+
+# Un vídeo que falla (descarga o subida) no aborta el lote: queda "failed" en el checkpoint
+# y los demás del mismo lote de embeddings se indexan
+report = batch_ingest.run_batch(targets, workers=2, rate=100, burst=100, embed_batch=10_000, checkpoint=checkpoint)
+recs = {r["video_id"]: r for r in map(json.loads, checkpoint.read_text(encoding="utf-8").splitlines())}
+assert report["videos"] == 2 and report["failed"] == 2, report
+assert recs["nosubs0000a"]["status"] == "failed" and "sin subtítulos" in recs["nosubs0000a"]["error"]
+assert recs["upfails000a"]["status"] == "failed" and "disco lleno" in recs["upfails000a"]["error"]
+assert recs["okvideo000a"]["status"] == recs["okvideo000b"]["status"] == "done"
+
+# El título es el de cada línea (metadatos y manifiesto), no uno común al lote
+q = StubEmbedder().encode(["attention"])[0]
+assert local_store.query(q, top_k=1, video_id="okvideo000b")[0]["title"] == "Segundo vídeo"
+assert local_store.query(q, top_k=1, video_id="okvideo000a")[0]["title"] == "Primer vídeo"
+assert manifest.load_manifest("okvideo000b")["params"]["title"] == "Segundo vídeo"
+
+# Al reanudar solo se reintentan los fallidos
+vector_store.upsert_chunks = real_upsert
+report = batch_ingest.run_batch(targets, workers=2, rate=100, burst=100, checkpoint=checkpoint)
+assert report["videos"] == 1 and report["failed"] == 1, report
+print("OK")
@@ -0,0 +1,51 @@
+import os, tempfile, time
+from pathlib import Path
+os.environ["VECTOR_BACKEND"] = "local"
+
+from app import bm25, retrieval
+from app.ingest import segment_transcript
+from benchmarks.synthetic import synthetic_rows
+
+bm25.BM25_DIR = Path(tempfile.mkdtemp())
+
+# Vídeo de ~1 h con un término raro en un único chunk
+rows = synthetic_rows(1400, seed=3)
+rows[700]["text"] += " GPT-4o usa RoPE con θ=10000"
+chunks = segment_transcript(rows, window=60, overlap=12)
+print("Chunks:", len(chunks))
+index = bm25.build_index("vidA", chunks)
+
+target = [i for i, c in enumerate(chunks) if "RoPE" in c["text"]]
+hits = index.search("¿Qué dice sobre rope?", top_k=3)
+assert hits and hits[0]["id"] in {f"vidA:{i}" for i in target}, hits[:1]
+
+# Tildes y mayúsculas no importan
+assert bm25.tokenize("Atención ATENCION") == ["atencion", "atencion"]
+
+# Latencia de consulta (sin contar la tokenización de la ingesta)
+n = 2000
+t = time.perf_counter()
+for _ in range(n):
+    index.search("what does the softmax do to the attention score", top_k=8)
+per_query = (time.perf_counter() - t) / n
+print(f"BM25: {per_query * 1e6:.0f} µs/consulta")
+assert per_query < 1e-3
+
+# Persistencia: otro proceso lo lee del disco con los mismos resultados
+bm25._loaded.clear()
+again = bm25.get_index("vidA")
+assert again is not None and again.search("¿Qué dice sobre rope?", top_k=3) == hits
+assert bm25.get_index("noexiste") is None
+
+# Si otro proceso reescribe el fichero, la copia en memoria se descarta
+bm25.BM25Index.build(chunks[:10], "vidA").save(bm25._path("vidA"))
+assert len(bm25.get_index("vidA").docs) == 10
+
+# RRF: un hit presente en ambas listas sube; uno solo léxico entra con score 0.0
+vec = [{"id": "v:1", "score": 0.8, "start_sec": 0}, {"id": "v:2", "score": 0.7, "start_sec": 60}]
+lex = [{"id": "v:2", "bm25": 5.0, "start_sec": 60}, {"id": "v:3", "bm25": 4.0, "start_sec": 120}]
+fused = retrieval.rrf_fuse([vec, lex], k=60)
+assert [h["id"] for h in fused] == ["v:2", "v:1", "v:3"]
+assert fused[0]["score"] == 0.7 and fused[0]["bm25"] == 5.0
+assert fused[2]["score"] == 0.0
+print("OK")
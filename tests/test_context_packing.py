@@ -0,0 +1,38 @@
+from app import rag_answer
+from app.ingest import segment_transcript
+from benchmarks.synthetic import StubTokenizer, synthetic_rows
+
+# Tokenizer de juguete en lugar del del LLM (el empaquetado solo necesita contar tokens)
+rag_answer._tokenizer = StubTokenizer()
+count = lambda t: rag_answer._token_counts([t])[0]
+
+rows = synthetic_rows(400, seed=3)
+for i in range(0, 400, 5):
+    rows[i]["text"] += "."          # algunas frases terminadas
+chunks = [dict(c, video_id="vid", id=f"vid:{i}") for i, c in enumerate(segment_transcript(rows))]
+
+# Chunks consecutivos (solapan 12 s): se funden en un tramo sin repetir el texto común
+a, b = chunks[3], chunks[4]
+merged = rag_answer._merge_hits([b, a])
+assert len(merged) == 1 and merged[0]["start_sec"] == a["start_sec"] and merged[0]["end_sec"] == b["end_sec"]
+shared = len(a["text"].split()) + len(b["text"].split()) - len(merged[0]["text"].split())
+assert shared > 0 and merged[0]["text"].startswith(a["text"]) and merged[0]["text"].endswith(b["text"].split(" ", shared)[-1])
+print(f"Fusión 3+4: {shared} palabras repetidas eliminadas")
+
+# Otro vídeo con los mismos tiempos no se funde
+assert len(rag_answer._merge_hits([a, dict(b, video_id="otro")])) == 2
+
+# Presupuesto: nunca se pasa y se llena en orden de relevancia
+hits = [chunks[10], chunks[3], chunks[4], chunks[20]]
+for budget in (40, 120, 300, 2000):
+    lines = rag_answer._pack_context(hits, budget)
+    used = sum(count(l + "\n") for l in lines)
+    print(f"presupuesto {budget:4d}: {len(lines)} líneas, {used} tokens")
+    assert used <= budget and lines[0].startswith("[" + rag_answer.hhmmss(chunks[10]["start_sec"]))
+
+# Recorte en frase: la última línea recortada termina en punto (o en "…" si no hay frases)
+lines = rag_answer._pack_context(hits, 120)
+assert lines[-1].endswith((".", "…"))
+assert rag_answer._trim_to_tokens("uno dos tres. cuatro cinco seis. siete", count("uno dos tres. cuatro cinco seis.")) == "uno dos tres. cuatro cinco seis."
+assert rag_answer._trim_to_tokens("palabras sin ninguna puntuación al final", 4).endswith("…")
+print("OK")
@@ -0,0 +1,77 @@
+import tempfile, threading
+import numpy as np
+from app.embedding_cache import EmbeddingCache
+
+root = tempfile.mkdtemp()
+dim = 8
+rng = np.random.default_rng(0)
+texts = [f"texto número {i}" for i in range(20)]
+vecs = rng.normal(size=(20, dim)).astype(np.float32)
+
+cache = EmbeddingCache(root, "fake/model", dim, max_entries=15)
+keys = [cache.key(t) for t in texts]
+
+# Primera pasada: todo son fallos
+assert all(v is None for v in cache.get_many(keys[:10]))
+cache.put_many(keys[:10], vecs[:10])
+
+# Segunda pasada: aciertos exactos, y la normalización de espacios comparte clave
+got = cache.get_many(keys[:10])
+assert all(np.array_equal(g, v) for g, v in zip(got, vecs[:10]))
+assert cache.key("  texto   número 3 ") == keys[3]
+
+# Persistencia: otra instancia lee el mismo fichero append-only
+cache2 = EmbeddingCache(root, "fake/model", dim, max_entries=15)
+assert np.array_equal(cache2.get_many([keys[4]])[0], vecs[4])
+
+# Expulsión LRU acotada: la clave 4 se acaba de usar y sobrevive
+cache2.put_many(keys[10:], vecs[10:])
+st = cache2.stats()
+assert st["entries"] == 15
+assert cache2.get_many([keys[4]])[0] is not None
+assert cache2.get_many([keys[0]])[0] is None
+
+# Otro modelo = otro espacio de claves
+assert EmbeddingCache(root, "other/model", dim).get_many([keys[4]]) == [None]
+
+# Dos escritores sobre el mismo directorio (como la CLI y el worker): cada uno añade
+# tras las filas del otro y lee lo que el otro apuntó; cada put solo añade su cola
+root2 = tempfile.mkdtemp()
+many = rng.normal(size=(400, dim)).astype(np.float32)
+mkeys = [f"{i:040x}" for i in range(400)]
+a, b = EmbeddingCache(root2, "fake/model", dim), EmbeddingCache(root2, "fake/model", dim)
+log_size = a.log_path.stat().st_size
+a.put_many(mkeys[:1], many[:1])
+assert a.log_path.stat().st_size - log_size == len(f"{mkeys[0]} 0\n")
+
+
+def writer(c, part):
+    for i in range(part, 400, 20):
+        c.put_many(mkeys[i:i + 10], many[i:i + 10])
+
+
+threads = [threading.Thread(target=writer, args=(c, p)) for c, p in ((a, 0), (b, 10))]
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+for c in (a, b, EmbeddingCache(root2, "fake/model", dim)):
+    assert all(np.array_equal(g, v) for g, v in zip(c.get_many(mkeys), many))
+assert a.stats()["bytes"] == 400 * dim * 4
+
+# Compactar en una instancia obliga a la otra a recargar (filas renumeradas)
+a.max_entries = 50
+a.put_many(["f" * 40], many[:1])            # expulsa en memoria hasta 50 entradas
+a._compact()
+assert a.stats()["bytes"] == 50 * dim * 4
+assert np.array_equal(b.get_many(["f" * 40])[0], many[0]) and b.get_many([mkeys[0]]) == [None]
+
+# Las preguntas se codifican sin pasar por la caché en disco de los documentos
+from app import embeddings
+from benchmarks.synthetic import StubEmbedder
+embeddings._models["fake/model"] = StubEmbedder()
+embeddings._caches["fake/model"] = qcache = EmbeddingCache(tempfile.mkdtemp(), "fake/model", 384)
+q = embeddings.embed_query("¿qué es un transformer?", model_name="fake/model")
+assert q.shape == (384,) and qcache.stats()["entries"] == 0
+assert np.array_equal(q, embeddings.embed_texts(["¿qué es un transformer?"], model_name="fake/model")[0])
+print("stats:", cache2.stats())
@@ -0,0 +1,64 @@
+import os, tempfile
+from pathlib import Path
+os.environ["VECTOR_BACKEND"] = "local"
+os.environ["ANSWER_CACHE_MAX"] = "0"
+
+from app import bm25, embeddings, local_store, manifest
+from app.pipeline import index_video
+from benchmarks.synthetic import StubEmbedder, synthetic_rows
+
+local_store.LOCAL_INDEX_DIR = Path(tempfile.mkdtemp())
+bm25.BM25_DIR = Path(tempfile.mkdtemp())
+manifest.MANIFEST_DIR = Path(tempfile.mkdtemp())
+
+
+# Embedder de prueba que cuenta los textos codificados
+class CountingEmbedder(StubEmbedder):
+    encoded = 0
+
+    def encode(self, texts, **kw):
+        CountingEmbedder.encoded += len(texts)
+        return super().encode(texts, **kw)
+
+
+embeddings._models[embeddings.EMB_MODEL_NAME] = CountingEmbedder()
+
+
+def ids_in_index(video_id):
+    local_store.reset_client()
+    return local_store._load_video(video_id)["ids"]
+
+
+rows = synthetic_rows(900, seed=2)
+
+# 1) Primera indexación: todo
+r1 = index_video("vidA", rows)
+print("Primera:", r1)
+assert r1["upserted"] == r1["chunks"] and not r1["skipped"] and CountingEmbedder.encoded == r1["chunks"]
+
+# 2) Misma transcripción: no se embebe ni se sube nada
+CountingEmbedder.encoded = 0
+r2 = index_video("vidA", rows)
+print("Sin cambios:", r2)
+assert r2["skipped"] and r2["upserted"] == 0 and CountingEmbedder.encoded == 0
+
+# 3) Una línea editada: solo los chunks que la contienen (≤ 2 por el solape)
+rows_edit = [dict(r) for r in rows]
+rows_edit[400]["text"] += " corrección"
+r3 = index_video("vidA", rows_edit)
+print("Una línea cambiada:", r3)
+assert 1 <= r3["upserted"] <= 2 and CountingEmbedder.encoded == r3["upserted"]
+assert r3["unchanged"] == r3["chunks"] - r3["upserted"]
+
+# 4) Transcripción más corta: los ids sobrantes se borran
+short = rows_edit[:500]
+r4 = index_video("vidA", short)
+print("Más corta:", r4)
+assert r4["deleted"] == r1["chunks"] - r4["chunks"]
+assert sorted(ids_in_index("vidA"), key=lambda s: int(s.split(":")[1])) == [f"vidA:{i}" for i in range(r4["chunks"])]
+assert len(bm25.get_index("vidA").docs) == r4["chunks"]
+
+# 5) force=True lo vuelve a subir todo
+r5 = index_video("vidA", short, force=True)
+assert r5["upserted"] == r5["chunks"] and r5["deleted"] == 0
+print("OK")
@@ -0,0 +1,76 @@
+import tempfile, threading, time
+from pathlib import Path
+from app.jobs import JobQueue
+
+tmp = Path(tempfile.mkdtemp())
+gate = threading.Event()
+ran = []
+
+
+# Runner de prueba: informa progreso, espera a la señal y falla con "boom"
+def fake_runner(video_id, url, params, progress):
+    ran.append(video_id)
+    progress(total_est=10, message="Indexando…")
+    for i in range(1, 11):
+        progress(embedded=i, upserted=i - 1)
+        time.sleep(0.03)
+    gate.wait(5)
+    if video_id == "boom":
+        raise RuntimeError("sin subtítulos")
+    return {"skipped": False, "chunks": 10, "upserted": 10, "unchanged": 0, "deleted": 0}
+
+
+# 1) Deduplicación: mismo vídeo pendiente → mismo trabajo
+q = JobQueue(tmp / "jobs.db", workers=1, runner=fake_runner)
+a = q.submit("vidA", "https://youtu.be/vidA", {"window": 60})
+assert q.submit("vidA", "https://youtu.be/vidA") == a
+assert q.active_for("vidA")["id"] == a and q.get(a)["params"] == {"window": 60}
+
+# 2) Progreso visible mientras corre y resultado al acabar
+q.start()
+deadline = time.time() + 5
+while (q.get(a)["embedded"] < 3) and time.time() < deadline:
+    time.sleep(0.02)
+job = q.get(a)
+print("En curso:", job["status"], job["embedded"], job["upserted"], job["total_est"], job["message"])
+assert job["status"] == "running" and job["total_est"] == 10 and job["embedded"] >= 3
+assert q.submit("vidA", "https://youtu.be/vidA") == a      # en curso también deduplica
+gate.set()
+while q.get(a)["status"] == "running" and time.time() < deadline:
+    time.sleep(0.02)
+job = q.get(a)
+assert job["status"] == "done" and job["result"]["upserted"] == 10 and job["embedded"] == 10
+
+# Terminado: volver a enviarlo crea un trabajo nuevo
+b = q.submit("vidA", "https://youtu.be/vidA")
+assert b != a
+
+# 3) Fallo: queda "failed" con el mensaje y el worker sigue vivo
+c = q.submit("boom", "https://youtu.be/boom")
+while q.get(c)["status"] in ("queued", "running") and time.time() < deadline + 5:
+    time.sleep(0.02)
+assert q.get(c)["status"] == "failed" and q.get(c)["error"] == "sin subtítulos"
+while q.get(b)["status"] != "done" and time.time() < deadline + 5:
+    time.sleep(0.02)
+q.stop()
+
+# 4) Trabajo "running" huérfano (proceso muerto): se reencola y se completa
+with q._connect() as con:
+    con.execute(
+        "INSERT INTO jobs (id, video_id, url, params, status, created, heartbeat) VALUES ('stale', 'vidS', 'u', '{}', 'running', 0, 0)"
+    )
+q2 = JobQueue(tmp / "jobs.db", workers=1, runner=fake_runner)
+assert q2.run_once() and q2.get("stale")["status"] == "done"
+
+# 5) Varios workers: cada trabajo se ejecuta una sola vez
+ran.clear()
+q3 = JobQueue(tmp / "jobs.db", workers=4, runner=fake_runner)
+ids = [q3.submit(f"v{i}", "u") for i in range(8)]
+q3.start()
+deadline = time.time() + 10
+while any(q3.get(i)["status"] != "done" for i in ids) and time.time() < deadline:
+    time.sleep(0.05)
+q3.stop()
+assert sorted(ran) == sorted(f"v{i}" for i in range(8)), ran
+print("Últimos:", [(j["video_id"], j["status"]) for j in q3.list(3)])
+print("OK")
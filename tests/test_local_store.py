@@ -0,0 +1,43 @@
+import tempfile
+from pathlib import Path
+import numpy as np
+from app import local_store
+
+# Índice local en un directorio temporal (no toca data/index)
+local_store.LOCAL_INDEX_DIR = Path(tempfile.mkdtemp())
+local_store.ensure_index()
+
+rng = np.random.default_rng(0)
+embs = rng.normal(size=(50, local_store.DIM)).astype(np.float32)
+chunks = [
+    {"start_sec": i * 48.0, "end_sec": i * 48.0 + 60.0, "text": f"chunk {i}", "embedding": embs[i]}
+    for i in range(50)
+]
+n = local_store.upsert_chunks(chunks, video_id="vidA", title="Test video")["upserted"]
+print("Subidos al índice local:", n)
+assert n == 50
+
+# El vector de un chunk debe devolverse a sí mismo en primer lugar
+hits = local_store.query(embs[7], top_k=3, video_id="vidA")
+assert hits[0]["text"] == "chunk 7" and abs(hits[0]["score"] - 1.0) < 1e-5
+assert [h["score"] for h in hits] == sorted((h["score"] for h in hits), reverse=True)
+
+# Coincide con el top-k exacto por fuerza bruta
+q = rng.normal(size=local_store.DIM).astype(np.float32)
+norm = embs / np.linalg.norm(embs, axis=1, keepdims=True)
+expected = np.argsort(-(norm @ (q / np.linalg.norm(q))))[:5]
+got = [int(h["text"].split()[1]) for h in local_store.query(q, top_k=5, video_id="vidA")]
+assert got == expected.tolist()
+
+# Re-upsert sobrescribe por id y el filtro por vídeo se respeta
+local_store.upsert_chunks(chunks[:10], video_id="vidA")
+local_store.upsert_chunks(chunks[:5], video_id="vidB")
+assert len(local_store.query(q, top_k=100, video_id="vidA")) == 50
+assert {h["video_id"] for h in local_store.query(q, top_k=100)} == {"vidA", "vidB"}
+
+# Otro proceso reescribe vidB: la copia en memoria queda vieja y se relee del disco
+stale = local_store._videos["vidB"]
+local_store.upsert_chunks([dict(chunks[0], embedding=-embs[0])], video_id="vidB")
+local_store._videos["vidB"] = stale
+assert local_store.query(-embs[0], top_k=1, video_id="vidB")[0]["score"] > 0.99
+print("OK:", [h["text"] for h in hits])
@@ -0,0 +1,64 @@
+import re, time, urllib.request
+from pathlib import Path
+from app import metrics
+
+# Convención de Prometheus: todos los contadores de la app terminan en _total
+names = re.findall(r'metrics\.inc\("(\w+)"', "".join(p.read_text(encoding="utf-8") for p in (Path(__file__).resolve().parent.parent / "app").glob("*.py")))
+assert names and all(n.endswith("_total") for n in names), [n for n in names if not n.endswith("_total")]
+
+# Desactivadas: no registran nada y el coste por llamada es despreciable
+metrics.METRICS_ENABLED = False
+with metrics.span("x"):
+    metrics.inc("c_total")
+assert metrics.render_prometheus() == "\n"
+
+n = 100_000
+t = time.perf_counter()
+for _ in range(n):
+    with metrics.span("x"):
+        pass
+per_call = (time.perf_counter() - t) / n
+print(f"span desactivado: {per_call * 1e6:.2f} µs/llamada")
+assert per_call < 5e-6
+
+# Activadas
+metrics.METRICS_ENABLED = True
+metrics.reset()
+
+
+@metrics.timed("outer")
+def work():
+    with metrics.span("inner", stage="embed"):
+        time.sleep(0.002)
+
+
+work()
+work()
+metrics.inc("transcript_source_total", source="api")
+metrics.inc("transcript_source_total", 2, source="ytdlp")
+try:
+    with metrics.span("boom"):
+        raise ValueError("x")
+except ValueError:
+    pass
+
+text = metrics.render_prometheus()
+print(text)
+assert 'ytrag_transcript_source_total{source="ytdlp"} 2' in text
+assert 'ytrag_span_seconds_count{span="outer"} 2' in text
+assert 'ytrag_span_seconds_count{span="boom"} 1' in text
+assert 'ytrag_span_errors_total{span="boom"} 1' in text
+
+# Histograma acumulado: cubos no decrecientes y +Inf = count
+buckets = [int(v) for v in re.findall(r'ytrag_span_seconds_bucket\{span="inner",stage="embed",le="[^"]+"\} (\d+)', text)]
+assert buckets == sorted(buckets) and buckets[-1] == 2
+
+# Spans anidados: el padre de inner es outer
+assert [s["parent"] for s in metrics.recent_spans() if s["span"] == "inner"] == ["outer", "outer"]
+
+# Endpoint HTTP
+server = metrics.start_http_server(port=19108)
+body = urllib.request.urlopen("http://127.0.0.1:19108/metrics", timeout=5).read().decode("utf-8")
+assert "ytrag_span_seconds_sum" in body
+server.shutdown()
+print("OK")
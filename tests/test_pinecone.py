@@ -1,7 +1,7 @@
-from app.embeddings import embed_chunks
+from app.embeddings import embed_chunks, embed_query
 from app.ingest import get_transcript_auto, segment_transcript
 from app.utils import yt_id_from_url, hhmmss
-from app import pinecone_store
+from app import vector_store as pinecone_store
 
 # Config 
 url = "https://www.youtube.com/watch?v=zxQyTK8quyY"
@@ -16,11 +16,11 @@ chunks_with_embs = embed_chunks(chunks)
 
 # Pinecone 
 pinecone_store.ensure_index()
-inserted = pinecone_store.upsert_chunks(chunks_with_embs, video_id=vid, title="Test video")
-print("Subidos a Pinecone:", inserted)
+report = pinecone_store.upsert_chunks(chunks_with_embs, video_id=vid, title="Test video")
+print("Subidos a Pinecone:", report["upserted"], f"({report['vectors_per_sec']:.0f} vec/s, {len(report['batches'])} lotes)")
 
 # Query 
-q_vec = embed_chunks([{"text":"explicación de transformers", "start_sec":0, "end_sec":0}])[0]["embedding"]
+q_vec = embed_query("explicación de transformers")
 hits = pinecone_store.query(q_vec, top_k=3, video_id=vid)
 
 print("Resultados:")
@@ -0,0 +1,41 @@
+import tempfile
+from pathlib import Path
+import numpy as np
+from app import local_store, quantize
+from benchmarks.synthetic import synthetic_embeddings
+
+vecs = synthetic_embeddings(20, 100, dim=local_store.DIM, seed=4)
+q = vecs[17]
+
+# Error de cuantización acotado y tamaños esperados
+for dtype, tol in (("float32", 0.0), ("float16", 1e-3), ("int8", 2e-2)):
+    codes, scales = quantize.quantize(vecs, dtype)
+    err = np.abs(quantize.scores(codes, scales, q) - vecs @ q).max()
+    size = codes.nbytes + (scales.nbytes if scales is not None else 0)
+    print(f"{dtype}: error máx {err:.5f} | {size / len(vecs):.0f} B/vector")
+    assert err <= tol and size == len(vecs) * quantize.bytes_per_vector(local_store.DIM, dtype)
+
+# El store local en int8 devuelve lo mismo que en float32 (rescoring en float32)
+local_store.LOCAL_INDEX_DIR = Path(tempfile.mkdtemp())
+chunks = [{"start_sec": i * 48.0, "end_sec": i * 48.0 + 60.0, "text": f"c{i}", "embedding": e} for i, e in enumerate(vecs)]
+local_store.upsert_chunks(chunks, video_id="vidQ")
+rng = np.random.default_rng(1)
+queries = vecs[rng.choice(len(vecs), 30)] + rng.normal(scale=0.05, size=(30, local_store.DIM))
+
+local_store.LOCAL_VECTOR_DTYPE = "float32"
+local_store.reset_client()
+ref = [local_store.query(x, top_k=8, video_id="vidQ") for x in queries]
+
+local_store.LOCAL_VECTOR_DTYPE = "int8"
+local_store.reset_client()
+got = [local_store.query(x, top_k=8, video_id="vidQ") for x in queries]
+assert [[h["id"] for h in r] for r in got] == [[h["id"] for h in r] for r in ref]
+assert all(abs(a["score"] - b["score"]) < 1e-5 for r, g in zip(ref, got) for a, b in zip(r, g))
+d = local_store.LOCAL_INDEX_DIR / "vidQ"
+assert (d / "codes-int8.npy").exists() and (d / "scales-int8.npy").exists()
+
+# Re-upsert: la copia cuantizada se regenera con los vectores nuevos
+local_store.upsert_chunks([dict(chunks[0], embedding=-vecs[0])], video_id="vidQ")
+assert local_store.query(-vecs[0], top_k=1, video_id="vidQ")[0]["id"] == "vidQ:0"
+assert np.load(d / "codes-int8.npy").shape == (len(vecs), local_store.DIM)
+print("OK")
@@ -0,0 +1,41 @@
+import re
+from app.utils import yt_id_from_url
+from app.ingest import get_transcript_auto, segment_transcript
+from app.embeddings import embed_chunks, embed_query
+from app.vector_store import ensure_index, upsert_chunks, query
+from app import rag_answer
+from questions import URL, QUESTIONS
+
+
+# Control de calidad: las respuestas en int8/bf16 no deben alejarse de las de fp32
+PRECISIONS = ("fp32", "int8", "bf16")
+MIN_OVERLAP = 0.5   # solape medio de palabras exigido frente a fp32
+
+VID = yt_id_from_url(URL)
+rows = get_transcript_auto(VID, fallback_url=URL)
+ensure_index()
+upsert_chunks(embed_chunks(segment_transcript(rows, window=60, overlap=12)), video_id=VID, title="StatQuest: Transformers", lang="en")
+
+hits_per_q = [rag_answer.dedup_hits_by_time(query(embed_query(q), top_k=8, video_id=VID), min_gap_sec=60.0) for q in QUESTIONS]
+
+
+def words(t):
+    return set(re.findall(r"\w+", t.lower()))
+
+
+answers = {}
+for prec in PRECISIONS:
+    rag_answer._load_llm(rag_answer._DEFAULT_MODEL, precision=prec)
+    answers[prec] = [rag_answer.rag_answer_with_citations(VID, q, h, ctx_max=4, cite_k=2)[0] for q, h in zip(QUESTIONS, hits_per_q)]
+    st = rag_answer.llm_stats()
+    print(f"{prec} (cargado como {st['precision']}): RSS {st['rss_bytes'] / 2**30:.2f} GB | {st['tokens_per_sec']:.1f} tokens/s")
+
+for prec in PRECISIONS[1:]:
+    overlaps, same_refusal = [], 0
+    for a, b in zip(answers["fp32"], answers[prec]):
+        wa, wb = words(a), words(b)
+        overlaps.append(len(wa & wb) / max(1, len(wa | wb)))
+        same_refusal += (a in rag_answer.NOT_FOUND_ANSWERS) == (b in rag_answer.NOT_FOUND_ANSWERS)
+    mean = sum(overlaps) / len(overlaps)
+    print(f"{prec} vs fp32: solape medio {mean:.2f} | misma decisión de 'no encontrado' en {same_refusal}/{len(QUESTIONS)}")
+    assert mean >= MIN_OVERLAP and same_refusal >= len(QUESTIONS) - 2
@@ -0,0 +1,15 @@
+from app.ingest import segment_transcript
+from benchmarks.bench_segment import segment_naive
+from benchmarks.synthetic import synthetic_rows
+
+
+cases = 0
+for seed in range(20):
+    for shuffle in (False, True):
+        rows = synthetic_rows(300 + seed * 37, seed=seed, irregular=True, shuffle=shuffle)
+        for window, overlap in ((60, 12), (30, 0), (45, 44.5), (10, 3)):
+            assert segment_transcript(rows, window, overlap) == segment_naive(rows, window, overlap)
+            cases += 1
+
+assert segment_transcript([], 60, 12) == segment_naive([], 60, 12) == []
+print("segment_transcript idéntico a la referencia en", cases, "casos")
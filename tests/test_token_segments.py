@@ -0,0 +1,65 @@
+import os, tempfile
+from pathlib import Path
+os.environ["VECTOR_BACKEND"] = "local"
+
+from app import bm25, embeddings, local_store, manifest
+from app.ingest import iter_token_segments
+from app.pipeline import index_video, iter_chunks, segment_params
+from app.transcript_cache import write_rows, read_rows
+from benchmarks.synthetic import StubEmbedder, StubTokenizer, synthetic_rows
+
+local_store.LOCAL_INDEX_DIR = Path(tempfile.mkdtemp())
+bm25.BM25_DIR = Path(tempfile.mkdtemp())
+manifest.MANIFEST_DIR = Path(tempfile.mkdtemp())
+embeddings._models[embeddings.EMB_MODEL_NAME] = StubEmbedder()
+
+
+def count(texts):
+    return [len(ids) for ids in StubTokenizer()(texts, add_special_tokens=False)["input_ids"]]
+
+
+rows = synthetic_rows(600, seed=8)
+rows[50]["text"] = "   "                                   # línea vacía: se ignora
+rows[70]["text"] = " ".join(["supercalifragilistic"] * 40)  # línea que no cabe sola
+chunks = list(iter_token_segments(rows, count, max_tokens=60, overlap_tokens=12))
+lens = count([c["text"] for c in chunks])
+
+# Ningún chunk pasa del presupuesto salvo el de la línea gigante (que va sola)
+over = [c for c, n in zip(chunks, lens) if n > 60]
+assert len(over) == 1 and over[0]["text"] == rows[70]["text"]
+
+# Los tiempos son los de las líneas: empieza en una línea y termina en el final de otra
+starts = {r["start"] for r in rows}
+ends = {r["start"] + r["duration"] for r in rows}
+assert all(c["start_sec"] in starts and c["end_sec"] in ends for c in chunks)
+assert chunks[0]["start_sec"] == rows[0]["start"] and chunks[-1]["end_sec"] == max(ends)
+
+# Todas las líneas con texto aparecen, y los chunks consecutivos comparten ≤ 12 tokens
+joined = " ".join(c["text"] for c in chunks)
+assert all(r["text"] in joined for r in rows if r["text"].strip())
+for a, b in zip(chunks, chunks[1:]):
+    assert b["start_sec"] > a["start_sec"]
+    shared = [r["text"] for r in rows if a["start_sec"] <= r["start"] and r["start"] + r["duration"] <= a["end_sec"]
+              and r["start"] >= b["start_sec"] and r["text"].strip()]
+    assert sum(count(shared)) <= 12
+
+# Sin solape: cada línea exactamente una vez
+no_ov = list(iter_token_segments(rows, count, max_tokens=60, overlap_tokens=0))
+assert sum(count([c["text"] for c in no_ov])) == sum(count([r["text"] for r in rows if r["text"].strip()]))
+
+# Caché columnar = lista de dicts
+p = Path(tempfile.mkdtemp()) / "v.trc"
+write_rows(p, rows)
+assert list(iter_token_segments(read_rows(p), count, max_tokens=60, overlap_tokens=12)) == chunks
+
+# Pipeline: el modo va al manifiesto y el límite por defecto es el del modelo (128 - 2)
+params = segment_params(mode="tokens")
+assert params["mode"] == "tokens" and params["max_tokens"] == 126
+r1 = index_video("tokA", rows, mode="tokens")
+assert r1["chunks"] == len(list(iter_chunks(rows, params)))
+assert manifest.load_manifest("tokA")["params"] == params
+assert index_video("tokA", rows, mode="tokens")["skipped"]
+r_time = index_video("tokA", rows, mode="time")
+assert not r_time["skipped"] and r_time["upserted"] == r_time["chunks"]
+print(f"Chunks: tokens={r1['chunks']} | tiempo={r_time['chunks']}")
+print("OK")
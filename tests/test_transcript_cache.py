@@ -0,0 +1,53 @@
+import json, tempfile, time
+from pathlib import Path
+from types import SimpleNamespace
+from app import ingest
+from app.transcript_cache import read_rows, write_rows, normalize_rows, MAGIC
+from app.ingest import segment_transcript
+from benchmarks.synthetic import synthetic_rows
+
+tmp = Path(tempfile.mkdtemp())
+rows = synthetic_rows(3000, seed=5)
+rows[10]["text"] = "ñandú → “comillas” 🎯"
+
+# Ida y vuelta exacta
+p = tmp / "vid.trc"
+write_rows(p, rows)
+cols = read_rows(p)
+assert len(cols) == len(rows) and cols.to_list() == rows
+assert cols[10]["text"] == "ñandú → “comillas” 🎯" and cols[-1] == rows[-1]
+assert [f.name for f in tmp.iterdir()] == ["vid.trc"]   # sin temporales
+
+# La segmentación sobre columnas da lo mismo que sobre dicts
+assert segment_transcript(cols) == segment_transcript(rows)
+
+# Objetos con atributos (youtube_transcript_api >= 1.0) en vez de dicts
+objs = [SimpleNamespace(text=r["text"], start=r["start"], duration=r["duration"]) for r in rows[:5]]
+assert normalize_rows(objs) == rows[:5]
+
+# Ficheros dañados: error claro, no filas basura
+bad = tmp / "bad.trc"
+for data in (p.read_bytes()[:-3], b"XXXX" + p.read_bytes()[4:], MAGIC + b"\x09\x00\x00\x00" + p.read_bytes()[8:]):
+    bad.write_bytes(data)
+    try:
+        read_rows(bad)
+        raise AssertionError("debería fallar")
+    except ValueError as e:
+        print("Rechazado:", e)
+
+# Migración desde la caché JSON antigua al leerla
+ingest.CACHE_DIR = tmp
+(tmp / "old.json").write_text(json.dumps(rows, ensure_ascii=False), encoding="utf-8")
+t = time.perf_counter(); json.loads((tmp / "old.json").read_text(encoding="utf-8")); t_json = time.perf_counter() - t
+migrated = ingest._load_cached_transcript("old")
+assert migrated is not None and migrated.to_list() == rows
+assert not (tmp / "old.json").exists() and (tmp / "old.trc").exists()
+
+t = time.perf_counter(); read_rows(tmp / "old.trc"); t_trc = time.perf_counter() - t
+print(f"Carga de {len(rows)} filas: JSON {t_json * 1000:.2f} ms | columnar {t_trc * 1000:.2f} ms")
+
+# Una caché ilegible no rompe la descarga: se trata como ausente
+(tmp / "broken.trc").write_bytes(b"nope")
+assert ingest._load_cached_transcript("broken") is None
+assert ingest._load_cached_transcript("missing") is None
+print("OK")
@@ -0,0 +1,63 @@
+import threading
+import numpy as np
+from app import pinecone_store
+from app.batching import payload_bytes
+
+
+# Índice falso en memoria: valida límites por petición y falla el primer intento
+# de uno de cada `fail_every` lotes
+class FakeIndex:
+    def __init__(self, max_vectors, max_bytes, fail_every=0):
+        self.max_vectors, self.max_bytes, self.fail_every = max_vectors, max_bytes, fail_every
+        self.vectors, self.calls, self.seen = {}, 0, set()
+        self.lock = threading.Lock()
+
+    def upsert(self, vectors):
+        with self.lock:
+            self.calls += 1
+            first = vectors[0]["id"]
+            if self.fail_every and first not in self.seen and len(self.seen) % self.fail_every == 0:
+                self.seen.add(first)
+                raise ConnectionError("fallo simulado")
+            self.seen.add(first)
+        assert len(vectors) <= self.max_vectors
+        assert sum(payload_bytes(v) for v in vectors) <= self.max_bytes
+        with self.lock:
+            for v in vectors:
+                self.vectors[v["id"]] = v
+
+    def delete(self, ids):
+        assert len(ids) <= pinecone_store.DELETE_BATCH_IDS
+        with self.lock:
+            for i in ids:
+                self.vectors.pop(i, None)
+
+
+pinecone_store.UPSERT_BATCH_VECTORS = 40
+pinecone_store.UPSERT_BATCH_BYTES = 200_000
+pinecone_store.UPSERT_WORKERS = 4
+
+rng = np.random.default_rng(0)
+chunks = [
+    {"start_sec": i * 48.0, "end_sec": i * 48.0 + 60.0, "text": "palabra " * (20 + i % 400),
+     "embedding": rng.normal(size=pinecone_store.DIM).astype(np.float32)}
+    for i in range(500)
+]
+
+fake = FakeIndex(max_vectors=40, max_bytes=200_000, fail_every=3)
+report = pinecone_store.upsert_chunks(chunks, video_id="vidA", title="Test video", offset=10, index=fake)
+
+assert report["upserted"] == 500
+assert set(fake.vectors) == {f"vidA:{i}" for i in range(10, 510)}
+assert sum(b["vectors"] for b in report["batches"]) == 500
+assert any(b["attempts"] > 1 for b in report["batches"])   # hubo reintentos
+assert [b["batch"] for b in report["batches"]] == list(range(len(report["batches"])))
+assert sum(b["bytes"] for b in report["batches"]) == sum(payload_bytes(v) for v in fake.vectors.values())
+print(f"{len(report['batches'])} lotes, {report['vectors_per_sec']:.0f} vec/s,",
+      "reintentos:", sum(b["attempts"] - 1 for b in report["batches"]))
+
+# Borrado en lote de los ids sobrantes
+pinecone_store.DELETE_BATCH_IDS = 64
+orphans = [f"vidA:{i}" for i in range(300, 510)]
+assert pinecone_store.delete_ids(orphans, index=fake) == len(orphans)
+assert set(fake.vectors) == {f"vidA:{i}" for i in range(10, 300)}
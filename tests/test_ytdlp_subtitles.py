@@ -0,0 +1,86 @@
+import io, json
+from pathlib import Path
+from app import ingest
+from benchmarks.synthetic import synthetic_rows, synthetic_vtt
+
+# Info de yt-dlp grabado (extract_info(download=False), recortado a lo que se usa)
+INFO = json.loads((Path(__file__).parent / "fixtures" / "ytdlp_info.json").read_text(encoding="utf-8"))
+
+# Selección de pista: solo manuales, prioridad de _prefer_lang_code ("es" acepta "es-419")
+lang, track = ingest._pick_subtitle_track(INFO, ("es", "es-419", "en", "en-GB", "pt-BR", "pt"))
+assert lang == "es-419" and track["ext"] == "vtt" and "lang=es-419" in track["url"]
+assert ingest._pick_subtitle_track(INFO, ("en", "es"))[0] == "en-GB"
+assert ingest._pick_subtitle_track(INFO, ("fr",)) is None          # "es"/"en" automáticos no cuentan
+assert ingest._pick_subtitle_track({"subtitles": {"live_chat": INFO["subtitles"]["live_chat"]}}, ("es",)) is None
+
+# Empate de prioridad ("es" acepta "es-419"): gana el código exacto, sea cual sea el orden
+vtt_fmt = lambda l: [{"ext": "vtt", "url": f"https://example.invalid/?lang={l}"}]
+for order in (("es-419", "es"), ("es", "es-419")):
+    tie = {"subtitles": {l: vtt_fmt(l) for l in order}}
+    assert ingest._pick_subtitle_track(tie, ("es", "en"))[0] == "es"
+assert ingest._pick_subtitle_track({"subtitles": {l: vtt_fmt(l) for l in ("es-MX", "es-419")}}, ("es",))[0] == "es-419"
+assert ingest._track_rank("es", ("es",), generated=False) < ingest._track_rank("es", ("es",), generated=True)
+
+# VTT como el de YouTube: ajustes de cue, identificadores, etiquetas y entidades
+vtt = """WEBVTT
+Kind: captions
+Language: es-419
+
+NOTE cabecera que no es un cue
+
+1
+00:00:01.000 --> 00:00:03.500 align:start position:0%
+Hola <c>a</c> &amp; todos
+
+00:00:03.500 --> 00:01:02.250 align:start position:0%
+<i>segunda</i>
+línea
+
+2:05.000 --> 2:07.000
+sin horas
+"""
+rows = list(ingest._iter_vtt_rows(vtt.splitlines()))
+assert rows == [
+    {"text": "Hola a & todos", "start": 1.0, "duration": 2.5},
+    {"text": "segunda línea", "start": 3.5, "duration": 58.75},
+    {"text": "sin horas", "start": 125.0, "duration": 2.0},
+], rows
+assert ingest._parse_vtt_to_rows(vtt) == rows
+
+# Lectura por bloques: mismas filas aunque los cortes partan líneas y caracteres UTF-8
+ref = synthetic_rows(300, seed=6)
+ref[5]["text"] = "ñandú — “comillas” 🎯"
+data = synthetic_vtt(ref).encode("utf-8")
+for size in (7, 64, 4096):
+    streamed = list(ingest._iter_vtt_rows(ingest._iter_lines(io.BytesIO(data).read, chunk_size=size)))
+    assert streamed == ingest._parse_vtt_to_rows(data.decode("utf-8"))
+assert [r["text"] for r in streamed] == [r["text"] for r in ref]
+
+
+# YoutubeDL de prueba: devuelve el info grabado y sirve solo la URL de la pista pedida
+class ReplayYDL:
+    def __init__(self, info, body: bytes):
+        self.info, self.body, self.probes, self.opened = info, body, 0, []
+
+    def extract_info(self, url, download=True):
+        assert download is False
+        self.probes += 1
+        return self.info
+
+    def urlopen(self, url):
+        self.opened.append(url)
+        return io.BytesIO(self.body)
+
+
+ydl = ReplayYDL(INFO, data)
+got = ingest._fetch_subtitles_with(ydl, INFO["webpage_url"], ("es", "en"))
+assert ydl.probes == 1 and len(ydl.opened) == 1 and "lang=es-419" in ydl.opened[0] and "fmt=vtt" in ydl.opened[0]
+assert [r["text"] for r in got] == [r["text"] for r in ref]
+
+try:
+    ingest._fetch_subtitles_with(ReplayYDL(INFO, data), INFO["webpage_url"], ("fr",))
+    raise AssertionError("debería fallar")
+except RuntimeError as e:
+    assert "de, en-GB, es-419, pt-BR" in str(e)
+    print("Sin pista:", e)
+print("OK")